@@ -21,6 +21,26 @@ import csv
 import psutil
 import platform
 
+from analisis import ModeloEscalamiento, cargar_resultados, comparar_almacenamiento
+from archivo_res import ArchivadorRes, COLUMNAS_ARCHIVO
+from calidad import DetectorCalidad, valores_calidad, COLUMNAS_CALIDAD
+from cache_etapas import CacheEtapas, valores_cache, COLUMNAS_CACHE
+from catalogo import CatalogoModelos
+from ejecucion import run_exe_monitor, benchmark_exe, valores_muestreo, valores_benchmark, valores_recursos, valor_telemetria, COLUMNAS_BENCHMARK
+from enlaces import instalar_binarios, resumen_sandbox, COLUMNAS_SANDBOX
+from equipo import perfil_equipo, guardar_perfil
+from lector_res import rendimiento_res, COLUMNAS_RES
+from memoria import ModeloMemoria, ControlMemoria, cargar_memoria, celdas_modelo, anotar_memoria, valores_memoria, error_memoria, COLUMNAS_MEMORIA
+from filessp import PlantillaFileSSP, escribir_filessp
+from muestreador import COLUMNAS_MUESTREO
+from planificador import ejecutar_trabajos, preparar_directorio_ejecucion, formato_nucleos, ARCHIVOS_SOLO_LECTURA
+from progreso import seguidor_tetis, tamaños_res, tiempos_fe, valores_progreso, COLUMNAS_PROGRESO
+from recursos import COLUMNAS_RECURSOS
+from resultados import AlmacenResultados
+from scratch import EscrituraDiferida, preparar_scratch, estado_directorio, archivos_salida, COLUMNAS_ALMACENAMIENTO
+from telemetria import nuevo_id
+from trazas import Trazador, activar, span, resumir_traza
+
 __author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
 __copyright__ = "Copyright 2024, DDL"
 __credits__ = ["Nicolás Cortés-Torres"]
@@ -33,117 +53,11 @@ __status__ = "developing"
 
 #%% DEFINICION DE FUNCIONES
 
-################################################################################
-# Funcion para reemplazar datos de escala
-def replace_scale(vec):
-    if "1k" in vec:
-        vec = "1000"
-    elif "2p5" in vec:
-        vec = "2500"
-    elif "5k" in vec:
-        vec = "5000"
-    elif "30m" in vec:
-        vec = "30"
-    elif "200m" in vec:
-        vec = "200"
-    elif "500m" in vec:
-        vec = "500"
-    return vec
-
 ################################################################################
 # Funcion apra definir la hora actual
 def def_hora():
     return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
 
-################################################################################
-# Funcion para leer la ultima fila del archivo de monitoreo 
-def leer_ultima_frecuencia(hwinfo_log_path, freq_col_name):
-    """
-    Lee la última frecuencia disponible desde el archivo CSV de HWiNFO.
-    """
-    try:
-        with open(hwinfo_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            reader = csv.DictReader(f)
-            last_row = None
-            for row in reader:
-                if row[freq_col_name]:
-                    last_row = row
-        if last_row:
-            valor = last_row[freq_col_name].replace(",", ".").strip()
-            return float(valor)
-    except Exception:
-        return None 
-    
-################################################################################
-
-# Función para ejecutar un .exe y medir el tiempo
-
-def run_exe_monitor(exe_name, path_model, hwinfo_log_path, freq_col_name):
-    """
-    Ejecuta un ejecutable y mide el tiempo de ejecución, además del promedio de la frecuencia del procesador.
-
-    Parámetros:
-    - exe_name: nombre del ejecutable (ej. "Toparc.exe")
-    - path_model: ruta al directorio donde se encuentra el ejecutable
-    - hwinfo_log_path: ruta completa al archivo .csv generado por HWiNFO
-    - freq_col_name: nombre exacto de la columna que contiene la frecuencia en MHz
-
-    Retorna:
-    - Diccionario con tiempos y frecuencia promedio
-    """
-    print("Iniciando monitoreo y ejecución del proceso...")
-    try:
-        freq_values = []
-    
-        os.chdir(path_model)
-        process = subprocess.Popen([exe_name])
-    
-        start_time = time.time()
-    
-        while process.poll() is None:
-            freq_now = leer_ultima_frecuencia(hwinfo_log_path, freq_col_name)
-            if freq_now:
-                freq_values.append(freq_now)
-                print(f"{time.strftime('%H:%M:%S')} - Frecuencia: {freq_now:.2f} MHz")
-            time.sleep(1)
-    
-        end_time = time.time()
-    
-        exec_time = end_time - start_time #Calcula el tiempo total de ejecución
-        freq_promedio = (sum(freq_values) / len(freq_values))/1000 if freq_values else float('nan') #Calcula el promedio de velocidad del procesador
-    
-        days = exec_time // 86400
-        hours = (exec_time % 86400) // 3600
-        minutes = (exec_time % 3600) // 60
-        seconds = round(exec_time % 60, 1)
-        total_days = exec_time / 86400
-        total_hours = exec_time / 3600
-        total_minutes = exec_time / 60
-    
-        return exec_time, days, hours, minutes, seconds, total_days, total_hours, total_minutes, freq_promedio
-    
-    except Exception as e:
-        
-        print(f"Error al ejecutar el proceso: {e}")
-        # Retornar un conjunto de valores indicativos
-        return tuple(["NOT EXECUTABLE"] * 9)
-    
-################################################################################
-
-# Función para extraer la información del equipo
-
-def info_pc(info_equipo, carac):
-    # Buscar en todo el DataFrame si contiene el texto "Nombre del procesador:"
-    mask = info_equipo.apply(lambda row: row.astype(str).str.contains(carac)).any(axis=1)
-
-    # Obtener los índices (posiciones) donde se encontró
-    indices = info_equipo[mask].index.tolist()
-
-    variable = info_equipo.iloc[indices[0], 1]
-    
-    return variable
-
-
 #%%###############################################################################################################
 ##### Codigo para ejecutar Tetis - Fase 4 TESIS PHD #######
 ################################################################################################################
@@ -152,131 +66,227 @@ tic = time.time()
 print(f"Inicia código - {def_hora()}")
 
 # Paths de trabajo
-name_pc = "GIMHABOG" #Nombre del ordenador a analizar
+name_pc = None #Nombre del ordenador a analizar (None: nombre detectado del equipo, ej. "GIMHABOG")
 wd_path = "D:/Mod_rendimientos/Modelos/" #Ubicación de los modelos a analizar
 wd_tetis = "C:/Tetis9/bin/"  # Directorio de los archivos TETIS .exe
 wd_out = "D:/Mod_rendimientos/Res/" #Ubicación de los resultados del codigo
-Res_all = f"{wd_out}Results_tetis_{name_pc}.csv"  # Archivo CSV para guardar los resultados
 
 monitor_file = "D:/Mod_rendimientos/Monitor/monitoreo.csv"
-equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"
+equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"  # Informe de HWiNFO (si no existe, el equipo se detecta con psutil)
 col_monitor = "Relojes núcleo (avg) [MHz]"  # Asegúrate que coincide exactamente con el nombre de la columna
-
+muestreo_psutil = 1.0  # Intervalo (s) del muestreador psutil (None para desactivarlo)
+repeticiones = 1  # Corridas medidas por ejecutable (se reporta la mediana, IQR, min e IC bootstrap)
+calentamiento = 0  # Corridas previas de calentamiento que se descartan
+wd_telemetria = f"{wd_out}Telemetria/"  # Archivo de series de cada ejecucion (.npy por id de ejecucion); None para no guardarlas
+wd_trazas = f"{wd_out}Trazas/"  # Traza de las fases de cada campaña (spans en ns: costo del arnes frente a los ejecutables); None: sin traza
+formato_traza = "jsonl"  # "jsonl" (un span por linea) o "chrome" (se abre en chrome://tracing o Perfetto)
+wd_cache = None  # Cache de salidas de Control por hash de sus entradas, ej. f"{wd_out}Cache/" (mejor con wd_runs; hashea toda la carpeta del modelo); None para ejecutarlo siempre
+ventana_estancado = None  # s sin crecer Fichero_resultados.res para detener Tetis como STALLED (None: sin limite; activar solo si Tetis escribe el .res durante la simulacion)
+factor_timeout = 3.0  # Tetis se detiene como TIMEOUT al superar factor x tiempo de ejecuciones anteriores del mismo Fe en el equipo (sin ellas no hay limite); None: sin limite
+columnas_calidad = {  # Columnas de HWiNFO para la calidad de la medicion (las que no esten en monitoreo.csv se ignoran)
+    'temperatura': "Paquete de CPU [°C]",
+    'potencia': "Potencia del paquete de CPU [W]",
+    'limite_pl1': "IA: Límite de potencia PL1 [Sí/No]",
+    'limite_termico': "IA: Límite térmico [Sí/No]",
+}
+umbral_calidad = 0.9  # Calidad minima (0-1) de una ejecucion de Tetis; por debajo se marca contaminada (throttling, temperatura, potencia, carga de fondo)
+reintentos_calidad = 1  # Veces que una ejecucion contaminada se vuelve a encolar al final de la campaña (0: solo se marca)
+
+# Ejecucion concurrente
+n_paralelo = 1  # Numero de escenarios que se ejecutan a la vez
+nucleos_por_trabajo = None  # Nucleos logicos por escenario (None: reparto equitativo)
+fijar_nucleos = True  # Fijar cada escenario a un grupo de nucleos disjunto
+wd_runs = None  # Directorio (fuera de wd_path) para ejecuciones aisladas, ej. "D:/Mod_rendimientos/Runs/"; None ejecuta en el modelo
+# Entradas de solo lectura que se enlazan en wd_runs (extensiones, nombres o carpetas); el resto del modelo se copia o
+# se clona, de modo que una escritura de Control o Tetis no llega al modelo. Agregar aqui solo entradas que nada reescribe
+archivos_enlazables = list(ARCHIVOS_SOLO_LECTURA)
+wd_scratch = None  # Directorio rapido (RAM disk o NVMe local, ej. "R:/Scratch/") donde se copia y ejecuta cada escenario; los resultados vuelven en segundo plano a wd_runs o al modelo. None: sin staging
+fraccion_ram = 0.8  # Fraccion de la RAM disponible al inicio que pueden reservar los escenarios en curso (RSS pico predicho de Control y Tetis); un escenario que no cabe espera. None: sin control de memoria
+max_escrituras_pendientes = 2  # Escenarios terminados que pueden esperar la copia de vuelta; con la cola llena el siguiente espera (limita el espacio de wd_scratch)
+
+# Archivo de resultados
+wd_archivo = None  # Directorio donde se comprime el Fichero_resultados.res de cada ejecucion, ej. "E:/Archivo_res/"; None: el .res queda en el directorio de ejecucion (el siguiente Fe lo sobrescribe)
+formato_archivo = "zstd"  # "zstd" (requiere el paquete zstandard; si no, gzip) o "gzip"
+hilos_archivo = 2  # Compresiones simultaneas en segundo plano
+max_archivos_pendientes = 4  # .res apartados sin comprimir antes de frenar la siguiente ejecucion
+min_libre_archivo_gb = 20  # Espacio libre minimo en wd_archivo; por debajo la siguiente ejecucion espera a las compresiones en curso
+
+if n_paralelo > 1 and not (wd_runs or wd_scratch):
+    raise ValueError("Para ejecutar escenarios en paralelo se requiere wd_runs o wd_scratch (directorios aislados)")
+
+almacenamiento = "scratch" if wd_scratch else ("runs" if wd_runs else "modelo")  # Se guarda en cada fila para comparar staging y ejecucion en el sitio
 
 if not os.path.exists(wd_out): #Verifica que existe la carpeta de resultados y la crea 
     os.makedirs(wd_out)
+
+#%% Extraer info del equipo
+print(f"Extraer info del equipo - {def_hora()}")
+
+perfil = perfil_equipo(equipo_file) # Informe de HWiNFO o deteccion con psutil/platform
+huella = guardar_perfil(perfil, wd_out) # Hash del hardware, se guarda en cada fila
+detector = DetectorCalidad(perfil, columnas_calidad, umbral_calidad=umbral_calidad) # Throttling y perturbaciones de cada ejecucion
+
+name_pc = name_pc or perfil['nombre']
+procesador = perfil['procesador']
+RAM = perfil['ram_gb']
+nucleos = perfil['nucleos']
+plogicos = perfil['procesadores_logicos']
+campaña = time.strftime("%Y%m%d_%H%M%S")
+
+# Traza de la campaña: fases del arnes y, desde run_exe_monitor, el tiempo de cada ejecutable
+trazador = None
+if wd_trazas:
+    trazador = activar(Trazador(f"{wd_trazas}Traza_tetis_{name_pc}_{campaña}{'.json' if formato_traza == 'chrome' else '.jsonl'}",
+                                formato_traza, equipo=name_pc, huella=huella, campaña=campaña, n_paralelo=n_paralelo))
+
+Res_all = f"{wd_out}Results_tetis_{name_pc}.csv"  # Archivo CSV para guardar los resultados
+Res_db = f"{wd_out}Results_tetis_{name_pc}.sqlite"  # Base de datos donde se guarda cada ejecucion (permite reanudar)
     
    
-# Obtener la lista de modelos en la ruta, exceptuando la carpeta de resultados
-models = [nombre for nombre in os.listdir(wd_path)
-              if os.path.isdir(os.path.join(wd_path, nombre))]
+# Catalogo de modelos en la ruta (celdas, archivos y ficheros Fe, guardado entre corridas)
+catalogo = CatalogoModelos(wd_path, f"{wd_out}catalogo_modelos.json")
+models = [entrada['carpeta'] for entrada in catalogo.modelos()]
 
 n_models = len(models)
 
-#%% Extraer info del equipo
-print(f"Extraer info del equipo - {def_hora()}")
+cache = CacheEtapas(wd_cache) if wd_cache else None
 
-# Leer el archivo como texto plano usando codificación robusta "utf-8"
-with open(equipo_file, encoding="utf-8") as f:
-    info_equipo = f.readlines()
-    
-info_equipo = pd.DataFrame(info_equipo)
-info_equipo = info_equipo[0].str.strip().str.split(",", expand=True)
+# Tiempos predichos con las leyes de escalamiento, tiempos y tamaños de .res de ejecuciones anteriores (progreso, ETA y TIMEOUT)
+try:
+    modelo_tiempos = ModeloEscalamiento(cargar_resultados(wd_out))
+except Exception:
+    modelo_tiempos = None
+tamaños = tamaños_res(wd_out)
+tiempos = tiempos_fe(wd_out)
 
-procesador = info_pc(info_equipo, "Nombre del procesador:") 
-RAM = info_pc(info_equipo, "Tamaño de memoria total:") 
-nucleos = info_pc(info_equipo, "Número de núcleos de procesador:") 
-plogicos = info_pc(info_equipo, "Número de procesadores lógicos:") 
+# RSS pico predicho de Control y Tetis con las ejecuciones anteriores; se reajusta con cada ejecucion
+modelo_memoria = ModeloMemoria(cargar_memoria(wd_out))
+control_memoria = ControlMemoria(fraccion_ram) if fraccion_ram else None
 
-#%% Crear un DataFrame de pandas con los resultados  
-print(f"Creando Dataframe - {def_hora()}")
+#%% Crear el almacen de resultados
+print(f"Creando almacen de resultados - {def_hora()}")
 
-df = pd.DataFrame(columns=[
+columnas = [
     'Equipo', 'Cuenca', 'Escala','Escenario', 'Modelo', 'Celdas','Entrada',
     'Tetis Time', 'Tetis Days', 'Tetis Hours', 'Tetis Minutes', 'Tetis Seconds',
     'Tetis Total Days', 'Tetis Total Hours', 'Tetis Total Minutes','Vel_Tetis',
-    'Tamaño Res mb', 'Tamaño Res gb',
-    'Procesador', 'Memoria Ram Gb', 'Nucleos', 'Procesadores logicos',
-     ])
-
-# Inicializar una lista para almacenar los resultados
-results = []
+    *[f"Tetis {col}" for col in COLUMNAS_BENCHMARK],
+    'Tamaño Res mb', 'Tamaño Res gb', *COLUMNAS_RES,
+    'Procesador', 'Memoria Ram Gb', 'Nucleos', 'Procesadores logicos', 'Huella equipo',
+    'Concurrencia', 'Nucleos asignados', *COLUMNAS_SANDBOX,
+    *[f"Tetis {col}" for col in COLUMNAS_MUESTREO],
+    *[f"Control {col}" for col in COLUMNAS_RECURSOS],
+    *[f"Control {col}" for col in COLUMNAS_CACHE],
+    *[f"Tetis {col}" for col in COLUMNAS_RECURSOS],
+    'Tetis Telemetria',
+    *[f"Tetis {col}" for col in COLUMNAS_PROGRESO],
+    *[f"Tetis {col}" for col in COLUMNAS_CALIDAD],
+    *COLUMNAS_ALMACENAMIENTO, 'Archivo res',
+    *[f"Control {col}" for col in COLUMNAS_MEMORIA],
+    *[f"Tetis {col}" for col in COLUMNAS_MEMORIA],
+     ]
+
+# El almacenamiento es parte de la clave: el mismo Fe se mide en el sitio y en el scratch
+almacen = AlmacenResultados(Res_db, "tetis", columnas, clave=('Equipo', 'Modelo', 'Entrada', 'Almacenamiento'))
+# Ejecuciones validas terminadas en corridas anteriores (las filas anteriores a la columna Almacenamiento se ejecutaron en el modelo)
+completados = almacen.completados('Tetis Time', 'Tetis Contaminada', {'Almacenamiento': "modelo"})
+escritura = EscrituraDiferida(max_escrituras_pendientes) if wd_scratch else None
+
+# Almacen de los .res comprimidos (una fila por .res al terminar su compresion)
+almacen_archivo = archivador = None
+if wd_archivo:
+    almacen_archivo = AlmacenResultados(f"{wd_out}Results_archivo_{name_pc}.sqlite", "archivo",
+                                        ['Equipo', 'Modelo', 'Entrada', *COLUMNAS_ARCHIVO], clave=('Equipo', 'Archivo res'))
+    archivador = ArchivadorRes(wd_archivo, formato_archivo, None, hilos_archivo, max_archivos_pendientes,
+                               min_libre_archivo_gb, almacen_archivo.agregar)
 
 print(f"Inicio Analisis de Modelos - {def_hora()}")
 
-#%% Bucle para los modelos
+#%% Bucle para los modelos: lista de trabajos (modelo, fichero de entrada)
+# El FileSSP.tet de cada modelo se lee una vez y el de cada escenario se genera
+# aqui en memoria (desde la plantilla leida, no desde el .tet que reescribe cada ejecucion)
+trabajos = []
 # i = 4
-for i in range(len(models)):
+for i, entrada in enumerate(catalogo.modelos()):
     
     wd_model = f"{wd_path}{models[i]}/"  #Defina la ruta del modelo
     wd_fe = f"{wd_model}Fe/"  #Defina la ruta donde almacenará los ficheros de evento con los escenarios
     
     if not os.path.exists(wd_fe): #Verifica que existe la carpeta de escenarios Fe
         os.makedirs(wd_fe)
-        
-    print(f"   Procesando modelo: {i+1} de {n_models} - {def_hora()}")
-    parts = models[i].split('_')
-    cuenca = parts[1].upper()
-    escala = replace_scale(parts[2])
-    escenario = parts[3].upper()
-    modelo = f"{parts[1]}_{parts[2]}_{parts[3]}"
 
-    #%% Bucle para los ficheros de entrada
+    plantilla = None
+    estimados = reserva = None
+    for file in entrada['fe']:
+        if (name_pc, entrada['modelo'], file, almacenamiento) in completados:
+            print(f"   Ya ejecutado {file}: {models[i]} - {def_hora()}")
+            continue
+        plantilla = plantilla or PlantillaFileSSP(f"{wd_model}FileSSP.tet")
+        wd_destino = f"{wd_runs}{entrada['carpeta']}/{file}/" if wd_runs else wd_model  # Aislado por escenario o el propio modelo
+        wd_run = f"{wd_scratch}{entrada['carpeta']}/{file}/" if wd_scratch else wd_destino  # Con staging se ejecuta en el scratch
+        if estimados is None:  # RSS pico estimado de Control y Tetis; el escenario reserva el mayor
+            estimados, reserva = modelo_memoria.estimar(celdas_modelo(wd_model, entrada['celdas']), ("Control", "Tetis"))
+        trabajos.append({'i': i, 'wd_model': wd_model, 'wd_run': wd_run, 'wd_destino': wd_destino, 'file': file,
+                         'filessp': plantilla.renderizar(wd_run, f"Fe/{file}.txt"), 'rss_estimado': estimados,
+                         'memoria_mb': reserva, **entrada})
+
+#%% Funcion para ejecutar un fichero de entrada de un modelo
+def correr_escenario(trabajo, nucleos_asignados):
+    
+    i, wd_model, wd_run, file, modelo = trabajo['i'], trabajo['wd_model'], trabajo['wd_run'], trabajo['file'], trabajo['modelo']
+    print(f"   Procesando modelo: {i+1} de {n_models} - {def_hora()}")
+    
+    #%% Numero de celdas (del catalogo, sin leer Topolco en cada escenario)
+    celdas = trabajo['celdas']
+    
+    #%% Directorio de ejecucion: copia en el scratch, aislado por escenario (entradas enlazadas) o el propio modelo
+    t_sandbox = time.perf_counter()
+    modos = {}
+    staging_mb = None
+    with span("Directorio ejecucion", almacenamiento=almacenamiento):
+        if wd_scratch:
+            modos, staging_mb = preparar_scratch(wd_model, wd_run, [f"Fe/{file}.txt"], mutables=cache.salidas_conocidas() if cache else ())
+        elif wd_runs:
+            modos = preparar_directorio_ejecucion(wd_model, wd_run, [f"Fe/{file}.txt"], enlazables=archivos_enlazables, mutables=cache.salidas_conocidas() if cache else ())
+    
+    #%% Instalar los archivos .exe en el directorio de ejecucion (se omiten si ya coinciden por hash)
+    
+    with span("Instalar binarios"):
+        modos.update(instalar_binarios(wd_tetis, ["Toparc.exe", "Hantec.exe", "Control.exe", "Tetis.exe"], wd_run))
+    sandbox = resumen_sandbox(modos, time.perf_counter() - t_sandbox)
+    
+    #%% FileSSP del escenario (ya generado): una escritura atomica en el directorio de ejecucion
+    print(f"      Inicio {file}: {modelo} - {def_hora()}")
+    
+    # FileSSP.txt y FileSSP.tet con la ruta y el Fe del escenario (en el modelo, en wd_runs o en el scratch)
+    with span("FileSSP"):
+        escribir_filessp(wd_run, trabajo['filessp'])
+        entradas = estado_directorio(wd_run) if wd_scratch else None  # Lo que no cambie al ejecutar no se devuelve
 
-    # Obtener la lista de modelos en la ruta, exceptuando la carpeta de resultados
-    files = [os.path.splitext(nombre)[0] for nombre in os.listdir(wd_fe) if nombre.endswith(".txt")]
+    #%% Ejecutar Control.exe para estaciones de salida
+    print(f"      Ejecutando Control {file}: {modelo} - {def_hora()}")
+    
+    control = lambda: run_exe_monitor("Control.exe", wd_run, monitor_file, col_monitor, None, nucleos_asignados) # Ejecuta Control.exe (con contabilidad de recursos)
+    with span("Control", etapa="Control"):  # El proceso queda como span hijo (exe); el resto es monitoreo y cache
+        Res_control = cache.ejecutar("Control", wd_run, control, os.path.join(wd_run, "Control.exe")) if cache else control()
+    if Res_control[0] == "NOT EXECUTABLE" or Res_control.extra['Codigo salida']:
+        raise subprocess.CalledProcessError(Res_control.extra.get('Codigo salida'), "Control.exe")
+    modelo_memoria.registrar(celdas, "Control", anotar_memoria(Res_control, trabajo['rss_estimado']['Control']))
+            
+    #%% Medir tiempos de ejecución para Tetis.exe
+    print(f"       Ejecutando Tetis {file}: {trabajo['carpeta']} - {def_hora()}")
+    
+    with span("Tetis", etapa="Tetis"):
+        progreso = seguidor_tetis(wd_run, file, celdas, huella, modelo_tiempos, tamaños.get((modelo, file)), ventana_estancado, factor_timeout,
+                                  tiempos.get((huella, modelo, file)))
+        Res_tetis = benchmark_exe("Tetis.exe", wd_run, monitor_file, col_monitor, repeticiones, calentamiento, muestreo_psutil, nucleos_asignados, wd_telemetria, progreso, detector) #ejecuta tetis (vigilado) y calcula tiempos, velocidad y calidad
+    
+    modelo_memoria.registrar(celdas, "Tetis", anotar_memoria(Res_tetis, trabajo['rss_estimado']['Tetis']))  # Error de la prediccion y reajuste
 
-    # file = "Fe_0_0_1"
-    for file in files:
-        
-        #%% Extraer numero de celdas
-        
-        # Lectura de Topolco
-        wd_topolco = f"{wd_model}Topolco.sds" #directorio de topolco
-        with open(wd_topolco, "r") as fe:
-            topolco = fe.readlines()  # Leer todas las líneas del archivo en una lista
-        
-        # Dividir cada línea en columnas basadas en espacios
-        topolco = [line.split() for line in topolco]
-        celdas = int(topolco[6][1]) # numero de celdas de la cuenca
-        
-        #%% Copiar archivos .exe al directorio del modelo
-        
-        for exe_file in ["Toparc.exe", "Hantec.exe", "Control.exe", "Tetis.exe"]:
-            shutil.copy(os.path.join(wd_tetis, exe_file), wd_model)
-        
-        #%% Modificaciones del FileSSP
-        print(f"      Inicio {file}: {modelo} - {def_hora()}")
-        wd_FileSSP = f"{wd_model}FileSSP.tet"
-        
-        with open(wd_FileSSP, "r") as fe:
-            changeFileSSP = fe.readlines()  # Leer todas las líneas del archivo en una lista
-        
-        changeFileSSP[0] = wd_model + "\n"  # Cambiar la línea 1 para ajustar la ruta del modelo
-        changeFileSSP[5] = f"Fe/{file}.txt" + "\n"  # Cambiar la línea 1 para ajustar la ruta del modelo
-        
-        # Escribir las líneas modificadas en FileSSP.txt
-        with open(f"{wd_model}FileSSP.txt", "w") as fe:
-            fe.writelines(changeFileSSP)
-        
-        # Sobrescribir FileSSP.tet con los cambios
-        with open(wd_FileSSP, "w") as fe:
-            fe.writelines(changeFileSSP)
+    # Lectura de Resultados
+    wd_res = f"{wd_run}Fichero_resultados.res" #directorio de topolco
     
-        #%% Ejecutar Control.exe para estaciones de salida
-        print(f"      Ejecutando Control {file}: {modelo} - {def_hora()}")
-        
-        os.chdir(wd_model) # Cambiar a directorio de la sección
-        subprocess.run("Control.exe", check=True) # Ejecuta Control.exe
-                
-        #%% Medir tiempos de ejecución para Tetis.exe
-        print(f"       Ejecutando Tetis {file}: {models[i]} - {def_hora()}")
-        
-        Res_tetis = run_exe_monitor("Tetis.exe", wd_model, monitor_file, col_monitor) #ejecuta tetis y calcula tiempos y velocidad
-        
-        # Lectura de Resultados
-        wd_res = f"{wd_model}Fichero_resultados.res" #directorio de topolco
-        
+    with span("Lectura res"):
         if Res_tetis[0] != "NOT EXECUTABLE":
             if os.path.isfile(wd_res):
                 # Obtener el tamaño del archivo en bytes
@@ -289,31 +299,123 @@ for i in range(len(models)):
             res_tamaño_kb = "NOT EXECUTABLE"
             res_tamaño_mb = "NOT EXECUTABLE"
             res_tamaño_gb = "NOT EXECUTABLE"
-    
-        #%% Agregar los resultados a la lista
-        results.append([
-            name_pc, cuenca, escala, escenario, modelo, celdas, file,
-            *Res_tetis,
-            res_tamaño_mb, res_tamaño_gb,
-            procesador, RAM, nucleos, plogicos,
-        ])
-    
-    
-        df = pd.DataFrame(results, columns=df.columns)
 
-        #%% Guardar el DataFrame en un archivo CSV
-        print(f"      Guardando resultados - {def_hora()}")
+        # Contenido del .res (pasos, puntos, variables) y rendimiento normalizado, leido con mmap
+        rendimiento = rendimiento_res(wd_res, celdas, Res_tetis[0], Res_tetis[8]) if Res_tetis[0] != "NOT EXECUTABLE" else {}
+
+    #%% Apartar el .res y comprimirlo en segundo plano (el siguiente escenario no lo sobrescribe)
+    archivo_res = None
+    if archivador and Res_tetis[0] != "NOT EXECUTABLE":
+        # Se aparta en el mismo volumen del .res, fuera del directorio de ejecucion
+        wd_pendientes = f"{wd_scratch}_pendientes/" if wd_scratch else (f"{wd_runs}_pendientes/" if wd_runs else f"{wd_model}_pendientes/")
+        with span("Archivar res"):  # Solo apartar el .res (y la espera por contrapresion); la compresion va en segundo plano
+            archivo_res = archivador.archivar(wd_res, wd_pendientes, archivador.ruta_archivo(trabajo['carpeta'], nuevo_id(file)),
+                                              {'Equipo': name_pc, 'Modelo': modelo, 'Entrada': file})
+
+    #%% Devolver los resultados del scratch en segundo plano (el siguiente escenario ya puede empezar)
+    if wd_scratch:
+        with span("Encolar escritura"):
+            escritura.encolar(wd_run, trabajo['wd_destino'], archivos_salida(wd_run, entradas))
+
+    #%% Fila de resultados
+    return [
+        name_pc, trabajo['cuenca'], trabajo['escala'], trabajo['escenario'], modelo, celdas, file,
+        *Res_tetis,
+        *valores_benchmark(Res_tetis),
+        res_tamaño_mb, res_tamaño_gb, *[rendimiento.get(col) for col in COLUMNAS_RES],
+        procesador, RAM, nucleos, plogicos, huella,
+        n_paralelo, formato_nucleos(nucleos_asignados), *[sandbox[col] for col in COLUMNAS_SANDBOX],
+        *valores_muestreo(Res_tetis),
+        *valores_recursos(Res_control), *valores_recursos(Res_tetis),
+        *valores_cache(Res_control),
+        valor_telemetria(Res_tetis),
+        *valores_progreso(Res_tetis),
+        *valores_calidad(Res_tetis),
+        almacenamiento, staging_mb, archivo_res,
+        *valores_memoria(Res_control), *valores_memoria(Res_tetis),
+    ]
+
+#%% Cada escenario es un span de la traza; sus fases y ejecutables quedan como hijos
+def escenario_trazado(trabajo, nucleos_asignados):
+    with span("Escenario", modelo=trabajo['modelo'], entrada=trabajo['file'], nucleos=formato_nucleos(nucleos_asignados)):
+        return correr_escenario(trabajo, nucleos_asignados)
+
+#%% Ejecucion concurrente de los trabajos (las ejecuciones contaminadas se reencolan al final)
+col_calidad, col_contaminada = columnas.index('Tetis Calidad'), columnas.index('Tetis Contaminada')
+try:
+    for ronda in range(reintentos_calidad + 1):
+        reencolar = []
+        for trabajo, fila in ejecutar_trabajos(trabajos, escenario_trazado, n_paralelo, nucleos_por_trabajo, fijar_nucleos, control_memoria):
+
+            #%% Guardar la fila en el almacen (una insercion por ejecucion; la contaminada queda marcada)
+            print(f"      Guardando resultados - {def_hora()}")
+            
+            with span("Guardar fila", modelo=trabajo['modelo'], entrada=trabajo['file']):
+                almacen.agregar(fila)
+            
+            if fila[col_contaminada]:
+                print(f"      Ejecucion contaminada {trabajo['file']}: {trabajo['modelo']} (calidad {fila[col_calidad]:.2f}) - {def_hora()}")
+                reencolar.append(trabajo)
+            
+            print(f"      Fin {trabajo['file']}: {trabajo['modelo']} - {def_hora()}")
+            
+            with span("gc"):
+                gc.collect()
         
-        df.to_csv(Res_all, index=False)
-        
-        print(f"      Fin {file}: {modelo} - {def_hora()}")
-        
-        gc.collect()
-        
-    print(f"   Fin modelo: {i+1} de {n_models} - {def_hora()}")
+        if not reencolar or ronda == reintentos_calidad:
+            break
+        print(f"   Reencolando {len(reencolar)} ejecuciones contaminadas - {def_hora()}")
+        if escritura:
+            escritura.esperar()  # Los reencolados se vuelven a copiar a los mismos directorios del scratch
+        trabajos = reencolar
+
+finally:
+    #%% Esperar las escrituras pendientes del scratch
+    if escritura:
+        print(f"Esperando la copia de resultados desde el scratch - {def_hora()}")
+        with span("Esperar escritura"):
+            print(f"Escritura diferida: {escritura.cerrar()}")
+
+    #%% Esperar las compresiones pendientes de los .res
+    if archivador:
+        print(f"Esperando el archivo de los .res - {def_hora()}")
+        with span("Esperar archivo"):
+            print(f"Archivo de resultados: {archivador.cerrar()}")
+        almacen_archivo.exportar_csv(f"{wd_out}Results_archivo_{name_pc}.csv")
+        almacen_archivo.cerrar()
+
+    #%% Exportar los resultados al archivo CSV
+    with span("Exportar csv"):
+        almacen.exportar_csv(Res_all)
+    almacen.cerrar()
+
+    if trazador:
+        trazador.cerrar()
+        activar(None)
 
 print(f"Fin Analisis de Modelos - {def_hora()}")
 
+#%% Control de memoria y error de la prediccion del RSS pico
+if control_memoria:
+    print(f"Control de memoria: {control_memoria.resumen()}")
+tabla_memoria = error_memoria(wd_out)
+if len(tabla_memoria):
+    print(tabla_memoria.to_string(index=False))
+
+#%% Costo del arnes: tiempo de pared de la campaña fuera de los ejecutables y fases que lo explican
+if trazador:
+    resumen_traza, fases = resumir_traza(trazador)
+    fases.to_csv(f"{wd_trazas}Fases_tetis_{name_pc}_{campaña}.csv", index=False)
+    print(f"Arnes: {resumen_traza['Arnes s']:.1f} de {resumen_traza['Pared s']:.1f} s de pared ({resumen_traza['Arnes %'] or 0:.2f} %), "
+          f"ejecutables {resumen_traza['Ejecutables s']:.1f} s, traza {resumen_traza['Traza s']:.4f} s en {resumen_traza['Spans']} spans")
+    print(fases.head(10).to_string(index=False))
+
+#%% Tiempo atribuible al almacenamiento (Fe medidos en el sitio y en el scratch)
+tabla_almacenamiento = comparar_almacenamiento(wd_out)
+if len(tabla_almacenamiento):
+    tabla_almacenamiento.to_csv(f"{wd_out}Almacenamiento_Tetis.csv", index=False)
+    print(tabla_almacenamiento[tabla_almacenamiento['Equipo'].astype(str) == name_pc].to_string(index=False))
+
 #%%#######################################################################################################################
 #################                             FINAL CODIGO                       #########################################
 ##########################################################################################################################
@@ -13,9 +13,10 @@ Created on Mon Jun 17 15:52:39 2024
 """
 
 import os
-import shutil
 import time
 
+from enlaces import instalar_archivo
+
 __author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
 __copyright__ = "Copyright 2024, DDL"
 __credits__ = ["Nicolás Cortés-Torres"]
@@ -57,9 +58,9 @@ def copiar_archivos(src_dir, dst_dir, archivos):
             dst_path = os.path.join(dst_dir, archivo)
            
         if os.path.exists(src_path):
-            # Copiar el archivo al directorio de destino
-            shutil.copy2(src_path, dst_path)
-            # print(f'Archivo {archivo} copiado a {dst_path}')
+            # Copiar el archivo al directorio de destino (reflink si es posible; se omite si ya es igual por hash)
+            modo = instalar_archivo(src_path, dst_path, ("reflink", "copia"))
+            # print(f'Archivo {archivo} ({modo}) en {dst_path}')
         else:
             print(f'Archivo {archivo} no encontrado en {src_path}')
 
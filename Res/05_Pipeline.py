@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import gc
+import pandas as pd
+
+from analisis import ModeloEscalamiento, cargar_resultados, graficar_gantt
+from calidad import DetectorCalidad, COLUMNAS_CALIDAD
+from cache_etapas import CacheEtapas, COLUMNAS_CACHE
+from catalogo import CatalogoModelos
+from ejecucion import run_exe_monitor, benchmark_exe, columnas_etapa, fila_etapa
+from enlaces import instalar_binarios, resumen_sandbox, COLUMNAS_SANDBOX
+from equipo import perfil_equipo, guardar_perfil
+from lector_res import rendimiento_res, COLUMNAS_RES
+from memoria import ModeloMemoria, ControlMemoria, cargar_memoria, celdas_modelo, anotar_memoria, error_memoria, COLUMNAS_MEMORIA, ETAPAS_MEMORIA
+from filessp import PlantillaFileSSP, escribir_filessp
+from planificador import ejecutar_dag, preparar_directorio_ejecucion, prioridades_dag, formato_nucleos, ARCHIVOS_SOLO_LECTURA
+from progreso import seguidor_tetis, tamaños_res, tiempos_fe, COLUMNAS_PROGRESO
+from resultados import AlmacenResultados
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion apra definir la hora actual
+def def_hora():
+    return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
+
+################################################################################
+# Funcion para obtener el tamaño de un archivo en mb y gb
+def tamaño_mb_gb(ruta):
+    if not os.path.isfile(ruta):
+        return None, None
+    tamaño_mb = os.path.getsize(ruta) / 1024 / 1024
+    return tamaño_mb, tamaño_mb / 1024
+
+#%%###############################################################################################################
+##### Pipeline Toparc -> Hantec -> Control -> Tetis para todos los modelos - TESIS PHD #######
+################################################################################################################
+tic = time.time()
+
+print(f"Inicia código - {def_hora()}")
+
+# Paths de trabajo
+name_pc = None #Nombre del ordenador a analizar (None: nombre detectado del equipo, ej. "GIMHABOG")
+wd_path = "D:/Mod_rendimientos/Modelos/" #Ubicación de los modelos a analizar
+wd_tetis = "C:/Tetis9/bin/"  # Directorio de los archivos TETIS .exe
+wd_out = "D:/Mod_rendimientos/Res/" #Ubicación de los resultados del codigo
+
+monitor_file = "D:/Mod_rendimientos/Monitor/monitoreo.csv"
+equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"  # Informe de HWiNFO (si no existe, el equipo se detecta con psutil)
+col_monitor = "Relojes núcleo (avg) [MHz]"  # Asegúrate que coincide exactamente con el nombre de la columna
+muestreo_psutil = 1.0  # Intervalo (s) del muestreador psutil (None para desactivarlo)
+repeticiones = 1  # Corridas medidas por ejecutable (se reporta la mediana, IQR, min e IC bootstrap)
+calentamiento = 0  # Corridas previas de calentamiento que se descartan
+wd_telemetria = f"{wd_out}Telemetria/"  # Archivo de series de cada ejecucion (.npy por id de ejecucion); None para no guardarlas
+wd_cache = None  # Cache de salidas de Control por hash de sus entradas, ej. f"{wd_out}Cache/" (hashea toda la carpeta del modelo); None para ejecutarlo siempre
+ventana_estancado = None  # s sin crecer Fichero_resultados.res para detener Tetis como STALLED (None: sin limite; activar solo si Tetis escribe el .res durante la simulacion)
+factor_timeout = 3.0  # Tetis se detiene como TIMEOUT al superar factor x tiempo de ejecuciones anteriores del mismo Fe en el equipo (sin ellas no hay limite); None: sin limite
+columnas_calidad = {  # Columnas de HWiNFO para la calidad de la medicion (las que no esten en monitoreo.csv se ignoran)
+    'temperatura': "Paquete de CPU [°C]",
+    'potencia': "Potencia del paquete de CPU [W]",
+    'limite_pl1': "IA: Límite de potencia PL1 [Sí/No]",
+    'limite_termico': "IA: Límite térmico [Sí/No]",
+}
+umbral_calidad = 0.9  # Calidad minima (0-1) de una ejecucion de Tetis; por debajo se marca contaminada
+reintentos_calidad = 1  # Veces que un Fe contaminado (Control + Tetis) se vuelve a encolar al final del DAG (0: solo se marca)
+
+# Planificacion del DAG
+presupuesto_nucleos = None  # Nucleos logicos que usa la campaña (None: todos los disponibles)
+nucleos_tarea = {"FileSSP": 0, "Toparc": 1, "Hantec": 1, "Control": 1, "Tetis": 1}  # Nucleos que reserva cada tipo de tarea
+fijar_nucleos = True  # Fijar cada tarea a sus nucleos reservados
+fraccion_ram = 0.8  # Fraccion de la RAM disponible al inicio que pueden reservar las tareas en curso (RSS pico predicho); una tarea que no cabe espera. None: sin control de memoria
+wd_runs = None  # Directorio para ejecutar cada Fe aislado (permite varios Fe del mismo modelo a la vez); None: los Fe de un modelo se ejecutan uno tras otro en el modelo
+# Entradas de solo lectura que se enlazan en wd_runs (extensiones, nombres o carpetas); el resto del modelo se copia o
+# se clona, de modo que una escritura de Control o Tetis no llega al modelo. Agregar aqui solo entradas que nada reescribe
+archivos_enlazables = list(ARCHIVOS_SOLO_LECTURA)
+
+if not os.path.exists(wd_out): #Verifica que existe la carpeta de resultados y la crea
+    os.makedirs(wd_out)
+
+#%% Extraer info del equipo
+print(f"Extraer info del equipo - {def_hora()}")
+
+perfil = perfil_equipo(equipo_file) # Informe de HWiNFO o deteccion con psutil/platform
+huella = guardar_perfil(perfil, wd_out) # Hash del hardware, se guarda en cada fila
+detector = DetectorCalidad(perfil, columnas_calidad, umbral_calidad=umbral_calidad) # Throttling y perturbaciones de cada ejecucion
+
+name_pc = name_pc or perfil['nombre']
+procesador = perfil['procesador']
+memoria_ram_gb = perfil['ram_gb']
+nucleos = perfil['nucleos']
+procesadores_logicos = perfil['procesadores_logicos']
+campaña = time.strftime("%Y%m%d_%H%M%S")
+
+# Catalogo de modelos en la ruta (celdas, archivos y ficheros Fe, guardado entre corridas)
+catalogo = CatalogoModelos(wd_path, f"{wd_out}catalogo_modelos.json")
+cache = CacheEtapas(wd_cache) if wd_cache else None
+
+# Tiempos estimados con las leyes de escalamiento medidas (solo para priorizar la ruta critica)
+try:
+    modelo_tiempos = ModeloEscalamiento(cargar_resultados(wd_out))
+except Exception:
+    modelo_tiempos = None
+tamaños = tamaños_res(wd_out)  # Tamaño del .res de ejecuciones anteriores (progreso de Tetis)
+tiempos = tiempos_fe(wd_out)  # Tiempo de Tetis de ejecuciones anteriores de cada Fe en el equipo (ETA y TIMEOUT)
+
+def estimar(etapa, celdas):
+    if etapa in ("FileSSP", "Control"):
+        return 0.0
+    try:
+        return float(modelo_tiempos.predict(celdas, huella, etapa)['tiempo_s'])
+    except Exception:
+        return float(celdas or 1)
+
+# RSS pico predicho de cada ejecutable con las ejecuciones anteriores; se reajusta con cada ejecucion
+modelo_memoria = ModeloMemoria(cargar_memoria(wd_out))
+control_memoria = ControlMemoria(fraccion_ram) if fraccion_ram else None
+rss_estimados = {}  # Prediccion de cada (etapa, modelo) al planificar, para su error
+
+def reserva_memoria(entrada, etapa):
+    if etapa not in ETAPAS_MEMORIA:
+        return None
+    if (etapa, entrada['carpeta']) not in rss_estimados:  # Sin Topolco (antes de Toparc) se cuentan las celdas del raster de cotas
+        celdas = celdas_modelo(f"{wd_path}{entrada['carpeta']}/", entrada['celdas'])
+        rss_estimados[(etapa, entrada['carpeta'])] = modelo_memoria.predict(celdas, etapa)
+    prediccion = rss_estimados[(etapa, entrada['carpeta'])]
+    return prediccion['reserva_mb'] if prediccion else None
+
+def registrar_memoria(entrada, etapa, resultado):
+    prediccion = rss_estimados.get((etapa, entrada['carpeta']))
+    medido = anotar_memoria(resultado, prediccion['rss_mb'] if prediccion else None)
+    modelo_memoria.registrar(catalogo.celdas(entrada['carpeta']), etapa, medido)
+
+#%% Crear los almacenes de resultados
+# Archivos propios del pipeline: sus columnas y claves no son las de Rend_Topolco_Hantec.py y 03_Rend_Tetis.py, y
+# compartir sus archivos haria que el ultimo en exportar sobrescribiera el CSV del otro. Los nombres siguen el patron
+# Results_tetis_* / Results_toparc_hantec_* que leen los ajustes (analisis.leer_resultados)
+print(f"Creando almacen de resultados - {def_hora()}")
+
+comunes = ['Procesador', 'Memoria Ram Gb', 'Nucleos', 'Procesadores logicos', 'Huella equipo', 'Concurrencia', 'Nucleos asignados', *COLUMNAS_SANDBOX]
+columnas_th = [
+    'Equipo', 'Cuenca', 'Escala', 'Escenario', 'Modelo', 'Celdas',
+    *columnas_etapa("Toparc", COLUMNAS_MEMORIA), *columnas_etapa("Hantec", COLUMNAS_MEMORIA),
+    'Tamaño Topolco mb', 'Tamaño Topolco gb', 'Tamaño Hantec mb', 'Tamaño Hantec gb',
+    *comunes,
+]
+columnas_tetis = [
+    'Equipo', 'Cuenca', 'Escala', 'Escenario', 'Modelo', 'Celdas', 'Entrada',
+    *columnas_etapa("Tetis", COLUMNAS_PROGRESO + COLUMNAS_CALIDAD + COLUMNAS_MEMORIA), 'Tamaño Res mb', 'Tamaño Res gb', *COLUMNAS_RES,
+    *comunes, *columnas_etapa("Control", COLUMNAS_CACHE + COLUMNAS_MEMORIA),
+]
+columnas_tareas = [
+    'Equipo', 'Huella equipo', 'Campaña', 'Modelo', 'Entrada', 'Etapa', 'Tarea', 'Estado',
+    'Inicio s', 'Fin s', 'Duracion s', 'Prioridad', 'Nucleos asignados', 'Error',
+]
+
+Res_pipeline_th = f"{wd_out}Results_toparc_hantec_pipeline_{name_pc}"  # .sqlite y .csv
+Res_pipeline_tetis = f"{wd_out}Results_tetis_pipeline_{name_pc}"  # .sqlite y .csv
+almacen_th = AlmacenResultados(f"{Res_pipeline_th}.sqlite", "toparc_hantec", columnas_th, clave=('Equipo', 'Modelo'))
+almacen_tetis = AlmacenResultados(f"{Res_pipeline_tetis}.sqlite", "tetis", columnas_tetis)
+almacen_tareas = AlmacenResultados(f"{wd_out}Results_pipeline_{name_pc}.sqlite", "tareas", columnas_tareas, clave=('Equipo', 'Campaña', 'Tarea'))
+hechos_th = almacen_th.completados('Hantec Time') # Modelos preprocesados en corridas anteriores
+hechos_tetis = almacen_tetis.completados('Tetis Time', 'Tetis Contaminada') # Fe ejecutados (sin contaminar) en corridas anteriores
+
+#%% Funciones de las tareas
+resultados_toparc = {}  # Resultado de Toparc de cada modelo, para la fila de Hantec
+resultados_control = {}  # Resultado de Control de cada (modelo, Fe), para la fila de Tetis
+sandboxes = {}  # Costo de preparar el directorio de cada modelo o (modelo, Fe)
+filessp = {}  # FileSSP generado en memoria para cada modelo o (modelo, Fe), antes de ejecutar
+
+def datos_fila(entrada, nucleos_asignados):
+    return {
+        'Equipo': name_pc, 'Cuenca': entrada['cuenca'], 'Escala': entrada['escala'],
+        'Escenario': entrada['escenario'], 'Modelo': entrada['modelo'],
+        'Procesador': procesador, 'Memoria Ram Gb': memoria_ram_gb, 'Nucleos': nucleos,
+        'Procesadores logicos': procesadores_logicos, 'Huella equipo': huella,
+        'Concurrencia': "DAG", 'Nucleos asignados': formato_nucleos(nucleos_asignados),
+    }
+
+def tarea_filessp(entrada, nucleos_asignados):
+    wd_model = f"{wd_path}{entrada['carpeta']}/"
+    escribir_filessp(wd_model, filessp[entrada['carpeta']])  # FileSSP.txt y .tet con la ruta del modelo (renderizado desde la plantilla leida)
+    t_sandbox = time.perf_counter()
+    modos = instalar_binarios(wd_tetis, ["Toparc.exe", "Hantec.exe", "Control.exe", "Tetis.exe"], wd_model)
+    sandboxes[entrada['carpeta']] = resumen_sandbox(modos, time.perf_counter() - t_sandbox)
+
+def tarea_toparc(entrada, nucleos_asignados):
+    wd_model = f"{wd_path}{entrada['carpeta']}/"
+    Res_toparc = benchmark_exe("Toparc.exe", wd_model, monitor_file, col_monitor, repeticiones, calentamiento, muestreo_psutil, nucleos_asignados, wd_telemetria)
+    if Res_toparc[0] == "NOT EXECUTABLE":
+        raise RuntimeError(f"Toparc no se ejecutó: {entrada['carpeta']}")
+    registrar_memoria(entrada, "Toparc", Res_toparc)
+    resultados_toparc[entrada['carpeta']] = Res_toparc
+
+def tarea_hantec(entrada, nucleos_asignados):
+    wd_model = f"{wd_path}{entrada['carpeta']}/"
+    Res_hantec = benchmark_exe("Hantec.exe", wd_model, monitor_file, col_monitor, repeticiones, calentamiento, muestreo_psutil, nucleos_asignados, wd_telemetria)
+    if Res_hantec[0] == "NOT EXECUTABLE":
+        raise RuntimeError(f"Hantec no se ejecutó: {entrada['carpeta']}")
+    registrar_memoria(entrada, "Hantec", Res_hantec)
+    topolco_mb, topolco_gb = tamaño_mb_gb(f"{wd_model}Topolco.sds")
+    hantec_mb, hantec_gb = tamaño_mb_gb(f"{wd_model}Hantec.sds")
+    return {
+        **datos_fila(entrada, nucleos_asignados), **sandboxes.get(entrada['carpeta'], {}), 'Celdas': catalogo.celdas(entrada['carpeta']),
+        **fila_etapa("Toparc", resultados_toparc.pop(entrada['carpeta']), COLUMNAS_MEMORIA), **fila_etapa("Hantec", Res_hantec, COLUMNAS_MEMORIA),
+        'Tamaño Topolco mb': topolco_mb, 'Tamaño Topolco gb': topolco_gb,
+        'Tamaño Hantec mb': hantec_mb, 'Tamaño Hantec gb': hantec_gb,
+    }
+
+def directorio_fe(entrada, file):
+    return f"{wd_runs}{entrada['carpeta']}/{file}/" if wd_runs else f"{wd_path}{entrada['carpeta']}/"
+
+def tarea_control(entrada, file, nucleos_asignados):
+    wd_model = f"{wd_path}{entrada['carpeta']}/"
+    wd_run = directorio_fe(entrada, file)
+    t_sandbox = time.perf_counter()
+    modos = {}
+    if wd_runs:
+        modos = preparar_directorio_ejecucion(wd_model, wd_run, [f"Fe/{file}.txt"], enlazables=archivos_enlazables, mutables=cache.salidas_conocidas() if cache else ())
+    modos.update(instalar_binarios(wd_tetis, ["Control.exe", "Tetis.exe"], wd_run))
+    sandboxes[(entrada['carpeta'], file)] = resumen_sandbox(modos, time.perf_counter() - t_sandbox)
+
+    escribir_filessp(wd_run, filessp[(entrada['carpeta'], file)])
+
+    control = lambda: run_exe_monitor("Control.exe", wd_run, monitor_file, col_monitor, None, nucleos_asignados)
+    Res_control = cache.ejecutar("Control", wd_run, control, os.path.join(wd_run, "Control.exe")) if cache else control()
+    if Res_control[0] == "NOT EXECUTABLE" or Res_control.extra.get('Codigo salida'):
+        raise RuntimeError(f"Control falló: {entrada['carpeta']} {file}")
+    registrar_memoria(entrada, "Control", Res_control)
+    resultados_control[(entrada['carpeta'], file)] = Res_control
+
+def tarea_tetis(entrada, file, nucleos_asignados):
+    wd_run = directorio_fe(entrada, file)
+    progreso = seguidor_tetis(wd_run, file, catalogo.celdas(entrada['carpeta']), huella, modelo_tiempos,
+                              tamaños.get((entrada['modelo'], file)), ventana_estancado, factor_timeout,
+                              tiempos.get((huella, entrada['modelo'], file)))
+    Res_tetis = benchmark_exe("Tetis.exe", wd_run, monitor_file, col_monitor, repeticiones, calentamiento, muestreo_psutil, nucleos_asignados, wd_telemetria, progreso, detector)
+    registrar_memoria(entrada, "Tetis", Res_tetis)
+    res_mb, res_gb = tamaño_mb_gb(f"{wd_run}Fichero_resultados.res") if Res_tetis[0] != "NOT EXECUTABLE" else ("NOT EXECUTABLE",) * 2
+    celdas = catalogo.celdas(entrada['carpeta'])
+    rendimiento = rendimiento_res(f"{wd_run}Fichero_resultados.res", celdas, Res_tetis[0], Res_tetis[8]) if Res_tetis[0] != "NOT EXECUTABLE" else {}
+    return {
+        **datos_fila(entrada, nucleos_asignados), **sandboxes.pop((entrada['carpeta'], file)), 'Celdas': celdas, 'Entrada': file,
+        **fila_etapa("Tetis", Res_tetis, COLUMNAS_PROGRESO + COLUMNAS_CALIDAD + COLUMNAS_MEMORIA), 'Tamaño Res mb': res_mb, 'Tamaño Res gb': res_gb, **rendimiento,
+        **fila_etapa("Control", resultados_control.pop((entrada['carpeta'], file)), COLUMNAS_CACHE + COLUMNAS_MEMORIA),
+    }
+
+#%% Construir el DAG de cada modelo: FileSSP -> Toparc -> Hantec -> Control (Fe) -> Tetis (Fe)
+tareas = []
+
+def tarea(entrada, etapa, funcion, depende, file=None, ronda=0):
+    tareas.append({
+        'id': f"{etapa}:{entrada['carpeta']}" + (f":{file}" if file else "") + (f"#{ronda}" if ronda else ""),
+        'etapa': etapa, 'modelo': entrada['modelo'], 'catalogo': entrada,
+        'entrada': file, 'funcion': funcion, 'depende': depende,
+        'nucleos': nucleos_tarea[etapa], 'estimado': estimar(etapa, entrada['celdas']),
+        'memoria_mb': reserva_memoria(entrada, etapa),
+    })
+    return tareas[-1]['id']
+
+def tareas_fe(entrada, file, previa, ronda=0):
+    control = tarea(entrada, "Control", lambda n, e=entrada, f=file: tarea_control(e, f, n), previa, file, ronda)
+    return tarea(entrada, "Tetis", lambda n, e=entrada, f=file: tarea_tetis(e, f, n), [control], file, ronda)
+
+for entrada in catalogo.modelos():
+    carpeta, modelo = entrada['carpeta'], entrada['modelo']
+    pendientes_fe = [file for file in entrada['fe'] if (name_pc, modelo, file) not in hechos_tetis]
+    preprocesar = (name_pc, modelo) not in hechos_th
+    if not preprocesar and not pendientes_fe:
+        print(f"   Ya ejecutado: {carpeta} - {def_hora()}")
+        continue
+
+    plantilla = PlantillaFileSSP(f"{wd_path}{carpeta}/FileSSP.tet")  # Se lee una vez por modelo
+    filessp[carpeta] = plantilla.renderizar(f"{wd_path}{carpeta}/")
+    for file in pendientes_fe:
+        filessp[(carpeta, file)] = plantilla.renderizar(directorio_fe(entrada, file), f"Fe/{file}.txt")
+
+    previa = tarea(entrada, "FileSSP", lambda n, e=entrada: tarea_filessp(e, n), [])
+    if preprocesar:
+        previa = tarea(entrada, "Toparc", lambda n, e=entrada: tarea_toparc(e, n), [previa])
+        previa = tarea(entrada, "Hantec", lambda n, e=entrada: tarea_hantec(e, n), [previa])
+    for file in pendientes_fe:
+        tetis = tareas_fe(entrada, file, [previa])
+        if not wd_runs:
+            previa = tetis  # Sin directorios aislados los Fe del modelo se ejecutan uno tras otro
+
+prioridad = prioridades_dag(tareas)
+print(f"Inicio pipeline: {len(tareas)} tareas - {def_hora()}")
+
+#%% Ejecucion del DAG (los Fe contaminados se reencolan al final como Control -> Tetis)
+duraciones = {}
+pendientes = tareas
+try:
+    for ronda in range(reintentos_calidad + 1):
+        reencolar = []
+        for t, resultado, registro in ejecutar_dag(pendientes, presupuesto_nucleos, fijar_nucleos, control_memoria):
+            print(f"      {registro['estado']} {t['id']} - {def_hora()}")
+            if registro['estado'] == "OK" and t['etapa'] == "Hantec":
+                almacen_th.agregar(resultado)
+            if registro['estado'] == "OK" and t['etapa'] == "Tetis":
+                almacen_tetis.agregar(resultado)
+                if resultado.get('Tetis Contaminada'):
+                    print(f"      Ejecucion contaminada {t['id']} (calidad {resultado['Tetis Calidad']:.2f}) - {def_hora()}")
+                    reencolar.append(t)
+            if registro['inicio'] is not None:
+                duraciones[t['id']] = registro['fin'] - registro['inicio']
+
+            almacen_tareas.agregar({
+                'Equipo': name_pc, 'Huella equipo': huella, 'Campaña': campaña, 'Modelo': t['modelo'],
+                'Entrada': t['entrada'], 'Etapa': t['etapa'], 'Tarea': t['id'], 'Estado': registro['estado'],
+                'Inicio s': registro['inicio'], 'Fin s': registro['fin'], 'Prioridad': prioridad[t['id']],
+                'Duracion s': duraciones.get(t['id']), 'Nucleos asignados': formato_nucleos(registro['nucleos']),
+                'Error': registro['error'],
+            })
+            gc.collect()
+
+        if not reencolar or ronda == reintentos_calidad:
+            break
+        print(f"   Reencolando {len(reencolar)} Fe contaminados - {def_hora()}")
+        inicio = len(tareas)
+        previas = {}
+        for t in reencolar:
+            carpeta = t['catalogo']['carpeta']
+            tetis = tareas_fe(t['catalogo'], t['entrada'], previas.get(carpeta, []), ronda + 1)
+            if not wd_runs:
+                previas[carpeta] = [tetis]  # Sin directorios aislados los Fe del modelo se ejecutan uno tras otro
+        pendientes = tareas[inicio:]
+        prioridad.update(prioridades_dag(pendientes))
+
+finally:
+    #%% Exportar resultados, tareas y diagrama de Gantt
+    print(f"Guardando resultados - {def_hora()}")
+    almacen_th.exportar_csv(f"{Res_pipeline_th}.csv")
+    almacen_tetis.exportar_csv(f"{Res_pipeline_tetis}.csv")
+    df_tareas = almacen_tareas.leer(ultimo_por_clave=True)
+    df_tareas = df_tareas[df_tareas['Campaña'] == campaña]
+    df_tareas.to_csv(f"{wd_out}Tareas_pipeline_{name_pc}_{campaña}.csv", index=False)
+    if df_tareas['Inicio s'].notna().any():
+        graficar_gantt(df_tareas, f"{wd_out}Gantt_pipeline_{name_pc}_{campaña}.png")
+    for almacen in (almacen_th, almacen_tetis, almacen_tareas):
+        almacen.cerrar()
+
+# Ruta critica con las duraciones medidas: limite inferior del tiempo de la campaña
+if duraciones:
+    hechas = [t for t in tareas if t['id'] in duraciones]
+    ids = {t['id'] for t in hechas}
+    ruta = prioridades_dag([dict(t, depende=[d for d in t['depende'] if d in ids]) for t in hechas], duraciones)
+    fin = max(pd.to_numeric(df_tareas['Fin s'], errors="coerce").max(), 0)
+    print(f"Campaña {fin:.0f} s; ruta critica {max(ruta.values()):.0f} s; suma de tareas {sum(duraciones.values()):.0f} s")
+
+# Control de memoria y error de la prediccion del RSS pico
+if control_memoria:
+    print(f"Control de memoria: {control_memoria.resumen()}")
+tabla_memoria = error_memoria(wd_out)
+if len(tabla_memoria):
+    print(tabla_memoria.to_string(index=False))
+
+print(f"Fin ejecución - {def_hora()}")
+
+##########################################################################################################################
+#################                             FINAL CODIGO                       #########################################
+##########################################################################################################################
+
+run_time = (time.time() - tic)
+hours_ = run_time // 3600.0
+minutes_ = round((run_time / 3600.0 - hours_) * 60.0, 1)
+text_ = f'Execution total time was {hours_} hours and {minutes_} minutes'
+len_text = len(text_)
+len_print = len_text + 2 * 10
+len_blank = (len_print - 2)
+print(len_print * '#')
+print('#' + len_blank * ' ' + '#')
+print('#' + 9 * ' ' + text_ + 9 * ' ' + '#')
+print('#' + len_blank * ' ' + '#')
+print(len_print * '#')
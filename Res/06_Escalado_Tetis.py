@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import gc
+import pandas as pd
+
+from calidad import DetectorCalidad, COLUMNAS_CALIDAD
+from cache_etapas import CacheEtapas
+from catalogo import CatalogoModelos
+from ejecucion import run_exe_monitor, benchmark_exe, columnas_etapa, fila_etapa
+from enlaces import instalar_binarios
+from equipo import perfil_equipo, guardar_perfil
+from escalado import ubicaciones_nucleos, plan_barrido, entorno_hilos, metricas_escalado, graficar_escalado, valores_escalado, COLUMNAS_ESCALADO, VARIABLES_HILOS
+from filessp import PlantillaFileSSP, escribir_filessp
+from planificador import preparar_directorio_ejecucion, formato_nucleos, ARCHIVOS_SOLO_LECTURA
+from progreso import seguidor_tetis, tamaños_res, COLUMNAS_PROGRESO
+from resultados import AlmacenResultados
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion apra definir la hora actual
+def def_hora():
+    return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
+
+#%%###############################################################################################################
+##### Barrido de nucleos de Tetis (escalamiento fuerte: speedup, eficiencia y Karp-Flatt) - TESIS PHD #######
+################################################################################################################
+tic = time.time()
+
+print(f"Inicia código - {def_hora()}")
+
+# Paths de trabajo
+name_pc = None #Nombre del ordenador a analizar (None: nombre detectado del equipo, ej. "GIMHABOG")
+wd_path = "D:/Mod_rendimientos/Modelos/" #Ubicación de los modelos a analizar
+wd_tetis = "C:/Tetis9/bin/"  # Directorio de los archivos TETIS .exe
+wd_out = "D:/Mod_rendimientos/Res/" #Ubicación de los resultados del codigo
+
+monitor_file = "D:/Mod_rendimientos/Monitor/monitoreo.csv"
+equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"  # Informe de HWiNFO (si no existe, el equipo se detecta con psutil)
+col_monitor = "Relojes núcleo (avg) [MHz]"  # Asegúrate que coincide exactamente con el nombre de la columna
+muestreo_psutil = 1.0  # Intervalo (s) del muestreador psutil (None para desactivarlo)
+repeticiones = 3  # Corridas medidas por conteo de nucleos (se usa la mediana)
+calentamiento = 1  # Corridas previas de calentamiento que se descartan
+wd_telemetria = f"{wd_out}Telemetria/"  # Archivo de series de cada ejecucion; None para no guardarlas
+wd_cache = None  # Cache de salidas de Control por hash de sus entradas, ej. f"{wd_out}Cache/" (hashea toda la carpeta del modelo); None para ejecutarlo siempre
+wd_runs = None  # Directorio para ejecutar el barrido aislado del modelo, ej. "D:/Mod_rendimientos/Runs/"; None ejecuta en el modelo
+# Entradas de solo lectura que se enlazan en wd_runs (extensiones, nombres o carpetas); el resto del modelo se copia o
+# se clona, de modo que una escritura de Control o Tetis no llega al modelo. Agregar aqui solo entradas que nada reescribe
+archivos_enlazables = list(ARCHIVOS_SOLO_LECTURA)
+ventana_estancado = None  # s sin crecer Fichero_resultados.res para detener Tetis como STALLED (None: sin limite; activar solo si Tetis escribe el .res durante la simulacion)
+columnas_calidad = {  # Columnas de HWiNFO para la calidad de la medicion (las que no esten en monitoreo.csv se ignoran)
+    'temperatura': "Paquete de CPU [°C]",
+    'potencia': "Potencia del paquete de CPU [W]",
+    'limite_pl1': "IA: Límite de potencia PL1 [Sí/No]",
+    'limite_termico': "IA: Límite térmico [Sí/No]",
+}
+umbral_calidad = 0.9  # Calidad minima (0-1) de una ejecucion de Tetis; por debajo se marca contaminada
+
+# Barrido
+combinaciones = []  # (carpeta del modelo, Fe) a barrer, ej. [("Cuenca_100_Esc1", "Fe_0_0_1")]; vacia: el primer Fe de cada modelo
+conteos = [1, 2, 4, 6, 8, 12, 16]  # Nucleos logicos por ejecucion (se omiten los que superan los de la ubicacion)
+ubicaciones = ["Todos", "P", "E"]  # Todos los nucleos, solo P-cores o solo E-cores (P y E solo en CPUs hibridas)
+variables_hilos = VARIABLES_HILOS  # Variables de entorno con el numero de hilos (si el ejecutable las respeta); () para no fijarlas
+
+if not os.path.exists(wd_out): #Verifica que existe la carpeta de resultados y la crea
+    os.makedirs(wd_out)
+
+#%% Extraer info del equipo
+print(f"Extraer info del equipo - {def_hora()}")
+
+perfil = perfil_equipo(equipo_file) # Informe de HWiNFO o deteccion con psutil/platform
+huella = guardar_perfil(perfil, wd_out) # Hash del hardware, se guarda en cada fila
+detector = DetectorCalidad(perfil, columnas_calidad, umbral_calidad=umbral_calidad) # Throttling y perturbaciones de cada ejecucion
+
+name_pc = name_pc or perfil['nombre']
+procesador = perfil['procesador']
+memoria_ram_gb = perfil['ram_gb']
+nucleos = perfil['nucleos']
+procesadores_logicos = perfil['procesadores_logicos']
+
+# Nucleos de cada ubicacion (un hilo por nucleo fisico antes que los hermanos de Hyper-Threading)
+orden_ubicaciones = ubicaciones_nucleos(perfil)
+plan = plan_barrido(conteos, orden_ubicaciones, ubicaciones)
+if not plan:
+    raise ValueError("El sistema no permite fijar la afinidad o no hay conteos de nucleos validos para el barrido")
+for nombre, orden in orden_ubicaciones.items():
+    print(f"   Ubicacion {nombre}: {formato_nucleos(orden)}")
+
+catalogo = CatalogoModelos(wd_path, f"{wd_out}catalogo_modelos.json")
+cache = CacheEtapas(wd_cache) if wd_cache else None
+tamaños = tamaños_res(wd_out)  # Tamaño del .res de ejecuciones anteriores (progreso de Tetis)
+plantillas = {}  # FileSSP.tet de cada modelo leido una vez
+if not combinaciones:
+    combinaciones = [(entrada['carpeta'], entrada['fe'][0]) for entrada in catalogo.modelos() if entrada['fe']]
+
+#%% Crear el almacen de resultados (una fila por modelo, Fe, ubicacion y conteo de nucleos)
+print(f"Creando almacen de resultados - {def_hora()}")
+
+columnas = [
+    'Equipo', 'Cuenca', 'Escala', 'Escenario', 'Modelo', 'Celdas', 'Entrada',
+    *COLUMNAS_ESCALADO, 'Nucleos asignados', 'Variables hilos',
+    *columnas_etapa("Tetis", COLUMNAS_PROGRESO + COLUMNAS_CALIDAD),
+    'Procesador', 'Memoria Ram Gb', 'Nucleos', 'Procesadores logicos', 'Huella equipo',
+    *columnas_etapa("Control"),
+]
+
+Res_all = f"{wd_out}Results_escalado_{name_pc}.csv"
+almacen = AlmacenResultados(f"{wd_out}Results_escalado_{name_pc}.sqlite", "escalado", columnas,
+                            clave=('Equipo', 'Modelo', 'Entrada', 'Ubicacion', 'Hilos'))
+completados = almacen.completados('Tetis Time', 'Tetis Contaminada') # Conteos validos medidos en corridas anteriores
+
+#%% Tiempos medidos de una ubicacion (para la base del speedup al reanudar)
+def tiempos_ubicacion(modelo, file, ubicacion):
+    df = almacen.leer()
+    df = df[(df['Modelo'].astype(str) == modelo) & (df['Entrada'].astype(str) == file) & (df['Ubicacion'] == ubicacion)]
+    df = df[pd.to_numeric(df['Tetis Contaminada'], errors="coerce").fillna(0) == 0] if 'Tetis Contaminada' in df.columns else df
+    tiempos = pd.to_numeric(df['Tetis Time'], errors="coerce")  # "NOT EXECUTABLE", "TIMEOUT" -> NaN (los enteros tambien cuentan)
+    tiempos.index = df['Hilos']
+    return {int(n): float(t) for n, t in tiempos.dropna().items()}
+
+#%% Bucle de las combinaciones: Control una vez y Tetis en cada ubicacion y conteo de nucleos
+print(f"Inicio Barrido de Nucleos - {def_hora()}")
+
+try:
+    for carpeta, file in combinaciones:
+        entrada = catalogo.modelo(carpeta)
+        modelo, celdas = entrada['modelo'], entrada['celdas']
+        pendientes = [(u, n, grupo) for u, n, grupo in plan if (name_pc, modelo, file, u, str(n)) not in completados]
+        if not pendientes:
+            print(f"   Ya barrido {file}: {carpeta} - {def_hora()}")
+            continue
+
+        #%% Directorio de ejecucion, FileSSP y Control (sin fijar nucleos, una vez por combinacion)
+        wd_model = f"{wd_path}{carpeta}/"
+        wd_run = f"{wd_runs}{carpeta}/{file}/" if wd_runs else wd_model
+        if wd_runs:
+            preparar_directorio_ejecucion(wd_model, wd_run, [f"Fe/{file}.txt"], enlazables=archivos_enlazables, mutables=cache.salidas_conocidas() if cache else ())
+        instalar_binarios(wd_tetis, ["Control.exe", "Tetis.exe"], wd_run)
+        if carpeta not in plantillas:  # Se lee una vez: en el modelo cada combinacion reescribe FileSSP.tet
+            plantillas[carpeta] = PlantillaFileSSP(f"{wd_model}FileSSP.tet")
+        escribir_filessp(wd_run, plantillas[carpeta].renderizar(wd_run, f"Fe/{file}.txt"))
+
+        print(f"      Ejecutando Control {file}: {carpeta} - {def_hora()}")
+        control = lambda: run_exe_monitor("Control.exe", wd_run, monitor_file, col_monitor)
+        Res_control = cache.ejecutar("Control", wd_run, control, os.path.join(wd_run, "Control.exe")) if cache else control()
+        if Res_control[0] == "NOT EXECUTABLE" or Res_control.extra.get('Codigo salida'):
+            print(f"      Control falló, se omite {file}: {carpeta} - {def_hora()}")
+            continue
+
+        #%% Tetis en cada ubicacion, de menor a mayor numero de nucleos (el menor es la base)
+        tiempos = {}
+        for ubicacion, n, grupo in pendientes:
+            if ubicacion not in tiempos:
+                tiempos[ubicacion] = tiempos_ubicacion(modelo, file, ubicacion)
+            entorno = entorno_hilos(n, variables_hilos)
+            print(f"       Tetis {file} con {n} hilos ({ubicacion}: {formato_nucleos(grupo)}): {carpeta} - {def_hora()}")
+
+            progreso = seguidor_tetis(wd_run, file, celdas, huella, None, tamaños.get((modelo, file)), ventana_estancado)
+            Res_tetis = benchmark_exe("Tetis.exe", wd_run, monitor_file, col_monitor, repeticiones, calentamiento,
+                                      muestreo_psutil, grupo, wd_telemetria, progreso, detector, entorno)
+            if not Res_tetis.extra.get('Contaminada'):
+                tiempos[ubicacion][n] = Res_tetis[0]
+            metricas = metricas_escalado(tiempos[ubicacion]).get(n)
+
+            #%% Guardar la fila (speedup respecto del menor conteo medido en la ubicacion)
+            almacen.agregar({
+                'Equipo': name_pc, 'Cuenca': entrada['cuenca'], 'Escala': entrada['escala'],
+                'Escenario': entrada['escenario'], 'Modelo': modelo, 'Celdas': celdas, 'Entrada': file,
+                **dict(zip(COLUMNAS_ESCALADO, valores_escalado(ubicacion, n, metricas))),
+                'Nucleos asignados': formato_nucleos(grupo), 'Variables hilos': " ".join(entorno),
+                **fila_etapa("Tetis", Res_tetis, COLUMNAS_PROGRESO + COLUMNAS_CALIDAD),
+                'Procesador': procesador, 'Memoria Ram Gb': memoria_ram_gb, 'Nucleos': nucleos,
+                'Procesadores logicos': procesadores_logicos, 'Huella equipo': huella,
+                **fila_etapa("Control", Res_control),
+            })
+            if metricas:
+                print(f"       Speedup {metricas['Speedup']:.2f}, eficiencia {metricas['Eficiencia %']:.0f}% - {def_hora()}")
+            gc.collect()
+
+finally:
+    #%% Exportar los resultados y las curvas de escalamiento fuerte
+    df = almacen.exportar_csv(Res_all)
+    almacen.cerrar()
+    if len(df):
+        graficar_escalado(df, ruta_png=f"{wd_out}Escalado_{name_pc}.png")
+
+print(f"Fin Barrido de Nucleos - {def_hora()}")
+
+#%%#######################################################################################################################
+#################                             FINAL CODIGO                       #########################################
+##########################################################################################################################
+
+run_time = (time.time() - tic)
+hours_ = run_time // 3600.0
+minutes_ = round((run_time / 3600.0 - hours_) * 60.0, 1)
+text_ = f'Execution total time was {hours_} hours and {minutes_} minutes'
+len_text = len(text_)
+len_print = len_text + 2 * 10
+len_blank = (len_print - 2)
+print(len_print * '#')
+print('#' + len_blank * ' ' + '#')
+print('#' + 9 * ' ' + text_ + 9 * ' ' + '#')
+print('#' + len_blank * ' ' + '#')
+print(len_print * '#')
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+
+from generador_modelos import generar_modelo, carpeta_modelo, ESCALAS, REGLAS_RESAMPLEO
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion apra definir la hora actual
+def def_hora():
+    return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
+
+#%%###############################################################################################################
+##### Generar los modelos de cada escala a partir de un modelo base - TESIS PHD #######
+################################################################################################################
+tic = time.time()
+
+print(f"Inicia código - {def_hora()}")
+
+# Paths de trabajo
+wd_base = "D:/Mod_rendimientos/Base/Mod_Jucar_30m_Esc1/"  # Modelo base (resolucion mas fina) con nombre <prefijo>_<cuenca>_<escala>_<escenario>
+wd_path = "D:/Mod_rendimientos/Modelos/"  # Ubicación de los modelos generados (la que recorren los scripts de ejecucion)
+escalas = ["30m", "200m", "500m", "1k", "2p5", "5k"]  # Escalas a generar (claves de ESCALAS); la escala del modelo base se regenera a su misma resolucion
+n_hilos = None  # Hilos para remuestrear cada raster por bloques (None: todos los nucleos)
+reglas_resampleo = REGLAS_RESAMPLEO  # (patron del nombre del raster, metodo de rasterio, escalar por area)
+
+prefijo, cuenca, escala_base, escenario = os.path.basename(os.path.normpath(wd_base)).split('_')[:4]
+
+#%% Bucle de las escalas
+for escala in escalas:
+    carpeta = carpeta_modelo(prefijo, cuenca, escala, escenario)
+    print(f"   Generando {carpeta} ({ESCALAS[escala]} m) - {def_hora()}")
+
+    generados = generar_modelo(wd_base, f"{wd_path}{carpeta}/", ESCALAS[escala], reglas_resampleo, n_hilos)
+    for g in generados:
+        print(f"      {g['raster']}: {g['origen']} -> {g['destino']} ({g['metodo']}{', por area' if g['escalar'] else ''}) en {g['segundos']:.1f} s")
+    if not generados:
+        print(f"      Ya generado: {carpeta}")
+
+print(f"Fin Generacion de Modelos - {def_hora()}")
+
+#%%#######################################################################################################################
+#################                             FINAL CODIGO                       #########################################
+##########################################################################################################################
+
+run_time = (time.time() - tic)
+hours_ = run_time // 3600.0
+minutes_ = round((run_time / 3600.0 - hours_) * 60.0, 1)
+text_ = f'Execution total time was {hours_} hours and {minutes_} minutes'
+len_text = len(text_)
+len_print = len_text + 2 * 10
+len_blank = (len_print - 2)
+print(len_print * '#')
+print('#' + len_blank * ' ' + '#')
+print('#' + 9 * ' ' + text_ + 9 * ' ' + '#')
+print('#' + len_blank * ' ' + '#')
+print(len_print * '#')
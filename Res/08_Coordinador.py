@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+
+from catalogo import CatalogoModelos
+from coordinador import ColaCampaña, expandir_campaña, servir_cola
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion apra definir la hora actual
+def def_hora():
+    return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
+
+#%%###############################################################################################################
+##### Coordinar una campaña de Tetis en varios equipos - TESIS PHD #######
+################################################################################################################
+tic = time.time()
+
+print(f"Inicia código - {def_hora()}")
+
+# Paths de trabajo (carpeta compartida que ven todos los equipos)
+wd_path = "//Servidor/Mod_rendimientos/Modelos/"  # Ubicación de los modelos de la campaña
+wd_out = "//Servidor/Mod_rendimientos/Res/"  # Ubicación de los resultados del codigo
+wd_cola = "D:/Mod_rendimientos/Cola/"  # Disco local del coordinador para la cola (no una carpeta de red: SQLite no bloquea bien sobre SMB)
+ruta_cola = f"{wd_cola}Cola_tetis.sqlite"  # Cola de trabajos; los trabajadores (09_Trabajador.py) la usan a traves de este proceso
+direccion_cola = ("", 50000)  # (equipo, puerto) donde se sirve la cola a los trabajadores ("": todas las interfaces)
+clave_cola = b"clave_campana_1"  # Clave que deben usar los trabajadores para conectarse
+
+campaña = "Campaña_1"  # Nombre de la campaña (volver a ejecutar con el mismo nombre la reanuda: los trabajos existentes no se duplican)
+repeticiones = 1  # Ejecuciones de cada Fe en la campaña
+equipos = None  # Nombres o huellas de los equipos que deben ejecutar toda la matriz (comparar hardware), ej. ["GIMHABOG", "GIMHAVAL"]; None: cada Fe lo ejecuta el primer equipo libre
+duracion_lease = 600  # s que un trabajo queda a nombre de un trabajador sin latidos antes de volver a la cola
+max_intentos = 3  # Leases de un trabajo (vencidos o con error) antes de marcarlo ERROR
+intervalo_estado = 60  # s entre revisiones de la cola (recuperar leases vencidos, exportar resultados)
+
+if not os.path.exists(wd_out): #Verifica que existe la carpeta de resultados y la crea
+    os.makedirs(wd_out)
+if not os.path.exists(wd_cola): #Verifica que existe la carpeta de la cola y la crea
+    os.makedirs(wd_cola)
+
+Res_all = f"{wd_out}Results_tetis_cola_{campaña}.csv"  # Resultados de todos los equipos (cargar_resultados lo lee con los Results_tetis_*.csv)
+
+#%% Expandir la campaña: modelos x Fe x repeticiones (x equipos)
+print(f"Expandiendo la campaña {campaña} - {def_hora()}")
+
+catalogo = CatalogoModelos(wd_path, f"{wd_out}catalogo_modelos.json")
+trabajos = expandir_campaña(catalogo.modelos(), repeticiones, equipos or (None,))
+
+cola = ColaCampaña(ruta_cola, campaña, duracion_lease, max_intentos)
+nuevos = cola.agregar(trabajos)
+print(f"   {len(trabajos)} trabajos en la campaña, {nuevos} nuevos en la cola: {cola.resumen()}")
+
+#%% Servir la cola y seguirla: recuperar leases vencidos y exportar los resultados de todos los equipos
+# Los trabajadores solo pueden tomar trabajos mientras este proceso sigue en ejecucion
+servidor = servir_cola(cola, direccion_cola, clave_cola)
+print(f"   Cola servida en el puerto {servidor.address[1]} - {def_hora()}")
+try:
+    while True:
+        recuperados = cola.recuperar_vencidos()
+        if recuperados:
+            print(f"   {recuperados} trabajos con el lease vencido vuelven a la cola - {def_hora()}")
+        cola.exportar_csv(Res_all)
+        print(f"   Estado de la cola: {cola.resumen()} - {def_hora()}")
+        if not cola.pendientes():
+            break
+        time.sleep(intervalo_estado)
+
+    df = cola.exportar_csv(Res_all)
+    print(f"Resultados de la cola: {len(df)} filas en {Res_all}")
+
+    #%% Trabajos con error (sin resultados tras max_intentos)
+    estado = cola.trabajos()
+    errores = estado[estado['estado'] == "ERROR"]
+    if len(errores):
+        print(f"Trabajos con error: {len(errores)}")
+        print(errores[['id', 'intentos', 'equipo', 'error']].to_string(index=False))
+    if len(df):
+        print(df.groupby('Equipo').size().rename("Trabajos hechos").to_string())
+finally:
+    cola.cerrar()
+
+print(f"Fin Coordinacion - {def_hora()}")
+
+#%%#######################################################################################################################
+#################                             FINAL CODIGO                       #########################################
+##########################################################################################################################
+
+run_time = (time.time() - tic)
+hours_ = run_time // 3600.0
+minutes_ = round((run_time / 3600.0 - hours_) * 60.0, 1)
+text_ = f'Execution total time was {hours_} hours and {minutes_} minutes'
+len_text = len(text_)
+len_print = len_text + 2 * 10
+len_blank = (len_print - 2)
+print(len_print * '#')
+print('#' + len_blank * ' ' + '#')
+print('#' + 9 * ' ' + text_ + 9 * ' ' + '#')
+print('#' + len_blank * ' ' + '#')
+print(len_print * '#')
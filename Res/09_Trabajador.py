@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import gc
+import glob
+import time
+import shutil
+import subprocess
+import psutil
+
+from catalogo import CatalogoModelos
+from coordinador import conectar_cola, trabajar
+from ejecucion import run_exe_monitor, benchmark_exe, fila_etapa
+from enlaces import instalar_binarios
+from equipo import perfil_equipo, guardar_perfil
+from filessp import PlantillaFileSSP, escribir_filessp
+from lector_res import rendimiento_res, COLUMNAS_RES
+from scratch import preparar_scratch
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion apra definir la hora actual
+def def_hora():
+    return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
+
+#%%###############################################################################################################
+##### Trabajador de una campaña de Tetis en varios equipos - TESIS PHD #######
+################################################################################################################
+tic = time.time()
+
+print(f"Inicia código - {def_hora()}")
+
+# Paths de trabajo
+name_pc = None #Nombre del ordenador (None: nombre detectado del equipo, ej. "GIMHABOG")
+wd_path = "//Servidor/Mod_rendimientos/Modelos/"  # Modelos de la campaña en la carpeta compartida (la misma de 08_Coordinador.py)
+direccion_cola = ("Coordinador", 50000)  # (equipo, puerto) del 08_Coordinador.py en ejecucion, que sirve la cola de la campaña
+clave_cola = b"clave_campana_1"  # La clave_cola de 08_Coordinador.py
+wd_tetis = "C:/Tetis9/bin/"  # Directorio de los archivos TETIS .exe de este equipo
+wd_runs = "D:/Mod_rendimientos/Runs_cola/"  # Directorio local donde se copia y ejecuta cada trabajo (no se ejecuta sobre la carpeta compartida); la copia se borra al terminar el trabajo
+
+monitor_file = "D:/Mod_rendimientos/Monitor/monitoreo.csv"
+equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"  # Informe de HWiNFO (si no existe, el equipo se detecta con psutil)
+col_monitor = "Relojes núcleo (avg) [MHz]"  # Asegúrate que coincide exactamente con el nombre de la columna
+muestreo_psutil = 1.0  # Intervalo (s) del muestreador psutil (None para desactivarlo)
+intervalo_latido = 60  # s entre renovaciones del lease del trabajo en curso (muy por debajo de duracion_lease del coordinador)
+espera_cola = 30  # s entre intentos cuando los trabajos restantes estan en curso en otros equipos
+max_trabajos = None  # Trabajos que toma este trabajador antes de terminar (None: hasta vaciar la cola)
+
+if not os.path.exists(wd_runs): #Verifica que existe la carpeta de ejecucion local y la crea
+    os.makedirs(wd_runs)
+
+#%% Extraer info del equipo
+print(f"Extraer info del equipo - {def_hora()}")
+
+perfil = perfil_equipo(equipo_file) # Informe de HWiNFO o deteccion con psutil/platform
+huella = guardar_perfil(perfil, wd_runs) # Hash del hardware, se guarda en cada fila (el perfil queda en local)
+
+name_pc = name_pc or perfil['nombre']
+trabajador = f"{name_pc}_{os.getpid()}"  # Varios trabajadores por equipo se distinguen por el proceso
+
+# Copias de trabajadores de este equipo que terminaron sin limpiar (ej. el proceso se mato)
+for previo in glob.glob(f"{wd_runs}{name_pc}_*/"):
+    pid = os.path.basename(os.path.normpath(previo)).rsplit("_", 1)[-1]
+    if pid.isdigit() and not psutil.pid_exists(int(pid)):
+        shutil.rmtree(previo, ignore_errors=True)
+
+# Catalogo de los modelos en memoria (el .json del catalogo lo escribe solo el coordinador)
+catalogo = CatalogoModelos(wd_path)
+plantillas = {}
+
+cola = conectar_cola(direccion_cola, clave_cola)
+
+print(f"Trabajador {trabajador} ({huella}) en la cola de {direccion_cola[0]}: {cola.resumen()} - {def_hora()}")
+
+#%% Funcion para ejecutar un trabajo de la cola (un Fe de un modelo)
+def correr_trabajo(trabajo):
+
+    carpeta, file = trabajo['carpeta'], trabajo['entrada']
+    entrada = catalogo.modelo(carpeta)
+    wd_model = f"{wd_path}{carpeta}/"
+    wd_run = f"{wd_runs}{trabajador}/{carpeta}/{file}/"
+    print(f"   Trabajo {trabajo['id']} (intento {trabajo['intentos']}) - {def_hora()}")
+
+    # La copia del modelo se borra al terminar (con o sin error): no queda una copia por Fe en el equipo
+    try:
+        #%% Copia local de las entradas del modelo y los .exe del equipo
+        preparar_scratch(wd_model, wd_run, [f"Fe/{file}.txt"])
+        instalar_binarios(wd_tetis, ["Control.exe", "Tetis.exe"], wd_run)
+
+        if carpeta not in plantillas:
+            plantillas[carpeta] = PlantillaFileSSP(f"{wd_model}FileSSP.tet")
+        escribir_filessp(wd_run, plantillas[carpeta].renderizar(wd_run, f"Fe/{file}.txt"))
+
+        #%% Ejecutar Control.exe y Tetis.exe
+        print(f"      Ejecutando Control {file}: {carpeta} - {def_hora()}")
+        Res_control = run_exe_monitor("Control.exe", wd_run, monitor_file, col_monitor)
+        if Res_control[0] == "NOT EXECUTABLE" or Res_control.extra['Codigo salida']:
+            raise subprocess.CalledProcessError(Res_control.extra.get('Codigo salida'), "Control.exe")
+
+        print(f"      Ejecutando Tetis {file}: {carpeta} - {def_hora()}")
+        Res_tetis = benchmark_exe("Tetis.exe", wd_run, monitor_file, col_monitor, 1, 0, muestreo_psutil)
+        if Res_tetis[0] == "NOT EXECUTABLE" or Res_tetis.extra.get('Codigo salida'):
+            raise subprocess.CalledProcessError(Res_tetis.extra.get('Codigo salida'), "Tetis.exe")
+
+        #%% Fila de resultados (la cola agrega campaña, trabajo, repeticion, intento y trabajador)
+        wd_res = f"{wd_run}Fichero_resultados.res"
+        rendimiento = rendimiento_res(wd_res, entrada['celdas'], Res_tetis[0], Res_tetis[8]) if os.path.isfile(wd_res) else {}
+        return {
+            'Equipo': name_pc, 'Cuenca': entrada['cuenca'], 'Escala': entrada['escala'], 'Escenario': entrada['escenario'],
+            'Modelo': entrada['modelo'], 'Celdas': entrada['celdas'], 'Entrada': file,
+            **fila_etapa("Control", Res_control), **fila_etapa("Tetis", Res_tetis),
+            'Tamaño Res mb': os.path.getsize(wd_res) / 1024 ** 2 if os.path.isfile(wd_res) else None,
+            **{col: rendimiento.get(col) for col in COLUMNAS_RES},
+            'Procesador': perfil['procesador'], 'Memoria Ram Gb': perfil['ram_gb'], 'Nucleos': perfil['nucleos'],
+            'Procesadores logicos': perfil['procesadores_logicos'], 'Huella equipo': huella,
+        }
+    finally:
+        shutil.rmtree(wd_run, ignore_errors=True)
+
+#%% Tomar trabajos hasta vaciar la cola (los resultados se guardan en la cola del coordinador)
+hechos = descartados = errores = 0
+try:
+    for trabajo, fila, aceptada in trabajar(cola, correr_trabajo, trabajador, name_pc, huella,
+                                            intervalo_latido, espera_cola, max_trabajos):
+        if aceptada:
+            hechos += 1
+            print(f"      Fin {trabajo['entrada']}: {trabajo['carpeta']} ({fila['Tetis Time']:.1f} s) - {def_hora()}")
+        elif fila is None:
+            errores += 1
+        else:
+            descartados += 1
+        gc.collect()
+finally:
+    shutil.rmtree(f"{wd_runs}{trabajador}/", ignore_errors=True)
+
+print(f"Fin Trabajador {trabajador}: {hechos} hechos, {errores} con error, {descartados} descartados (lease perdido) - {def_hora()}")
+
+#%%#######################################################################################################################
+#################                             FINAL CODIGO                       #########################################
+##########################################################################################################################
+
+run_time = (time.time() - tic)
+hours_ = run_time // 3600.0
+minutes_ = round((run_time / 3600.0 - hours_) * 60.0, 1)
+text_ = f'Execution total time was {hours_} hours and {minutes_} minutes'
+len_text = len(text_)
+len_print = len_text + 2 * 10
+len_blank = (len_print - 2)
+print(len_print * '#')
+print('#' + len_blank * ' ' + '#')
+print('#' + 9 * ' ' + text_ + 9 * ' ' + '#')
+print('#' + len_blank * ' ' + '#')
+print(len_print * '#')
@@ -19,6 +19,18 @@ import csv
 import psutil
 import platform
 
+from cache_etapas import CacheEtapas, valores_cache, COLUMNAS_CACHE
+from catalogo import CatalogoModelos
+from ejecucion import benchmark_exe, valores_muestreo, valores_benchmark, valores_recursos, valor_telemetria, COLUMNAS_BENCHMARK
+from enlaces import instalar_binarios, resumen_sandbox, COLUMNAS_SANDBOX
+from equipo import perfil_equipo, guardar_perfil
+from filessp import PlantillaFileSSP, escribir_filessp
+from muestreador import COLUMNAS_MUESTREO
+from planificador import ejecutar_trabajos, formato_nucleos
+from recursos import COLUMNAS_RECURSOS
+from resultados import AlmacenResultados
+from trazas import Trazador, activar, span, resumir_traza
+
 
 __author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
 __copyright__ = "Copyright 2024, DDL"
@@ -31,110 +43,11 @@ __status__ = "developing"
 
 #%% DEFINICION DE FUNCIONES
 
-################################################################################
-# Funcion para reemplazar datos de escala
-def replace_scale(vec):
-    if "1k" in vec:
-        vec = "1000"
-    elif "2p5" in vec:
-        vec = "2500"
-    elif "5k" in vec:
-        vec = "5000"
-    elif "30m" in vec:
-        vec = "30"
-    elif "200m" in vec:
-        vec = "200"
-    elif "500m" in vec:
-        vec = "500"
-    return vec
-
 ################################################################################
 # Funcion apra definir la hora actual
 def def_hora():
     return time.strftime("%d-%m-%Y %H:%M:%S", time.localtime())
 
-################################################################################
-# Funcion para leer la ultima fila del archivo de monitoreo 
-def leer_ultima_frecuencia(hwinfo_log_path, freq_col_name):
-    """
-    Lee la última frecuencia disponible desde el archivo CSV de HWiNFO.
-    """
-    try:
-        with open(hwinfo_log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            reader = csv.DictReader(f)
-            last_row = None
-            for row in reader:
-                if row[freq_col_name]:
-                    last_row = row
-        if last_row:
-            valor = last_row[freq_col_name].replace(",", ".").strip()
-            return float(valor)
-    except Exception:
-        return None 
-    
-################################################################################
-
-# Función para ejecutar un .exe y medir el tiempo
-
-def run_exe_monitor(exe_name, path_model, hwinfo_log_path, freq_col_name):
-    """
-    Ejecuta un ejecutable y mide el tiempo de ejecución, además del promedio de la frecuencia del procesador.
-
-    Parámetros:
-    - exe_name: nombre del ejecutable (ej. "Toparc.exe")
-    - path_model: ruta al directorio donde se encuentra el ejecutable
-    - hwinfo_log_path: ruta completa al archivo .csv generado por HWiNFO
-    - freq_col_name: nombre exacto de la columna que contiene la frecuencia en MHz
-
-    Retorna:
-    - Diccionario con tiempos y frecuencia promedio
-    """
-    print("Iniciando monitoreo y ejecución del proceso...")
-    freq_values = []
-
-    os.chdir(path_model)
-    process = subprocess.Popen([exe_name])
-
-    start_time = time.time()
-
-    while process.poll() is None:
-        freq_now = leer_ultima_frecuencia(hwinfo_log_path, freq_col_name)
-        if freq_now:
-            freq_values.append(freq_now)
-            print(f"{time.strftime('%H:%M:%S')} - Frecuencia: {freq_now:.2f} MHz")
-        time.sleep(1)
-
-    end_time = time.time()
-
-    exec_time = end_time - start_time #Calcula el tiempo total de ejecución
-    freq_promedio = (sum(freq_values) / len(freq_values))/1000 if freq_values else float('nan') #Calcula el promedio de velocidad del procesador
-
-    days = exec_time // 86400
-    hours = (exec_time % 86400) // 3600
-    minutes = (exec_time % 3600) // 60
-    seconds = round(exec_time % 60, 1)
-    total_days = exec_time / 86400
-    total_hours = exec_time / 3600
-    total_minutes = exec_time / 60
-    
-    return exec_time, days, hours, minutes, seconds, total_days, total_hours, total_minutes, freq_promedio
-
-################################################################################
-
-# Función para extraer la información del equipo
-
-def info_pc(info_equipo, carac):
-    # Buscar en todo el DataFrame si contiene el texto "Nombre del procesador:"
-    mask = info_equipo.apply(lambda row: row.astype(str).str.contains(carac)).any(axis=1)
-
-    # Obtener los índices (posiciones) donde se encontró
-    indices = info_equipo[mask].index.tolist()
-
-    variable = info_equipo.iloc[indices[0], 1]
-    
-    return variable
-
-
 #%%###############################################################################################################
 ##### Codigo para ejecutar Toparc y Hantec - Fase 2 TESIS PHD #######
 ################################################################################################################
@@ -144,89 +57,139 @@ print(f"Inicia código - {def_hora()}")
 
 
 # Paths de trabajo
-name_pc = "GIMHABOG" #Nombre del ordenador a analizar
+name_pc = None #Nombre del ordenador a analizar (None: nombre detectado del equipo, ej. "GIMHABOG")
 wd_path = "D:/Mod_rendimientos/Modelos/" #Ubicación de los modelos a analizar
 wd_tetis = "C:/Tetis9/bin/"  # Directorio de los archivos TETIS .exe
 wd_out = "D:/Mod_rendimientos/Res/" #Ubicación de los resultados del codigo
-Res_all = f"{wd_out}Results_toparc_hantec_{name_pc}.csv"  # Archivo CSV para guardar los resultados
 
 monitor_file = "D:/Mod_rendimientos/Monitor/monitoreo.csv"
-equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"
+equipo_file = "D:/Mod_rendimientos/Monitor/equipo.csv"  # Informe de HWiNFO (si no existe, el equipo se detecta con psutil)
 col_monitor = "Relojes núcleo (avg) [MHz]"  # Asegúrate que coincide exactamente con el nombre de la columna
+muestreo_psutil = 1.0  # Intervalo (s) del muestreador psutil (None para desactivarlo)
+repeticiones = 1  # Corridas medidas por ejecutable (se reporta la mediana, IQR, min e IC bootstrap)
+calentamiento = 0  # Corridas previas de calentamiento que se descartan
+wd_telemetria = f"{wd_out}Telemetria/"  # Archivo de series de cada ejecucion (.npy por id de ejecucion); None para no guardarlas
+wd_trazas = f"{wd_out}Trazas/"  # Traza de las fases de cada campaña (spans en ns: costo del arnes frente a los ejecutables); None: sin traza
+formato_traza = "jsonl"  # "jsonl" (un span por linea) o "chrome" (se abre en chrome://tracing o Perfetto)
+wd_cache = None  # Cache de Topolco/Hantec por hash de entradas, ej. f"{wd_out}Cache/" (en un acierto no se mide: se reportan los tiempos de la ejecucion que genero las salidas)
+
+# Ejecucion concurrente (cada modelo se procesa en su propio directorio)
+n_paralelo = 1  # Numero de modelos que se procesan a la vez
+nucleos_por_trabajo = None  # Nucleos logicos por modelo (None: reparto equitativo)
+fijar_nucleos = True  # Fijar cada modelo a un grupo de nucleos disjunto
 
 
 if not os.path.exists(wd_out): #Verifica que existe la carpeta de resultados y la crea 
     os.makedirs(wd_out)
+
+#%% Extraer info del equipo
+print(f"Extraer info del equipo - {def_hora()}")
+
+perfil = perfil_equipo(equipo_file) # Informe de HWiNFO o deteccion con psutil/platform
+huella = guardar_perfil(perfil, wd_out) # Hash del hardware, se guarda en cada fila
+
+name_pc = name_pc or perfil['nombre']
+procesador = perfil['procesador']
+memoria_ram_gb = perfil['ram_gb']
+nucleos = perfil['nucleos']
+procesadores_logicos = perfil['procesadores_logicos']
+campaña = time.strftime("%Y%m%d_%H%M%S")
+
+# Traza de la campaña: fases del arnes y, desde run_exe_monitor, el tiempo de cada ejecutable
+trazador = None
+if wd_trazas:
+    trazador = activar(Trazador(f"{wd_trazas}Traza_toparc_hantec_{name_pc}_{campaña}{'.json' if formato_traza == 'chrome' else '.jsonl'}",
+                                formato_traza, equipo=name_pc, huella=huella, campaña=campaña, n_paralelo=n_paralelo))
+
+Res_all = f"{wd_out}Results_toparc_hantec_{name_pc}.csv"  # Archivo CSV para guardar los resultados
+Res_db = f"{wd_out}Results_toparc_hantec_{name_pc}.sqlite"  # Base de datos donde se guarda cada modelo (permite reanudar)
     
    
-# Obtener la lista de modelos en la ruta, exceptuando la carpeta de resultados
-models = [nombre for nombre in os.listdir(wd_path)
-              if os.path.isdir(os.path.join(wd_path, nombre))]
+# Catalogo de modelos en la ruta (celdas, archivos y ficheros Fe, guardado entre corridas)
+catalogo = CatalogoModelos(wd_path, f"{wd_out}catalogo_modelos.json")
+models = [entrada['carpeta'] for entrada in catalogo.modelos()]
 
 n_models = len(models)
 
-# Inicializar una lista para almacenar los resultados
-results = []
+cache = CacheEtapas(wd_cache) if wd_cache else None
+
+#%% Crear el almacen de resultados
+print(f"Creando almacen de resultados - {def_hora()}")
+
+columnas = [
+    'Equipo', 'Cuenca', 'Escala','Escenario', 'Modelo', 'Celdas',
+    'Toparc Time', 'Toparc Days', 'Toparc Hours', 'Toparc Minutes', 'Toparc Seconds',
+    'Toparc Total Days', 'Toparc Total Hours', 'Toparc Total Minutes', 'Vel_Toparc',
+    *[f"Toparc {col}" for col in COLUMNAS_BENCHMARK],
+    'Hantec Time', 'Hantec Days', 'Hantec Hours', 'Hantec Minutes', 'Hantec Seconds',
+    'Hantec Total Days', 'Hantec Total Hours', 'Hantec Total Minutes','Vel_Hantec',
+    *[f"Hantec {col}" for col in COLUMNAS_BENCHMARK],
+    'Tamaño Topolco mb', 'Tamaño Topolco gb',
+    'Tamaño Hantec mb', 'Tamaño Hantec gb',
+    'Concurrencia', 'Nucleos asignados', *COLUMNAS_SANDBOX,
+    *[f"Toparc {col}" for col in COLUMNAS_MUESTREO],
+    *[f"Hantec {col}" for col in COLUMNAS_MUESTREO],
+    *[f"Toparc {col}" for col in COLUMNAS_RECURSOS],
+    *[f"Hantec {col}" for col in COLUMNAS_RECURSOS],
+    'Toparc Telemetria', 'Hantec Telemetria',
+    *[f"Toparc {col}" for col in COLUMNAS_CACHE],
+    *[f"Hantec {col}" for col in COLUMNAS_CACHE],
+    'Procesador', 'Memoria Ram Gb', 'Nucleos', 'Procesadores logicos', 'Huella equipo',
+]
+
+almacen = AlmacenResultados(Res_db, "toparc_hantec", columnas, clave=('Equipo', 'Modelo'))
+completados = almacen.completados('Hantec Time') # Modelos terminados en corridas anteriores
 
 print(f"Inicio Analisis de Modelos - {def_hora()}")
 
-#%% Bucle para los modelos
+#%% Funcion para procesar un modelo (Toparc y Hantec)
 # i = 2
-for i in range(len(models)):
+def procesar_modelo(i, nucleos_asignados):
     
     wd_model = f"{wd_path}{models[i]}/"  #Defina la ruta del modelo
 
     print(f"   Procesando modelo: {i+1} de {n_models} - {def_hora()}")
-    parts = models[i].split('_')
-    cuenca = parts[1].upper()
-    escala = replace_scale(parts[2])
-    escenario = parts[3].upper()
-    modelo = f"{parts[1]}_{parts[2]}_{parts[3]}"
-
-    #%% Modificaciones del FileSSP
-    wd_FileSSP = f"{wd_model}FileSSP.tet"
-    with open(wd_FileSSP, "r") as file:
-        changeFileSSP = file.readlines()  # Leer todas las líneas del archivo en una lista
+    entrada = catalogo.modelo(models[i])
+    cuenca = entrada['cuenca']
+    escala = entrada['escala']
+    escenario = entrada['escenario']
+    modelo = entrada['modelo']
+
+    #%% FileSSP del modelo (ya generado): FileSSP.txt y FileSSP.tet con la ruta del modelo, como antes (una escritura atomica por archivo)
+    with span("FileSSP"):
+        escribir_filessp(wd_model, filessp[i])
     
-    changeFileSSP[0] = wd_model + "\n"  # Cambiar la línea 1 para ajustar la ruta del modelo
-    
-    # Escribir las líneas modificadas en FileSSP.txt
-    with open(f"{wd_model}FileSSP.txt", "w") as file:
-        file.writelines(changeFileSSP)
-    
-    # Sobrescribir FileSSP.tet con los cambios
-    with open(wd_FileSSP, "w") as file:
-        file.writelines(changeFileSSP)
-    
-    #%% Copiar archivos .exe al directorio del modelo
-    for exe_file in ["Toparc.exe", "Hantec.exe", "Control.exe", "Tetis.exe"]:
-        shutil.copy(os.path.join(wd_tetis, exe_file), wd_model)
+    #%% Instalar los archivos .exe en el directorio del modelo (se omiten si ya coinciden por hash)
+    t_sandbox = time.perf_counter()
+    with span("Instalar binarios"):
+        modos = instalar_binarios(wd_tetis, ["Toparc.exe", "Hantec.exe", "Control.exe", "Tetis.exe"], wd_model)
+    sandbox = resumen_sandbox(modos, time.perf_counter() - t_sandbox)
         
     #%% Medir tiempos de ejecución para Toparc.exe
     print(f"       Generando Topolco: {models[i]} - {def_hora()}")
     
-    Res_toparc = run_exe_monitor("Toparc.exe", wd_model, monitor_file, col_monitor) #ejecuta toparc y calcula tiempos y velocidad
+    toparc = lambda: benchmark_exe("Toparc.exe", wd_model, monitor_file, col_monitor, repeticiones, calentamiento, muestreo_psutil, nucleos_asignados, wd_telemetria) #ejecuta toparc y calcula tiempos y velocidad
+    with span("Toparc", etapa="Toparc"):  # El proceso queda como span hijo (exe); el resto es monitoreo y cache
+        Res_toparc = cache.ejecutar("Toparc", wd_model, toparc, os.path.join(wd_model, "Toparc.exe")) if cache else toparc()
     
-    # Lectura de Topolco
+    # Numero de celdas: cabecera de Topolco (el catalogo solo la relee si Toparc cambió el archivo)
     wd_topolco = f"{wd_model}Topolco.sds" #directorio de topolco
-    with open(wd_topolco, "r") as file:
-        topolco = file.readlines()  # Leer todas las líneas del archivo en una lista
-    
-    # Dividir cada línea en columnas basadas en espacios
-    topolco = [line.split() for line in topolco]
-    celdas = int(topolco[6][1]) # numero de celdas de la cuenca
-            
-    if os.path.isfile(wd_topolco):
-        # Obtener el tamaño del archivo en bytes
-        topolco_tamaño_bytes  = os.path.getsize(wd_topolco)
-        topolco_tamaño_kb = topolco_tamaño_bytes / 1024
-        topolco_tamaño_mb = topolco_tamaño_kb / 1024
-        topolco_tamaño_gb = topolco_tamaño_mb / 1024
+    with span("Lectura Topolco"):
+        celdas = catalogo.celdas(models[i]) # numero de celdas de la cuenca
+                
+        if os.path.isfile(wd_topolco):
+            # Obtener el tamaño del archivo en bytes
+            topolco_tamaño_bytes  = os.path.getsize(wd_topolco)
+            topolco_tamaño_kb = topolco_tamaño_bytes / 1024
+            topolco_tamaño_mb = topolco_tamaño_kb / 1024
+            topolco_tamaño_gb = topolco_tamaño_mb / 1024
     
     #%% Medir tiempos de ejecución para Hantec.exe
     print(f"       Generando Hantec: {models[i]} - {def_hora()}")
     
-    Res_hantec = run_exe_monitor("Hantec.exe", wd_model, monitor_file, col_monitor) #ejecuta hantec y calcula tiempos y velocidad
+    hantec = lambda: benchmark_exe("Hantec.exe", wd_model, monitor_file, col_monitor, repeticiones, calentamiento, muestreo_psutil, nucleos_asignados, wd_telemetria) #ejecuta hantec y calcula tiempos y velocidad
+    with span("Hantec", etapa="Hantec"):
+        Res_hantec = cache.ejecutar("Hantec", wd_model, hantec, os.path.join(wd_model, "Hantec.exe")) if cache else hantec()
   
     # Lectura de Hantec
     wd_hantec = f"{wd_model}Hantec.sds" # directorio de hantec
@@ -238,56 +201,61 @@ for i in range(len(models)):
         hantec_tamaño_mb = hantec_tamaño_kb / 1024
         hantec_tamaño_gb = hantec_tamaño_mb / 1024
     
-    #%% Medir tiempos de ejecución para Hantec.exe
-    # Agregar los resultados a la lista
-    results.append([
+    print(f"   Fin modelo: {i+1} de {n_models} - {def_hora()}")
+    
+    #%% Fila de resultados
+    return [
         name_pc, cuenca, escala, escenario, modelo, celdas,
-        *Res_toparc, *Res_hantec,
+        *Res_toparc, *valores_benchmark(Res_toparc),
+        *Res_hantec, *valores_benchmark(Res_hantec),
         topolco_tamaño_mb, topolco_tamaño_gb,
         hantec_tamaño_mb, hantec_tamaño_gb,
-    ])
-    print(f"   Procesando modelo: {i+1} de {n_models} - {def_hora()}")
+        n_paralelo, formato_nucleos(nucleos_asignados), *[sandbox[col] for col in COLUMNAS_SANDBOX],
+        *valores_muestreo(Res_toparc), *valores_muestreo(Res_hantec),
+        *valores_recursos(Res_toparc), *valores_recursos(Res_hantec),
+        valor_telemetria(Res_toparc), valor_telemetria(Res_hantec),
+        *valores_cache(Res_toparc), *valores_cache(Res_hantec),
+        procesador, memoria_ram_gb, nucleos, procesadores_logicos, huella,
+    ]
+
+#%% Bucle para los modelos (hasta n_paralelo modelos a la vez)
+pendientes = [i for i, entrada in enumerate(catalogo.modelos())
+              if (name_pc, entrada['modelo']) not in completados]
+
+# FileSSP de cada modelo generado en memoria antes de ejecutar (ruta del modelo en la linea 1)
+filessp = {i: PlantillaFileSSP(f"{wd_path}{models[i]}/FileSSP.tet").renderizar(f"{wd_path}{models[i]}/")
+           for i in pendientes}
+
+# Cada modelo es un span de la traza; sus fases y ejecutables quedan como hijos
+def modelo_trazado(i, nucleos_asignados):
+    with span("Modelo", modelo=models[i], nucleos=formato_nucleos(nucleos_asignados)):
+        return procesar_modelo(i, nucleos_asignados)
+
+try:
+    for i, fila in ejecutar_trabajos(pendientes, modelo_trazado, n_paralelo, nucleos_por_trabajo, fijar_nucleos):
+        # Guardar la fila en el almacen (una insercion por modelo)
+        with span("Guardar fila", modelo=models[i]):
+            almacen.agregar(fila)
+
+finally:
+    #%% Exportar los resultados al archivo CSV
+    print(f"Guardando resultados - {def_hora()}")
     
-    
-#%% Crear un DataFrame de pandas con los resultados  
-print(f"Creando Dataframe - {def_hora()}")
-
-df = pd.DataFrame(results, columns=[
-    'Equipo', 'Cuenca', 'Escala','Escenario', 'Modelo', 'Celdas',
-    'Toparc Time', 'Toparc Days', 'Toparc Hours', 'Toparc Minutes', 'Toparc Seconds',
-    'Toparc Total Days', 'Toparc Total Hours', 'Toparc Total Minutes', 'Vel_Toparc',
-    'Hantec Time', 'Hantec Days', 'Hantec Hours', 'Hantec Minutes', 'Hantec Seconds',
-    'Hantec Total Days', 'Hantec Total Hours', 'Hantec Total Minutes','Vel_Hantec',
-    'Tamaño Topolco mb', 'Tamaño Topolco gb',
-    'Tamaño Hantec mb', 'Tamaño Hantec gb'
-])
-
-
-#%% Extraer info del equipo
-print(f"Agregando columnas extra - {def_hora()}")
-
-# Leer el archivo como texto plano usando codificación robusta "utf-8"
-with open(equipo_file, encoding="utf-8") as f:
-    info_equipo = f.readlines()
-    
-info_equipo = pd.DataFrame(info_equipo)
-info_equipo = info_equipo[0].str.strip().str.split(",", expand=True)
-
-procesador = info_pc(info_equipo, "Nombre del procesador:") 
-memoria_ram_gb = info_pc(info_equipo, "Tamaño de memoria total:") 
-nucleos = info_pc(info_equipo, "Número de núcleos de procesador:") 
-procesadores_logicos = info_pc(info_equipo, "Número de procesadores lógicos:") 
-
-# Crear columnas repetidas con la misma info para todas las filas del DataFrame
-df['Procesador'] = procesador
-df['Memoria Ram Gb'] = memoria_ram_gb
-df['Nucleos'] = nucleos
-df['Procesadores logicos'] = procesadores_logicos
-
-#%% Guardar el DataFrame en un archivo CSV
-print(f"Guardando resultados - {def_hora()}")
-
-df.to_csv(Res_all, index=False)
+    with span("Exportar csv"):
+        almacen.exportar_csv(Res_all)
+    almacen.cerrar()
+
+    if trazador:
+        trazador.cerrar()
+        activar(None)
+
+#%% Costo del arnes: tiempo de pared de la campaña fuera de los ejecutables y fases que lo explican
+if trazador:
+    resumen_traza, fases = resumir_traza(trazador)
+    fases.to_csv(f"{wd_trazas}Fases_toparc_hantec_{name_pc}_{campaña}.csv", index=False)
+    print(f"Arnes: {resumen_traza['Arnes s']:.1f} de {resumen_traza['Pared s']:.1f} s de pared ({resumen_traza['Arnes %'] or 0:.2f} %), "
+          f"ejecutables {resumen_traza['Ejecutables s']:.1f} s, traza {resumen_traza['Traza s']:.4f} s en {resumen_traza['Spans']} spans")
+    print(fases.head(10).to_string(index=False))
 
 print(f"Fin ejecución - {def_hora()}")
 
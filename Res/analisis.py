@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import glob
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+ETAPAS = ["Tetis", "Toparc", "Hantec"]
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para leer los resultados validos de todos los equipos
+def leer_resultados(wd_out, tipos=("tetis", "toparc_hantec")):
+    """
+    Lee los Results_<tipo>_*.csv de `wd_out` (los de cada equipo y las
+    exportaciones de la cola, Results_tetis_cola_*.csv) en un solo
+    DataFrame, sin las ejecuciones que no deben entrar en los ajustes: las
+    contaminadas (columnas "<etapa> Contaminada") y las filas repetidas en
+    más de un archivo. Las repeticiones de un mismo Fe se conservan; cada
+    ajuste las agrupa por (Equipo, Modelo, Entrada).
+    """
+    partes = []
+    for tipo in tipos:
+        for archivo in sorted(glob.glob(os.path.join(wd_out, f"Results_{tipo}_*.csv"))):
+            try:
+                partes.append(pd.read_csv(archivo, low_memory=False))
+            except pd.errors.EmptyDataError:
+                continue
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    df = df[~df.astype(str).duplicated()]  # Como texto: la misma fila puede leerse con otro dtype en otro archivo
+    contaminada = pd.Series(False, index=df.index)
+    for col in df.columns:
+        if col.endswith(" Contaminada"):
+            contaminada |= pd.to_numeric(df[col], errors="coerce").fillna(0) > 0
+    return df[~contaminada].reset_index(drop=True)
+
+################################################################################
+# Funcion para cargar los resultados de todos los equipos
+def cargar_resultados(wd_out):
+    """
+    Lee los resultados válidos de `wd_out` (leer_resultados) y los retorna
+    en formato largo: una fila por equipo, modelo, Fe y etapa con las
+    columnas Equipo, Huella, Cuenca, Escala, Escenario, Modelo, Entrada,
+    Celdas, Etapa, Tiempo (s) y Vel (GHz). Las repeticiones de un Fe (ej.
+    de la cola) se reducen a su mediana para no pesar más en los ajustes;
+    las ejecuciones sin tiempo numérico (NOT EXECUTABLE, TIMEOUT, STALLED)
+    se descartan.
+    """
+    columnas = ['Equipo', 'Huella', 'Cuenca', 'Escala', 'Escenario', 'Modelo', 'Entrada', 'Celdas', 'Etapa', 'Tiempo', 'Vel']
+    df = leer_resultados(wd_out)
+    if 'Huella equipo' not in df.columns:
+        df['Huella equipo'] = np.nan
+    if 'Entrada' not in df.columns:
+        df['Entrada'] = np.nan
+    partes = []
+    for etapa in ETAPAS:
+        if f"{etapa} Time" not in df.columns:
+            continue
+        largo = df[['Equipo', 'Huella equipo', 'Cuenca', 'Escala', 'Escenario', 'Modelo', 'Entrada', 'Celdas']].copy()
+        largo['Etapa'] = etapa
+        largo['Tiempo'] = pd.to_numeric(df[f"{etapa} Time"], errors="coerce")  # "NOT EXECUTABLE" -> NaN
+        largo['Vel'] = pd.to_numeric(df.get(f"Vel_{etapa}"), errors="coerce")
+        partes.append(largo)
+
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    datos = pd.concat(partes, ignore_index=True).rename(columns={'Huella equipo': 'Huella'})
+    datos['Huella'] = datos['Huella'].fillna(datos['Equipo']).astype(str)
+    datos['Celdas'] = pd.to_numeric(datos['Celdas'], errors="coerce")
+    datos = datos[(datos['Tiempo'] > 0) & (datos['Celdas'] > 0)]
+    datos = datos.groupby(['Equipo', 'Huella', 'Cuenca', 'Escala', 'Escenario', 'Modelo', 'Entrada', 'Celdas', 'Etapa'],
+                          dropna=False, as_index=False)[['Tiempo', 'Vel']].median()
+    return datos[columnas].reset_index(drop=True)
+
+################################################################################
+# Funcion para el cuantil de la t de Student (sin scipy)
+def t_cuantil(p, gl):
+    """
+    Cuantil de la distribución t de Student con `gl` grados de libertad
+    (expansión de Cornish-Fisher, Abramowitz y Stegun 26.7.5).
+    """
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    return z + g1 / gl + g2 / gl ** 2 + g3 / gl ** 3 + g4 / gl ** 4
+
+################################################################################
+# Funcion para ajustar una ley de potencia
+def ajustar_potencia(celdas, tiempos, nivel=0.95):
+    """
+    Ajusta tiempo = a * celdas^b por mínimos cuadrados en escala log-log.
+
+    Retorna un diccionario con n, a, exponente b, su intervalo de confianza
+    al `nivel` indicado, R2 y los datos necesarios para predecir (media y
+    suma de cuadrados de log(celdas), desviación residual).
+    """
+    x = np.log(np.asarray(celdas, dtype=np.float64))
+    y = np.log(np.asarray(tiempos, dtype=np.float64))
+    n = x.size
+    resultado = {'n': n, 'a': np.nan, 'exponente': np.nan, 'ic_inf': np.nan, 'ic_sup': np.nan,
+                 'r2': np.nan, 'x_media': np.nan, 'sxx': np.nan, 's': np.nan}
+    if n < 2 or np.ptp(x) == 0:
+        return resultado
+
+    x_media = x.mean()
+    sxx = ((x - x_media) ** 2).sum()
+    b = ((x - x_media) * (y - y.mean())).sum() / sxx
+    a = y.mean() - b * x_media
+    residuos = y - (a + b * x)
+    sst = ((y - y.mean()) ** 2).sum()
+    resultado.update(n=n, a=float(np.exp(a)), exponente=float(b), x_media=float(x_media), sxx=float(sxx),
+                     r2=float(1 - (residuos ** 2).sum() / sst) if sst > 0 else 1.0)
+    if n > 2:
+        s = np.sqrt((residuos ** 2).sum() / (n - 2))
+        margen = t_cuantil(0.5 + nivel / 2, n - 2) * s / np.sqrt(sxx)
+        resultado.update(s=float(s), ic_inf=float(b - margen), ic_sup=float(b + margen))
+    return resultado
+
+################################################################################
+# Funcion para ajustar una ley de potencia por tramos
+def ajustar_tramos(celdas, tiempos, min_puntos=3):
+    """
+    Ajusta una ley de potencia continua de dos tramos:
+    log t = c0 + b1 log n + b2 max(0, log n - log n_q).
+
+    El punto de quiebre n_q se busca entre los valores observados; todos los
+    candidatos se resuelven a la vez con ecuaciones normales en lote.
+
+    Retorna un diccionario con el quiebre (celdas), los exponentes antes y
+    después del quiebre y la suma de cuadrados residual.
+    """
+    x = np.log(np.asarray(celdas, dtype=np.float64))
+    y = np.log(np.asarray(tiempos, dtype=np.float64))
+    orden = np.argsort(x)
+    x, y = x[orden], y[orden]
+    candidatos = np.unique(x)[min_puntos - 1:-(min_puntos - 1) or None]
+    if x.size < 2 * min_puntos or candidatos.size == 0:
+        return {'quiebre': np.nan, 'exponente_1': np.nan, 'exponente_2': np.nan, 'sse': np.nan}
+
+    # Matrices de diseño de todos los candidatos: (k, n, 3)
+    X = np.stack(np.broadcast_arrays(1.0, x[None, :], np.maximum(0.0, x[None, :] - candidatos[:, None])), axis=-1)
+    XtX = np.einsum('kni,knj->kij', X, X)
+    Xty = np.einsum('kni,n->ki', X, y)
+    validos = np.abs(np.linalg.det(XtX)) > 1e-12
+    coef = np.full((candidatos.size, 3), np.nan)
+    coef[validos] = np.linalg.solve(XtX[validos], Xty[validos][..., None])[..., 0]
+    sse = ((y[None, :] - np.einsum('kni,ki->kn', X, np.nan_to_num(coef))) ** 2).sum(axis=1)
+    sse[~validos] = np.inf
+    k = int(np.argmin(sse))
+    return {'quiebre': float(np.exp(candidatos[k])), 'exponente_1': float(coef[k, 1]),
+            'exponente_2': float(coef[k, 1] + coef[k, 2]), 'sse': float(sse[k])}
+
+################################################################################
+# Funcion para ajustar las leyes de escalamiento por grupo
+def ajustar_grupos(datos, etapa="Tetis", por=("Huella", "Escala"), nivel=0.95):
+    """
+    Ajusta la ley de potencia (y por tramos) del tiempo de `etapa` frente a
+    Celdas para cada grupo de las columnas `por` (ej. Huella y Escala, o
+    Huella y Cuenca).
+    """
+    filas = []
+    sub = datos[datos['Etapa'] == etapa]
+    for clave, grupo in sub.groupby(list(por)):
+        clave = clave if isinstance(clave, tuple) else (clave,)
+        ajuste = ajustar_potencia(grupo['Celdas'], grupo['Tiempo'], nivel)
+        tramos = ajustar_tramos(grupo['Celdas'], grupo['Tiempo'])
+        filas.append({**dict(zip(por, clave)), 'Etapa': etapa, **ajuste, **tramos})
+    return pd.DataFrame(filas)
+
+################################################################################
+# Funcion para graficar las curvas de escalamiento
+def graficar_escalamiento(datos, etapa="Tetis", por="Huella", ruta_png=None):
+    """
+    Grafica en log-log el tiempo de `etapa` frente a Celdas con la ley de
+    potencia ajustada para cada valor de la columna `por`.
+    """
+    fig, ax = plt.subplots(figsize=(8, 6))
+    sub = datos[datos['Etapa'] == etapa]
+    for nombre, grupo in sub.groupby(por):
+        ajuste = ajustar_potencia(grupo['Celdas'], grupo['Tiempo'])
+        puntos = ax.scatter(grupo['Celdas'], grupo['Tiempo'], s=18, alpha=0.7)
+        if np.isfinite(ajuste['exponente']):
+            xs = np.geomspace(grupo['Celdas'].min(), grupo['Celdas'].max(), 50)
+            ax.plot(xs, ajuste['a'] * xs ** ajuste['exponente'], color=puntos.get_facecolor()[0],
+                    label=f"{nombre}: b = {ajuste['exponente']:.2f} [{ajuste['ic_inf']:.2f}, {ajuste['ic_sup']:.2f}]")
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("Celdas")
+    ax.set_ylabel(f"Tiempo {etapa} (s)")
+    ax.grid(True, which="both", alpha=0.3)
+    ax.legend(fontsize=8)
+    if ruta_png:
+        fig.savefig(ruta_png, dpi=150, bbox_inches="tight")
+    return fig
+
+################################################################################
+# Funcion para graficar el diagrama de Gantt de una campaña
+def graficar_gantt(tareas, ruta_png=None):
+    """
+    Grafica las tareas de una campaña del pipeline (una fila por modelo,
+    color por etapa) a partir de un DataFrame con las columnas Modelo,
+    Etapa, Inicio s y Fin s.
+    """
+    tareas = tareas.dropna(subset=['Inicio s', 'Fin s'])
+    modelos = sorted(tareas['Modelo'].unique())
+    colores = dict(zip(sorted(tareas['Etapa'].unique()), plt.cm.tab10.colors))
+    fig, ax = plt.subplots(figsize=(12, max(3, 0.4 * len(modelos))))
+    for _, t in tareas.iterrows():
+        ax.barh(modelos.index(t['Modelo']), (t['Fin s'] - t['Inicio s']) / 3600, left=t['Inicio s'] / 3600,
+                height=0.6, color=colores[t['Etapa']], edgecolor="k", lw=0.3)
+    for etapa, color in colores.items():
+        ax.barh(0, 0, color=color, label=etapa)
+    ax.set_yticks(range(len(modelos)))
+    ax.set_yticklabels(modelos, fontsize=7)
+    ax.set_xlabel("Horas desde el inicio de la campaña")
+    ax.grid(True, axis="x", alpha=0.3)
+    ax.legend(fontsize=8)
+    if ruta_png:
+        fig.savefig(ruta_png, dpi=150, bbox_inches="tight")
+    return fig
+
+################################################################################
+# Funcion para estimar el tiempo atribuible al almacenamiento
+def comparar_almacenamiento(wd_out, etapa="Tetis"):
+    """
+    Compara, para cada equipo, modelo y Fe, la mediana del tiempo de `etapa`
+    ejecutado en el scratch (Almacenamiento "scratch") con la de las
+    ejecuciones en el sitio (en el modelo o en wd_runs). La diferencia es el
+    tiempo atribuible al almacenamiento.
+
+    Retorna:
+    - DataFrame con Equipo, Modelo, Entrada, Celdas, 'Tiempo en sitio s',
+      'Tiempo scratch s', 'Tiempo almacenamiento s' y 'Almacenamiento %'
+      (del tiempo en el sitio); solo las combinaciones medidas de ambas formas
+    """
+    partes = []
+    for archivo in glob.glob(os.path.join(wd_out, f"Results_{etapa.lower()}_*.csv")):
+        df = pd.read_csv(archivo)
+        if 'Almacenamiento' not in df.columns or f"{etapa} Time" not in df.columns:
+            continue
+        partes.append(pd.DataFrame({
+            'Equipo': df['Equipo'], 'Modelo': df['Modelo'], 'Entrada': df['Entrada'], 'Celdas': df['Celdas'],
+            'Scratch': df['Almacenamiento'].eq("scratch"),
+            'Tiempo': pd.to_numeric(df[f"{etapa} Time"], errors="coerce"),
+        }))
+    columnas = ['Equipo', 'Modelo', 'Entrada', 'Celdas', 'Tiempo en sitio s', 'Tiempo scratch s',
+                'Tiempo almacenamiento s', 'Almacenamiento %']
+    if not partes:
+        return pd.DataFrame(columns=columnas)
+    datos = pd.concat(partes, ignore_index=True).dropna(subset=['Tiempo'])
+    medianas = datos.groupby(['Equipo', 'Modelo', 'Entrada', 'Celdas', 'Scratch'])['Tiempo'].median().unstack('Scratch')
+    if True not in medianas.columns or False not in medianas.columns:
+        return pd.DataFrame(columns=columnas)
+    tabla = medianas.rename(columns={False: 'Tiempo en sitio s', True: 'Tiempo scratch s'}).dropna().reset_index()
+    tabla.columns.name = None
+    tabla['Tiempo almacenamiento s'] = tabla['Tiempo en sitio s'] - tabla['Tiempo scratch s']
+    tabla['Almacenamiento %'] = 100 * tabla['Tiempo almacenamiento s'] / tabla['Tiempo en sitio s']
+    return tabla[columnas]
+
+################################################################################
+# Clase para predecir tiempos a partir de los resultados medidos
+class ModeloEscalamiento:
+    """
+    Leyes de potencia por equipo y etapa para estimar el tiempo de ejecución
+    de cuencas nuevas antes de ejecutarlas.
+
+    Parámetros:
+    - datos: DataFrame de cargar_resultados
+    - nivel: nivel del intervalo de predicción
+    """
+
+    def __init__(self, datos, nivel=0.95):
+        self.nivel = nivel
+        self.ajustes = {}
+        self.equipos = {}
+        for (etapa, huella), grupo in datos.groupby(['Etapa', 'Huella']):
+            self.ajustes[(etapa, huella)] = ajustar_potencia(grupo['Celdas'], grupo['Tiempo'], nivel)
+            for nombre in grupo['Equipo'].unique():
+                self.equipos[str(nombre)] = huella
+
+    def predict(self, celdas, equipo, etapa="Tetis"):
+        """
+        Predice el tiempo (s) de `etapa` para `celdas` en `equipo` (nombre o
+        huella del equipo). Acepta un escalar o un arreglo de celdas.
+
+        Retorna un diccionario con el tiempo estimado y el intervalo de
+        predicción (inf, sup).
+        """
+        huella = self.equipos.get(str(equipo), str(equipo))
+        if (etapa, huella) not in self.ajustes:
+            raise KeyError(f"No hay resultados de {etapa} para el equipo {equipo}")
+        aj = self.ajustes[(etapa, huella)]
+        x0 = np.log(np.asarray(celdas, dtype=np.float64))
+        log_t = np.log(aj['a']) + aj['exponente'] * x0
+        if np.isfinite(aj['s']):
+            margen = t_cuantil(0.5 + self.nivel / 2, aj['n'] - 2) * aj['s'] * \
+                np.sqrt(1 + 1 / aj['n'] + (x0 - aj['x_media']) ** 2 / aj['sxx'])
+        else:
+            margen = np.nan
+        return {'tiempo_s': np.exp(log_t), 'inf': np.exp(log_t - margen), 'sup': np.exp(log_t + margen)}
+
+
+#%%###############################################################################################################
+##### Codigo para analizar la escalabilidad de TETIS #######
+################################################################################################################
+if __name__ == "__main__":
+
+    wd_out = "D:/Mod_rendimientos/Res/" #Ubicación de los resultados del codigo
+
+    datos = cargar_resultados(wd_out)
+
+    for etapa in ETAPAS:
+        for por in [("Huella", "Escala"), ("Huella", "Cuenca")]:
+            ajustes = ajustar_grupos(datos, etapa, por)
+            if len(ajustes):
+                ajustes.to_csv(f"{wd_out}Escalamiento_{etapa}_{'_'.join(por)}.csv", index=False)
+                print(ajustes[list(por) + ['n', 'exponente', 'ic_inf', 'ic_sup', 'r2']])
+        if (datos['Etapa'] == etapa).any():
+            graficar_escalamiento(datos, etapa, ruta_png=f"{wd_out}Escalamiento_{etapa}.png")
+
+    almacenamiento = comparar_almacenamiento(wd_out)
+    if len(almacenamiento):
+        almacenamiento.to_csv(f"{wd_out}Almacenamiento_Tetis.csv", index=False)
+        print(almacenamiento)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import gzip
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del archivo comprimido del .res de una ejecucion
+COLUMNAS_ARCHIVO = [
+    'Archivo res', 'Formato', 'Res mb', 'Res comprimido mb', 'Razon compresion',
+    'Compresion s', 'Compresion mb por s', 'Sha256 res', 'Sha256 archivo',
+]
+
+EXTENSIONES = {"zstd": ".zst", "gzip": ".gz"}
+NIVELES = {"zstd": 3, "gzip": 6}  # Niveles por defecto: rapidos frente a la escritura del .res
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para elegir el formato de compresion disponible
+def formato_disponible(formato="zstd"):
+    """
+    Retorna `formato` si se puede usar; zstd requiere el paquete zstandard
+    y, si no está instalado, se usa gzip.
+    """
+    if formato == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            print("zstandard no está instalado: los .res se comprimen con gzip")
+            return "gzip"
+    if formato not in EXTENSIONES:
+        raise ValueError(f"Formato de compresión desconocido: {formato}")
+    return formato
+
+################################################################################
+# Clase para escribir en un archivo calculando su sha256
+class _EscritorHash:
+
+    def __init__(self, f):
+        self.f = f
+        self.h = hashlib.sha256()
+
+    def write(self, datos):
+        self.h.update(datos)
+        return self.f.write(datos)
+
+    def flush(self):
+        self.f.flush()
+
+################################################################################
+# Funcion para comprimir un archivo con sus sumas de verificacion
+def comprimir_archivo(src, dst, formato="zstd", nivel=None, bloque=1 << 22):
+    """
+    Comprime `src` en `dst` por bloques (sin cargarlo en memoria) calculando
+    a la vez el sha256 del original y del comprimido. El comprimido y su
+    sha256 ("<dst>.sha256", formato de sha256sum) se escriben en temporales
+    que solo se renombran si la compresión termina; si falla se borran y
+    `dst` no existe.
+
+    Retorna:
+    - diccionario de COLUMNAS_ARCHIVO
+    """
+    nivel = NIVELES[formato] if nivel is None else nivel
+    tmp = f"{dst}.{threading.get_ident()}.tmp"
+    tmp_sha = f"{dst}.sha256.{threading.get_ident()}.tmp"
+    h_res = hashlib.sha256()
+    t0 = time.perf_counter()
+    try:
+        with open(src, "rb") as fs, open(tmp, "wb") as fd:
+            salida = _EscritorHash(fd)
+            if formato == "zstd":
+                import zstandard
+                compresor = zstandard.ZstdCompressor(level=nivel).stream_writer(salida, closefd=False)
+            else:
+                compresor = gzip.GzipFile(filename=os.path.basename(src), mode="wb", compresslevel=nivel, fileobj=salida, mtime=0)
+            with compresor:
+                for parte in iter(lambda: fs.read(bloque), b""):
+                    h_res.update(parte)
+                    compresor.write(parte)
+        segundos = time.perf_counter() - t0
+        with open(tmp_sha, "w") as f:
+            f.write(f"{salida.h.hexdigest()}  {os.path.basename(dst)}\n")
+        os.replace(tmp, dst)
+        os.replace(tmp_sha, f"{dst}.sha256")
+    except BaseException:
+        for ruta in (tmp, tmp_sha):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        raise
+
+    res_mb = os.path.getsize(src) / 1024 ** 2
+    comprimido_mb = os.path.getsize(dst) / 1024 ** 2
+    return {
+        'Archivo res': dst, 'Formato': formato, 'Res mb': res_mb, 'Res comprimido mb': comprimido_mb,
+        'Razon compresion': res_mb / comprimido_mb if comprimido_mb > 0 else None,
+        'Compresion s': segundos, 'Compresion mb por s': res_mb / segundos if segundos > 0 else None,
+        'Sha256 res': h_res.hexdigest(), 'Sha256 archivo': salida.h.hexdigest(),
+    }
+
+################################################################################
+# Clase para archivar los .res en segundo plano
+class ArchivadorRes:
+    """
+    Archiva el .res de cada ejecución mientras la siguiente ya se ejecuta:
+    `archivar` lo aparta de inmediato (renombrado en el mismo volumen, para
+    que la siguiente ejecución no lo sobrescriba) y un grupo de `n_hilos`
+    hilos lo comprime en `wd_archivo` (zlib y zstd liberan el GIL).
+
+    Contrapresión: `archivar` bloquea mientras haya `max_pendientes` .res
+    apartados sin comprimir, o mientras el espacio libre de `wd_archivo` sea
+    menor que `min_libre_gb` más el tamaño del .res y queden compresiones en
+    curso que lo liberen.
+
+    Parámetros:
+    - wd_archivo: directorio de los .res comprimidos
+    - formato: "zstd" (si está instalado zstandard) o "gzip"
+    - nivel: nivel de compresión (None: NIVELES)
+    - n_hilos: compresiones simultáneas
+    - max_pendientes: .res apartados (en curso o en espera) antes de bloquear
+    - min_libre_gb: espacio libre mínimo en wd_archivo
+    - al_terminar: función que recibe el diccionario de COLUMNAS_ARCHIVO (y
+      los `datos` de archivar) de cada .res comprimido, ej. para guardarlo
+      en un AlmacenResultados
+    """
+
+    def __init__(self, wd_archivo, formato="zstd", nivel=None, n_hilos=2, max_pendientes=4, min_libre_gb=20,
+                 al_terminar=None):
+        self.wd_archivo = wd_archivo
+        self.formato = formato_disponible(formato)
+        self.nivel = nivel
+        self.min_libre = min_libre_gb * 1024 ** 3
+        self.al_terminar = al_terminar
+        self.resultados = []
+        self.errores = []
+        self.espera_s = 0.0
+        self._cupos = threading.BoundedSemaphore(max(1, max_pendientes))
+        self._pendientes = set()
+        self._bloqueo = threading.Lock()
+        self._ex = ThreadPoolExecutor(max_workers=max(1, n_hilos))
+        os.makedirs(wd_archivo, exist_ok=True)
+
+    def ruta_archivo(self, *partes):
+        """
+        Retorna la ruta del comprimido para las `partes` (ej. carpeta del
+        modelo, id de la ejecución): "<wd_archivo>/<carpeta>/<id>.res.zst".
+        """
+        return os.path.join(self.wd_archivo, *partes[:-1], f"{partes[-1]}.res{EXTENSIONES[self.formato]}")
+
+    def _esperar_espacio(self, necesario):
+        while shutil.disk_usage(self.wd_archivo).free < self.min_libre + necesario:
+            with self._bloqueo:
+                pendientes = {f for f in self._pendientes if not f.done()}
+            if not pendientes:
+                print(f"Poco espacio libre en {self.wd_archivo}: se archiva de todas formas")
+                return
+            wait(pendientes, return_when=FIRST_COMPLETED)
+
+    def archivar(self, ruta_res, wd_pendientes, destino, datos=None):
+        """
+        Aparta `ruta_res` a `wd_pendientes` (debe estar en el mismo volumen)
+        y encola su compresión en `destino` (ruta_archivo). Retorna
+        `destino`, o None si el .res no existe.
+        """
+        if not os.path.isfile(ruta_res):
+            return None
+        t0 = time.perf_counter()
+        self._cupos.acquire()
+        try:
+            self._esperar_espacio(os.path.getsize(ruta_res))
+            os.makedirs(wd_pendientes, exist_ok=True)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            apartado = os.path.join(wd_pendientes, os.path.basename(destino) + ".pendiente")
+            os.replace(ruta_res, apartado)
+        except BaseException:
+            self._cupos.release()
+            raise
+        self.espera_s += time.perf_counter() - t0
+        futuro = self._ex.submit(self._comprimir, apartado, destino, dict(datos or {}))
+        with self._bloqueo:
+            self._pendientes.add(futuro)
+        futuro.add_done_callback(self._terminado)
+        return destino
+
+    def _terminado(self, futuro):
+        with self._bloqueo:
+            self._pendientes.discard(futuro)
+
+    def _comprimir(self, apartado, destino, datos):
+        # Cualquier error (no solo de disco: zstandard, memoria) deja el .res apartado y sin fila
+        try:
+            try:
+                fila = {**datos, **comprimir_archivo(apartado, destino, self.formato, self.nivel)}
+            except Exception as e:
+                print(f"Error al archivar {apartado}: {e!r} (el .res queda apartado)")
+                self.errores.append((apartado, repr(e)))
+                return
+            os.remove(apartado)
+            self.resultados.append(fila)
+            print(f"Archivado {os.path.basename(destino)}: {fila['Res mb']:.1f} MB, razon {fila['Razon compresion'] or 0:.1f}, "
+                  f"{fila['Compresion mb por s'] or 0:.0f} MB/s")
+            if self.al_terminar:
+                try:
+                    self.al_terminar(fila)
+                except Exception as e:
+                    print(f"Error al registrar {destino}: {e!r} (el comprimido y su .sha256 quedan)")
+                    self.errores.append((destino, repr(e)))
+        finally:
+            self._cupos.release()
+
+    def cerrar(self):
+        """
+        Espera a que terminen las compresiones y retorna el resumen.
+        """
+        self._ex.shutdown(wait=True)
+        return self.resumen()
+
+    def resumen(self):
+        """
+        Retorna el número de .res archivados, MB originales y comprimidos,
+        razón de compresión global, MB/s por hilo, segundos que las
+        ejecuciones esperaron por la contrapresión y errores.
+        """
+        res_mb = sum(r['Res mb'] for r in self.resultados)
+        comprimido_mb = sum(r['Res comprimido mb'] for r in self.resultados)
+        segundos = sum(r['Compresion s'] for r in self.resultados)
+        return {
+            'Archivados': len(self.resultados), 'Res mb': res_mb, 'Comprimido mb': comprimido_mb,
+            'Razon compresion': res_mb / comprimido_mb if comprimido_mb > 0 else None,
+            'Compresion mb por s': res_mb / segundos if segundos > 0 else None,
+            'Espera s': self.espera_s, 'Errores': len(self.errores),
+        }
+
+################################################################################
+# Funcion para verificar un .res archivado
+def verificar_archivo(ruta, bloque=1 << 22):
+    """
+    Compara el sha256 del comprimido con el de su archivo .sha256. Retorna
+    True si coinciden.
+    """
+    with open(f"{ruta}.sha256") as f:
+        esperado = f.read().split()[0]
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest() == esperado
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import csv
+import time
+import tempfile
+
+from monitor_hwinfo import SeguidorHWiNFO, IndiceHWiNFO, marca_tiempo, valor_float
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Lector original: recorre todo el CSV en cada consulta
+def leer_ultima_frecuencia_completa(hwinfo_log_path, freq_col_name):
+    try:
+        with open(hwinfo_log_path, 'r', encoding='utf-8', errors='ignore') as f:
+            reader = csv.DictReader(f)
+            last_row = None
+            for row in reader:
+                if row[freq_col_name]:
+                    last_row = row
+        if last_row:
+            valor = last_row[freq_col_name].replace(",", ".").strip()
+            return float(valor)
+    except Exception:
+        return None
+
+################################################################################
+# Lector original de una ventana: recorre todo el CSV hasta el final de la ventana
+def leer_ventana_completa(hwinfo_log_path, inicio, fin, freq_col_name):
+    t, valores = [], []
+    with open(hwinfo_log_path, 'r', encoding='utf-8', errors='ignore') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            tf = marca_tiempo(row[reader.fieldnames[0]], row['Time'])
+            if tf is None or tf < inicio:
+                continue
+            if tf > fin:
+                break
+            t.append(tf)
+            valores.append(valor_float(row[freq_col_name]))
+    return t, valores
+
+################################################################################
+# Funcion para generar filas sinteticas con el formato de HWiNFO
+def fila_sintetica(n, n_cols):
+    valores = [f'"{(n * 7 + j) % 5000},{j % 10}"' for j in range(n_cols)]
+    return f"18.10.2026,{n // 3600:02d}:{(n // 60) % 60:02d}:{n % 60:02d}.000," + ",".join(valores) + "\n"
+
+################################################################################
+# Funcion para medir el costo medio de una consulta
+def medir(funcion, repeticiones):
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - t0) / repeticiones * 1000
+
+
+#%%###############################################################################################################
+##### Benchmark del lector del monitor de HWiNFO #######
+################################################################################################################
+n_cols = 300  # El log real de HWiNFO tiene mas de 300 columnas
+col_monitor = "Relojes núcleo (avg) [MHz]"
+filas_por_paso = 2000
+pasos = 6
+
+with tempfile.TemporaryDirectory() as tmp:
+    log = os.path.join(tmp, "monitoreo.csv")
+    columnas = ["Date", "Time", col_monitor] + [f"Sensor {j} [X]" for j in range(n_cols - 1)]
+    with open(log, "w", encoding="utf-8") as f:
+        f.write("\ufeff" + ",".join(f'"{c}"' for c in columnas) + "\n")
+
+    seguidor = SeguidorHWiNFO(log, col_monitor)
+    n = 0
+
+    print(f"{'Tamaño MB':>10} {'Filas':>8} {'Completo ms':>12} {'Seguidor ms':>12}")
+    for paso in range(pasos):
+        with open(log, "a", encoding="utf-8") as f:
+            for _ in range(filas_por_paso * (paso + 1)):
+                f.write(fila_sintetica(n, n_cols))
+                n += 1
+
+        seguidor.leer()  # Consume el bloque añadido
+
+        t_completo = medir(lambda: leer_ultima_frecuencia_completa(log, col_monitor), 3)
+
+        # Simula el muestreo de HWiNFO: una fila nueva antes de cada consulta
+        t_seguidor = 0.0
+        for _ in range(200):
+            with open(log, "a", encoding="utf-8") as f:
+                f.write(fila_sintetica(n, n_cols))
+            n += 1
+            t_seguidor += medir(seguidor.leer, 1) / 200
+
+        tamaño_mb = os.path.getsize(log) / 1024 / 1024
+        print(f"{tamaño_mb:10.1f} {n:8d} {t_completo:12.2f} {t_seguidor:12.3f}")
+
+    seguidor.cerrar()
+
+    #%% Ventana de una ejecucion pasada: lectura completa frente al indice por tiempo
+    print(f"\n{'Tamaño MB':>10} {'Filas':>8} {'Completo ms':>12} {'Indice ms':>10} {'Ventana ms':>11}")
+    indice = IndiceHWiNFO(log, ruta_indice=os.path.join(tmp, "monitoreo.idx.npz"))
+    t0 = time.perf_counter()
+    indice.actualizar()
+    t_indice = (time.perf_counter() - t0) * 1000
+    base = marca_tiempo("18.10.2026", "00:00:00")
+    inicio, fin = base + n * 0.8, base + n * 0.8 + 600  # Ventana de 10 min hacia el final del log
+    t_completo = medir(lambda: leer_ventana_completa(log, inicio, fin, col_monitor), 1)
+    t_ventana = medir(lambda: indice.ventana(inicio, fin, [col_monitor]), 3)
+    print(f"{os.path.getsize(log) / 1024 / 1024:10.1f} {n:8d} {t_completo:12.2f} {t_indice:10.2f} {t_ventana:11.2f}")
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+from ejecucion import ResultadoEjecucion
+from enlaces import sha256_archivo
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas de la cache por etapa
+COLUMNAS_CACHE = ['Cache', 'Restauracion s', 'Ahorro s']
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para listar los archivos de un directorio con su tamaño y fecha
+def estado_arbol(directorio):
+    """
+    Retorna {ruta relativa: (tamaño, mtime_ns)} de todos los archivos del
+    directorio y sus subcarpetas (rutas con "/").
+    """
+    estado = {}
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            ruta = os.path.join(raiz, nombre)
+            st = os.stat(ruta)
+            estado[os.path.relpath(ruta, directorio).replace(os.sep, "/")] = (st.st_size, st.st_mtime_ns)
+    return estado
+
+################################################################################
+# Funcion para escribir un JSON de forma atomica
+def _guardar_json(ruta, datos):
+    tmp = f"{ruta}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, ruta)
+
+################################################################################
+# Clase para la cache de etapas direccionada por contenido
+class CacheEtapas:
+    """
+    Caché de las salidas de las etapas de preproceso (Control, Toparc, Hantec).
+
+    La clave de una etapa es el hash del ejecutable y del contenido de sus
+    archivos de entrada (todos los archivos del directorio de ejecución
+    salvo ejecutables, salidas conocidas de la etapa y `excluir`). Las
+    salidas se detectan comparando el directorio antes y después de ejecutar
+    y se guardan una vez por contenido en {wd_cache}objetos/. En un acierto
+    se restauran con enlaces duros (copia si no es posible) en lugar de
+    ejecutar la etapa.
+
+    Los hashes de los archivos se guardan junto a su tamaño y fecha de
+    modificación, de modo que los archivos grandes que no cambian (DEM,
+    Topolco) solo se leen una vez.
+
+    Parámetros:
+    - wd_cache: directorio de la caché
+    """
+
+    def __init__(self, wd_cache):
+        self.wd_cache = wd_cache
+        self._bloqueo = threading.Lock()
+        os.makedirs(os.path.join(wd_cache, "objetos"), exist_ok=True)
+        os.makedirs(os.path.join(wd_cache, "entradas"), exist_ok=True)
+        self._ruta_hashes = os.path.join(wd_cache, "hashes.json")
+        self._ruta_salidas = os.path.join(wd_cache, "salidas.json")
+        self._hashes = self._cargar(self._ruta_hashes)
+        self._salidas = self._cargar(self._ruta_salidas)
+
+    @staticmethod
+    def _cargar(ruta):
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def hash_archivo(self, ruta, estado=None):
+        """
+        Retorna el sha256 del archivo, reutilizando el calculado antes si el
+        tamaño y la fecha de modificación no cambiaron.
+        """
+        ruta = os.path.abspath(ruta)
+        if estado is None:
+            st = os.stat(ruta)
+            estado = (st.st_size, st.st_mtime_ns)
+        previo = self._hashes.get(ruta)
+        if previo and tuple(previo[:2]) == tuple(estado):
+            return previo[2]
+        sha = sha256_archivo(ruta)
+        with self._bloqueo:
+            self._hashes[ruta] = [estado[0], estado[1], sha]
+        return sha
+
+    def _hash_sin_ruta(self, ruta, wd):
+        # FileSSP lleva la ruta del directorio de ejecucion: no debe cambiar la clave
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+        for variante in {wd, wd.replace("\\", "/"), wd.replace("/", "\\")}:
+            contenido = contenido.replace(variante.encode("utf-8", errors="ignore"), b"")
+        return hashlib.sha256(contenido).hexdigest()
+
+    def _entradas(self, etapa, wd, estado, excluir, sin_ruta):
+        conocidas = set(self._salidas.get(etapa, []))
+        entradas = {}
+        for relativa, st in estado.items():
+            nombre = os.path.basename(relativa)
+            if relativa in conocidas or nombre in excluir or nombre.lower().endswith(".exe"):
+                continue
+            ruta = os.path.join(wd, relativa)
+            entradas[relativa] = self._hash_sin_ruta(ruta, wd) if nombre in sin_ruta else self.hash_archivo(ruta, st)
+        return entradas
+
+    @staticmethod
+    def _clave(etapa, hash_exe, entradas, salidas_conocidas):
+        datos = [etapa, hash_exe, sorted((r, h) for r, h in entradas.items() if r not in salidas_conocidas)]
+        return hashlib.sha256(json.dumps(datos).encode("utf-8")).hexdigest()
+
+    def _ruta_objeto(self, sha):
+        return os.path.join(self.wd_cache, "objetos", sha[:2], sha)
+
+    def _ruta_manifiesto(self, etapa, clave):
+        return os.path.join(self.wd_cache, "entradas", etapa, f"{clave}.json")
+
+    def _restaurar(self, manifiesto, wd):
+        """
+        Enlaza (o copia) los objetos del manifiesto en `wd`. Retorna False si
+        algún objeto falta o fue modificado después de guardarse.
+        """
+        for relativa, (sha, tamaño, mtime_ns) in manifiesto['salidas'].items():
+            objeto = self._ruta_objeto(sha)
+            try:
+                st = os.stat(objeto)
+            except OSError:
+                return False
+            if (st.st_size, st.st_mtime_ns) != (tamaño, mtime_ns):
+                return False  # Un enlace restaurado antes se modificó en el directorio de ejecución
+        for relativa, (sha, _, _) in manifiesto['salidas'].items():
+            destino = os.path.join(wd, relativa)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            if os.path.lexists(destino):
+                os.remove(destino)
+            try:
+                os.link(self._ruta_objeto(sha), destino)
+            except OSError:
+                shutil.copy2(self._ruta_objeto(sha), destino)
+        return True
+
+    def salidas_conocidas(self):
+        """
+        Retorna las rutas relativas de las salidas detectadas de todas las
+        etapas (archivos que alguna etapa escribió en su directorio).
+        """
+        with self._bloqueo:
+            return sorted({r for lista in self._salidas.values() for r in lista})
+
+    def _separar_enlaces(self, wd):
+        """
+        Reemplaza por copias propias las salidas de etapas restauradas en `wd`
+        como enlaces a la caché, para que la etapa que se va a ejecutar no
+        modifique los objetos.
+        """
+        salidas = {r for lista in self._salidas.values() for r in lista}
+        for relativa in salidas:
+            ruta = os.path.join(wd, relativa)
+            if os.path.isfile(ruta) and os.stat(ruta).st_nlink > 1:
+                tmp = f"{ruta}.{threading.get_ident()}.tmp"
+                shutil.copy2(ruta, tmp)
+                os.replace(tmp, ruta)
+
+    def _guardar_objeto(self, ruta, sha):
+        objeto = self._ruta_objeto(sha)
+        if os.path.isfile(objeto):
+            return objeto
+        os.makedirs(os.path.dirname(objeto), exist_ok=True)
+        tmp = f"{objeto}.{threading.get_ident()}.tmp"
+        shutil.copy2(ruta, tmp)
+        os.replace(tmp, objeto)
+        return objeto
+
+    def ejecutar(self, etapa, wd, funcion, exe, excluir=("Fichero_resultados.res",),
+                 sin_ruta=("FileSSP.txt", "FileSSP.tet")):
+        """
+        Ejecuta una etapa a través de la caché.
+
+        Parámetros:
+        - etapa: nombre de la etapa (ej. "Toparc")
+        - wd: directorio de ejecución de la etapa
+        - funcion: función sin argumentos que ejecuta la etapa y retorna un
+          ResultadoEjecucion (ej. lambda: run_exe_monitor(...))
+        - exe: ruta del ejecutable (su hash forma parte de la clave)
+        - excluir: nombres de archivos que no son entradas de la etapa
+        - sin_ruta: archivos cuyo hash se calcula sin la ruta de `wd`
+
+        Retorna:
+        - ResultadoEjecucion; en un acierto son los valores de la ejecución
+          que generó las salidas. En `extra` quedan 'Cache' ("HIT" o "MISS"),
+          'Restauracion s' y 'Ahorro s' (tiempo de la etapa menos el de
+          restauración)
+        """
+        t0 = time.perf_counter()
+        estado = estado_arbol(wd)
+        hash_exe = self.hash_archivo(exe)
+        entradas = self._entradas(etapa, wd, estado, excluir, sin_ruta)
+        clave = self._clave(etapa, hash_exe, entradas, set())
+        manifiesto = self._cargar(self._ruta_manifiesto(etapa, clave))
+
+        if manifiesto and self._restaurar(manifiesto, wd):
+            restauracion = time.perf_counter() - t0
+            print(f"      Cache {etapa}: restaurado en {restauracion:.2f} s ({clave[:12]})")
+            tiempo = manifiesto['valores'][0]
+            ahorro = tiempo - restauracion if isinstance(tiempo, (int, float)) else None
+            self._guardar_indices()
+            return ResultadoEjecucion(manifiesto['valores'], dict(
+                manifiesto['extra'], **{'Cache': "HIT", 'Restauracion s': restauracion, 'Ahorro s': ahorro}))
+
+        self._separar_enlaces(wd)
+        resultado = funcion()
+        extra = dict(resultado.extra, **{'Cache': "MISS", 'Restauracion s': None, 'Ahorro s': None})
+        if resultado[0] == "NOT EXECUTABLE" or resultado.extra.get('Codigo salida'):
+            return ResultadoEjecucion(resultado, extra)
+
+        # Salidas: archivos nuevos o modificados por la etapa
+        despues = estado_arbol(wd)
+        salidas = {}
+        for relativa, st in despues.items():
+            nombre = os.path.basename(relativa)
+            if estado.get(relativa) == st or nombre in excluir or nombre.lower().endswith(".exe"):
+                continue
+            sha = self.hash_archivo(os.path.join(wd, relativa), st)
+            objeto = self._guardar_objeto(os.path.join(wd, relativa), sha)
+            st_obj = os.stat(objeto)
+            salidas[relativa] = [sha, st_obj.st_size, st_obj.st_mtime_ns]
+
+        # La clave se guarda sin las salidas, aunque existieran antes de ejecutar (ej. Topolco.sds de otra campaña)
+        with self._bloqueo:
+            self._salidas[etapa] = sorted(set(self._salidas.get(etapa, [])) | set(salidas))
+        clave = self._clave(etapa, hash_exe, entradas, set(salidas))
+        os.makedirs(os.path.dirname(self._ruta_manifiesto(etapa, clave)), exist_ok=True)
+        _guardar_json(self._ruta_manifiesto(etapa, clave), {
+            'etapa': etapa, 'exe': hash_exe, 'entradas': entradas, 'salidas': salidas,
+            'valores': [v if isinstance(v, (int, float, str)) else None for v in resultado],
+            'extra': {k: v for k, v in resultado.extra.items() if isinstance(v, (int, float, str, type(None)))},
+            'registro': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        })
+        self._guardar_indices()
+        return ResultadoEjecucion(resultado, extra)
+
+    def _guardar_indices(self):
+        with self._bloqueo:
+            _guardar_json(self._ruta_hashes, self._hashes)
+            _guardar_json(self._ruta_salidas, self._salidas)
+
+################################################################################
+# Funcion para obtener las columnas de cache de un resultado
+def valores_cache(resultado):
+    return [resultado.extra.get(col) for col in COLUMNAS_CACHE]
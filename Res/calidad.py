@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import numpy as np
+
+from equipo import nucleos_por_tipo
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas de la calidad de la medicion de una ejecucion
+COLUMNAS_CALIDAD = [
+    'Calidad', 'Contaminada', 'Throttling %', 'Termico %', 'Limite potencia %',
+    'Carga fondo %', 'Residencia P %', 'Temp max C', 'Potencia media W', 'Frec relativa base',
+]
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para calcular el porcentaje de muestras que cumplen una condicion
+def _porcentaje(condicion, validas):
+    n = int(np.count_nonzero(validas))
+    return float(100.0 * np.count_nonzero(condicion & validas) / n) if n else None
+
+################################################################################
+# Clase para evaluar la calidad de la medicion de una ejecucion
+class DetectorCalidad:
+    """
+    Evalúa la telemetría de una ejecución y le asigna una calidad entre 0 y
+    1 (producto de las fracciones de tiempo sin perturbaciones):
+
+    - Throttling: la frecuencia de los núcleos ocupados (muestreador psutil,
+      o la media de HWiNFO si no hay frecuencia por núcleo) por debajo de
+      `umbral_frec` veces la frecuencia base del perfil del equipo.
+    - Térmico: temperatura del paquete igual o mayor a `temp_limite`.
+    - Límite de potencia: indicadores Sí/No de HWiNFO de límite activo.
+    - Carga de fondo: otros procesos usan más de `umbral_fondo` núcleos de
+      los asignados a la ejecución (de todo el equipo si no está fijada; en
+      ese caso no cuentan los demás procesos hijos del arnés, es decir las
+      otras ejecuciones de la campaña).
+    - Residencia P/E: en CPUs híbridas, porcentaje del uso en P-cores; si la
+      ejecución no está fijada, se penaliza la mezcla de P-cores y E-cores.
+
+    Una ejecución con calidad menor que `umbral_calidad` queda marcada como
+    contaminada.
+
+    Parámetros:
+    - perfil: perfil del equipo (perfil_equipo)
+    - columnas: {clave: columna de HWiNFO} con las claves 'temperatura',
+      'potencia' y las que empiezan con 'limite' (indicadores Sí/No); las
+      columnas que no estén en el log se ignoran
+    """
+
+    def __init__(self, perfil, columnas=None, umbral_frec=0.95, temp_limite=95.0, umbral_fondo=0.5,
+                 umbral_calidad=0.9):
+        self.frec_base = perfil.get('frec_base_mhz')
+        self.tipos = nucleos_por_tipo(perfil)
+        self.columnas = dict(columnas or {})
+        self.umbral_frec = umbral_frec
+        self.temp_limite = temp_limite
+        self.umbral_fondo = umbral_fondo
+        self.umbral_calidad = umbral_calidad
+
+    def evaluar(self, hwinfo, muestras=None, nucleos=None):
+        """
+        Parámetros:
+        - hwinfo: {'frec_hwinfo': MHz, clave de `columnas`: valores} leídos
+          de HWiNFO durante la ejecución
+        - muestras: series del muestreador psutil ('uso', 'frec', 'cpu_proc' y
+          'cpu_arnes'), o None
+        - nucleos: núcleos lógicos asignados a la ejecución, o None
+
+        Retorna:
+        - diccionario de COLUMNAS_CALIDAD
+        """
+        datos = dict.fromkeys(COLUMNAS_CALIDAD)
+        serie = lambda clave: np.asarray([np.nan if v is None else v for v in hwinfo.get(clave, [])], dtype=np.float64)
+        factores = []
+
+        # Frecuencia de los nucleos ocupados por muestra
+        frec = serie('frec_hwinfo')
+        ocupado = None
+        if muestras is not None and len(muestras['uso']):
+            uso = np.asarray(muestras['uso'], dtype=np.float64)
+            ocupado = np.asarray(muestras['cpu_proc'], dtype=np.float64) >= 50
+            f = np.asarray(muestras['frec'], dtype=np.float64)
+            if f.ndim == 2 and np.nanstd(f) > 0:  # Frecuencia por núcleo (Linux)
+                activos = np.where(uso >= 50, f, np.nan)
+                with np.errstate(all="ignore"):
+                    frec = np.array([np.nanmean(fila) if np.isfinite(fila).any() else np.nan for fila in activos])
+            elif not frec.size:
+                frec = np.nanmean(f, axis=1) if f.ndim == 2 else f
+        if self.frec_base and frec.size:
+            validas = np.isfinite(frec) & (ocupado if ocupado is not None and ocupado.size == frec.size else True)
+            datos['Throttling %'] = _porcentaje(frec < self.umbral_frec * self.frec_base, validas)
+            if validas.any():
+                datos['Frec relativa base'] = float(np.median(frec[validas]) / self.frec_base)
+
+        # Temperatura y potencia (HWiNFO)
+        temp = serie('temperatura')
+        if np.isfinite(temp).any():
+            datos['Temp max C'] = float(np.nanmax(temp))
+            datos['Termico %'] = _porcentaje(temp >= self.temp_limite, np.isfinite(temp))
+        potencia = serie('potencia')
+        if np.isfinite(potencia).any():
+            datos['Potencia media W'] = float(np.nanmean(potencia))
+        limites = [serie(clave) for clave in self.columnas if clave.startswith('limite')]
+        limites = [l for l in limites if np.isfinite(l).any()]
+        if limites:
+            n = min(l.size for l in limites)
+            activo = np.any([np.nan_to_num(l[:n]) >= 0.5 for l in limites], axis=0)
+            datos['Limite potencia %'] = _porcentaje(activo, np.ones(n, dtype=bool))
+
+        # Carga de otros procesos y residencia en P-cores (muestreador)
+        if muestras is not None and len(muestras['uso']):
+            cols = list(nucleos) if nucleos is not None else list(range(uso.shape[1]))
+            fondo = uso[:, cols].sum(axis=1) / 100 - np.asarray(muestras['cpu_proc'], dtype=np.float64) / 100
+            if nucleos is None and 'cpu_arnes' in muestras:  # Sin fijar, las demas ejecuciones comparten los nucleos
+                fondo -= np.asarray(muestras['cpu_arnes'], dtype=np.float64) / 100
+            datos['Carga fondo %'] = _porcentaje(fondo > self.umbral_fondo, np.ones(fondo.size, dtype=bool))
+            if self.tipos:
+                p, e = self.tipos
+                total = uso[:, p + e].sum()
+                if total > 0:
+                    datos['Residencia P %'] = float(100 * uso[:, p].sum() / total)
+                    if nucleos is None:
+                        factores.append(1 - min(datos['Residencia P %'], 100 - datos['Residencia P %']) / 100)
+
+        for col in ('Throttling %', 'Termico %', 'Limite potencia %', 'Carga fondo %'):
+            if datos[col] is not None:
+                factores.append(1 - datos[col] / 100)
+        datos['Calidad'] = float(np.prod(factores)) if factores else None
+        datos['Contaminada'] = int(datos['Calidad'] is not None and datos['Calidad'] < self.umbral_calidad)
+        return datos
+
+################################################################################
+# Funcion para obtener las columnas de calidad de un resultado
+def valores_calidad(resultado):
+    return [resultado.extra.get(col) for col in COLUMNAS_CALIDAD]
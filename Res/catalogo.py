@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import json
+import threading
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para reemplazar datos de escala
+def replace_scale(vec):
+    if "1k" in vec:
+        vec = "1000"
+    elif "2p5" in vec:
+        vec = "2500"
+    elif "5k" in vec:
+        vec = "5000"
+    elif "30m" in vec:
+        vec = "30"
+    elif "200m" in vec:
+        vec = "200"
+    elif "500m" in vec:
+        vec = "500"
+    return vec
+
+################################################################################
+# Funcion para leer el numero de celdas de la cabecera de Topolco
+def leer_celdas_topolco(wd_topolco, linea=6, columna=1):
+    """
+    Lee el número de celdas de Topolco.sds (fila 7, columna 2) leyendo solo
+    las primeras líneas del archivo, sin cargar el resto en memoria.
+    """
+    with open(wd_topolco, "r") as f:
+        for n, texto in enumerate(f):
+            if n == linea:
+                return int(texto.split()[columna])
+    raise ValueError(f"Topolco sin cabecera completa: {wd_topolco}")
+
+################################################################################
+# Funcion para obtener los datos del nombre de la carpeta del modelo
+def datos_modelo(carpeta):
+    """
+    Decodifica el nombre <prefijo>_<cuenca>_<escala>_<escenario> de la carpeta.
+    """
+    parts = carpeta.split('_')
+    return {
+        'carpeta': carpeta,
+        'cuenca': parts[1].upper(),
+        'escala': replace_scale(parts[2]),
+        'escenario': parts[3].upper(),
+        'modelo': f"{parts[1]}_{parts[2]}_{parts[3]}",
+    }
+
+################################################################################
+# Funcion para obtener tamaño y fecha de modificacion de los archivos de un directorio
+def estado_archivos(directorio, extension=None):
+    estado = {}
+    if not os.path.isdir(directorio):
+        return estado
+    with os.scandir(directorio) as it:
+        for entrada in it:
+            if entrada.is_file() and (extension is None or entrada.name.endswith(extension)):
+                st = entrada.stat()
+                estado[entrada.name] = [st.st_size, st.st_mtime]
+    return estado
+
+################################################################################
+# Clase para el catalogo de modelos
+class CatalogoModelos:
+    """
+    Catálogo persistente de los modelos de `wd_path`.
+
+    Para cada carpeta de modelo guarda la cuenca, escala, escenario, número
+    de celdas (de la cabecera de Topolco), el tamaño y la fecha de
+    modificación de los archivos de entrada y los ficheros de evento (Fe)
+    disponibles. Se guarda en JSON y al actualizarlo solo se vuelve a leer
+    Topolco de los modelos cuyo archivo cambió.
+
+    Parámetros:
+    - wd_path: directorio con las carpetas de los modelos
+    - ruta_cache: archivo .json del catálogo (None para no persistirlo)
+    """
+
+    def __init__(self, wd_path, ruta_cache=None):
+        self.wd_path = wd_path
+        self.ruta_cache = ruta_cache
+        self._bloqueo = threading.Lock()
+        self.entradas = {}
+        if ruta_cache and os.path.isfile(ruta_cache):
+            try:
+                with open(ruta_cache, encoding="utf-8") as f:
+                    self.entradas = json.load(f)
+            except (OSError, ValueError):
+                self.entradas = {}
+        self.actualizar()
+
+    def guardar(self):
+        if not self.ruta_cache:
+            return
+        tmp = self.ruta_cache + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entradas, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.ruta_cache)
+
+    def _escanear(self, carpeta):
+        """
+        Actualiza la entrada de un modelo; reutiliza las celdas si Topolco no cambió.
+        """
+        wd_model = os.path.join(self.wd_path, carpeta)
+        anterior = self.entradas.get(carpeta, {})
+        entrada = datos_modelo(carpeta)
+        entrada['archivos'] = estado_archivos(wd_model)
+        entrada['fe'] = sorted(os.path.splitext(n)[0] for n in estado_archivos(os.path.join(wd_model, "Fe"), ".txt"))
+
+        topolco = entrada['archivos'].get("Topolco.sds")
+        if topolco is None:
+            entrada['celdas'] = None
+        elif anterior.get('archivos', {}).get("Topolco.sds") == topolco and anterior.get('celdas') is not None:
+            entrada['celdas'] = anterior['celdas']
+        else:
+            try:
+                entrada['celdas'] = leer_celdas_topolco(os.path.join(wd_model, "Topolco.sds"))
+            except (OSError, ValueError, IndexError):
+                entrada['celdas'] = None
+        self.entradas[carpeta] = entrada
+        return entrada
+
+    def actualizar(self):
+        """
+        Recorre `wd_path` y actualiza el catálogo (se eliminan los modelos que ya no existen).
+        """
+        with self._bloqueo:
+            carpetas = sorted(nombre for nombre in os.listdir(self.wd_path)
+                              if os.path.isdir(os.path.join(self.wd_path, nombre)))
+            self.entradas = {c: e for c, e in self.entradas.items() if c in carpetas}
+            for carpeta in carpetas:
+                self._escanear(carpeta)
+            self.guardar()
+
+    def modelos(self):
+        """
+        Retorna la lista de entradas del catálogo ordenadas por carpeta.
+        """
+        return [self.entradas[c] for c in sorted(self.entradas)]
+
+    def modelo(self, carpeta):
+        return self.entradas[carpeta]
+
+    def celdas(self, carpeta):
+        """
+        Retorna el número de celdas del modelo, volviendo a leer la cabecera
+        de Topolco solo si el archivo cambió (ej. tras ejecutar Toparc).
+        """
+        with self._bloqueo:
+            celdas = self._escanear(carpeta)['celdas']
+            self.guardar()
+            return celdas
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+import pandas as pd
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Estados de un trabajo de la cola
+ESTADOS_TRABAJO = ("PENDIENTE", "EN_CURSO", "HECHO", "ERROR")
+
+# Columnas de la cola que se agregan a cada fila de resultados
+COLUMNAS_COLA = ['Campaña', 'Trabajo', 'Repeticion', 'Intento', 'Trabajador']
+
+# Metodos de la cola que el coordinador sirve a los trabajadores (servir_cola)
+METODOS_COLA = ("agregar", "recuperar_vencidos", "arrendar", "latido", "completar", "fallar", "pendientes", "resumen",
+                "trabajos", "leer")
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para expandir una campaña en trabajos
+def expandir_campaña(modelos, repeticiones=1, equipos=(None,)):
+    """
+    Retorna un trabajo por modelo x Fe x repetición (x equipo).
+
+    Parámetros:
+    - modelos: entradas del catálogo (CatalogoModelos.modelos())
+    - repeticiones: ejecuciones de cada Fe
+    - equipos: nombres o huellas de los equipos que deben ejecutar toda la
+      matriz; (None,): cada trabajo lo ejecuta un solo equipo, el primero
+      que lo toma
+    """
+    trabajos = []
+    for destino in equipos:
+        for entrada in modelos:
+            for file in entrada['fe']:
+                for rep in range(repeticiones):
+                    trabajos.append({
+                        'id': f"{destino or '*'}:{entrada['carpeta']}:{file}:{rep}", 'carpeta': entrada['carpeta'],
+                        'modelo': entrada['modelo'], 'entrada': file, 'repeticion': rep, 'destino': destino,
+                    })
+    return trabajos
+
+################################################################################
+# Clase para la cola de trabajos de una campaña en SQLite
+class ColaCampaña:
+    """
+    Cola durable de los trabajos de una campaña en un archivo SQLite en un
+    disco local del coordinador. Los trabajadores de otros equipos no abren
+    el archivo: usan la cola que el coordinador publica con `servir_cola`
+    (`conectar_cola`). Los bloqueos de SQLite no son fiables en carpetas de
+    red (SMB), por eso se rechazan las rutas UNC.
+
+    Un trabajador toma un trabajo con `arrendar`: queda EN_CURSO a su nombre
+    hasta `duracion_lease` s después, y lo mantiene con `latido` mientras
+    ejecuta. Si el trabajador o su equipo se caen, el lease vence y el
+    trabajo vuelve a PENDIENTE (o pasa a ERROR tras `max_intentos`) la
+    próxima vez que alguien toma un trabajo o el coordinador revisa la
+    cola. El resultado solo se acepta si el trabajador aún tiene el lease,
+    así un trabajo recuperado no queda dos veces.
+
+    Cada operación es una transacción BEGIN IMMEDIATE (un solo escritor a la
+    vez), también entre procesos de un mismo equipo que abren el archivo.
+    Los leases usan el reloj del equipo que abre la cola.
+
+    Parámetros:
+    - ruta_db: archivo .sqlite de la cola (se crea si no existe)
+    - campaña: nombre de la campaña (una cola puede tener varias)
+    - duracion_lease: s que dura un lease sin latidos
+    - max_intentos: leases de un trabajo (vencidos o fallidos) antes de ERROR
+      (duracion_lease y max_intentos se guardan con la campaña; con None se
+      usan los guardados, así los trabajadores siguen al coordinador)
+    """
+
+    def __init__(self, ruta_db, campaña, duracion_lease=None, max_intentos=None):
+        if ruta_db.startswith(("//", "\\\\")):
+            raise ValueError(f"La cola debe estar en un disco local del coordinador, no en una carpeta de red: {ruta_db}")
+        self.ruta_db = ruta_db
+        self.campaña = campaña
+        self._bloqueo = threading.Lock()
+        self._con = sqlite3.connect(ruta_db, timeout=60, isolation_level=None, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        self._con.execute("PRAGMA journal_mode=DELETE")
+        with self._transaccion() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS trabajos (id TEXT, campaña TEXT, carpeta TEXT, modelo TEXT, entrada TEXT, "
+                "repeticion INTEGER, destino TEXT, estado TEXT, intentos INTEGER DEFAULT 0, trabajador TEXT, equipo TEXT, "
+                "huella TEXT, creado REAL, inicio REAL, latido REAL, lease_hasta REAL, fin REAL, error TEXT, "
+                "PRIMARY KEY (campaña, id))")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS resultados (campaña TEXT, id TEXT, intento INTEGER, trabajador TEXT, "
+                "equipo TEXT, huella TEXT, fin REAL, fila TEXT, PRIMARY KEY (campaña, id, intento))")
+            con.execute("CREATE INDEX IF NOT EXISTS trabajos_estado ON trabajos (campaña, estado)")
+            con.execute("CREATE TABLE IF NOT EXISTS campañas (campaña TEXT PRIMARY KEY, duracion_lease REAL, max_intentos INTEGER)")
+            con.execute("INSERT OR IGNORE INTO campañas VALUES (?, 300, 3)", (campaña,))
+            if duracion_lease is not None:
+                con.execute("UPDATE campañas SET duracion_lease = ? WHERE campaña = ?", (duracion_lease, campaña))
+            if max_intentos is not None:
+                con.execute("UPDATE campañas SET max_intentos = ? WHERE campaña = ?", (max_intentos, campaña))
+            self.duracion_lease, self.max_intentos = con.execute(
+                "SELECT duracion_lease, max_intentos FROM campañas WHERE campaña = ?", (campaña,)).fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def cerrar(self):
+        self._con.close()
+
+    @contextmanager
+    def _transaccion(self):
+        with self._bloqueo:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._con
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+            self._con.execute("COMMIT")
+
+    def agregar(self, trabajos):
+        """
+        Agrega los trabajos de expandir_campaña; los que ya están en la cola
+        (misma campaña e id) no se tocan. Retorna cuántos se agregaron.
+        """
+        ahora = time.time()
+        with self._transaccion() as con:
+            antes = con.total_changes
+            con.executemany(
+                "INSERT OR IGNORE INTO trabajos (id, campaña, carpeta, modelo, entrada, repeticion, destino, estado, creado) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'PENDIENTE', ?)",
+                [(t['id'], self.campaña, t['carpeta'], t['modelo'], t['entrada'], t['repeticion'], t['destino'], ahora)
+                 for t in trabajos])
+            return con.total_changes - antes
+
+    def _recuperar(self, con, ahora):
+        return con.execute(
+            "UPDATE trabajos SET estado = CASE WHEN intentos >= ? THEN 'ERROR' ELSE 'PENDIENTE' END, "
+            "error = 'Lease vencido de ' || trabajador, trabajador = NULL "
+            "WHERE campaña = ? AND estado = 'EN_CURSO' AND lease_hasta < ?",
+            (self.max_intentos, self.campaña, ahora)).rowcount
+
+    def recuperar_vencidos(self):
+        """
+        Devuelve a PENDIENTE (o a ERROR) los trabajos con el lease vencido.
+        Retorna cuántos se recuperaron.
+        """
+        with self._transaccion() as con:
+            return self._recuperar(con, time.time())
+
+    def arrendar(self, trabajador, equipo, huella):
+        """
+        Toma el trabajo pendiente más antiguo para el equipo (los de destino
+        None o igual a su nombre o huella; primero los de menos intentos).
+
+        Retorna el trabajo como diccionario, o None si no hay pendientes.
+        """
+        ahora = time.time()
+        with self._transaccion() as con:
+            self._recuperar(con, ahora)
+            fila = con.execute(
+                "SELECT rowid, * FROM trabajos WHERE campaña = ? AND estado = 'PENDIENTE' "
+                "AND (destino IS NULL OR destino IN (?, ?)) ORDER BY intentos, rowid LIMIT 1",
+                (self.campaña, equipo, huella)).fetchone()
+            if fila is None:
+                return None
+            con.execute(
+                "UPDATE trabajos SET estado = 'EN_CURSO', intentos = intentos + 1, trabajador = ?, equipo = ?, huella = ?, "
+                "inicio = ?, latido = ?, lease_hasta = ?, error = NULL WHERE rowid = ?",
+                (trabajador, equipo, huella, ahora, ahora, ahora + self.duracion_lease, fila['rowid']))
+        trabajo = {k: fila[k] for k in fila.keys() if k != "rowid"}
+        trabajo.update(estado="EN_CURSO", intentos=fila['intentos'] + 1, trabajador=trabajador, equipo=equipo, huella=huella)
+        return trabajo
+
+    def latido(self, id_trabajo, trabajador):
+        """
+        Extiende el lease del trabajo. Retorna False si el trabajador ya no
+        lo tiene (venció y otro lo tomó).
+        """
+        ahora = time.time()
+        with self._bloqueo:
+            return self._con.execute(
+                "UPDATE trabajos SET latido = ?, lease_hasta = ? "
+                "WHERE campaña = ? AND id = ? AND trabajador = ? AND estado = 'EN_CURSO'",
+                (ahora, ahora + self.duracion_lease, self.campaña, id_trabajo, trabajador)).rowcount == 1
+
+    def completar(self, id_trabajo, trabajador, fila):
+        """
+        Marca el trabajo como HECHO y guarda su fila de resultados (con el
+        equipo y la huella del trabajador). Retorna False y descarta la fila
+        si el trabajador ya no tiene el lease.
+        """
+        ahora = time.time()
+        with self._transaccion() as con:
+            trabajo = con.execute(
+                "SELECT intentos, equipo, huella FROM trabajos "
+                "WHERE campaña = ? AND id = ? AND trabajador = ? AND estado = 'EN_CURSO'",
+                (self.campaña, id_trabajo, trabajador)).fetchone()
+            if trabajo is None:
+                return False
+            con.execute("UPDATE trabajos SET estado = 'HECHO', fin = ? WHERE campaña = ? AND id = ?",
+                        (ahora, self.campaña, id_trabajo))
+            con.execute(
+                "INSERT OR REPLACE INTO resultados (campaña, id, intento, trabajador, equipo, huella, fin, fila) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.campaña, id_trabajo, trabajo['intentos'], trabajador, trabajo['equipo'], trabajo['huella'], ahora,
+                 json.dumps(fila, default=lambda v: v.item() if hasattr(v, "item") else str(v))))
+            return True
+
+    def fallar(self, id_trabajo, trabajador, error):
+        """
+        Devuelve el trabajo a PENDIENTE (o lo deja en ERROR tras
+        `max_intentos`) con el error de la ejecución.
+        """
+        with self._transaccion() as con:
+            con.execute(
+                "UPDATE trabajos SET estado = CASE WHEN intentos >= ? THEN 'ERROR' ELSE 'PENDIENTE' END, "
+                "error = ?, trabajador = NULL, fin = ? "
+                "WHERE campaña = ? AND id = ? AND trabajador = ? AND estado = 'EN_CURSO'",
+                (self.max_intentos, str(error), time.time(), self.campaña, id_trabajo, trabajador))
+
+    def pendientes(self, equipo=None, huella=None):
+        """
+        Retorna los trabajos PENDIENTE o EN_CURSO (de cualquier equipo, o los
+        que puede tomar `equipo`/`huella`).
+        """
+        sql = "SELECT COUNT(*) FROM trabajos WHERE campaña = ? AND estado IN ('PENDIENTE', 'EN_CURSO')"
+        parametros = [self.campaña]
+        if equipo or huella:
+            sql += " AND (destino IS NULL OR destino IN (?, ?))"
+            parametros += [equipo, huella]
+        with self._bloqueo:
+            return self._con.execute(sql, parametros).fetchone()[0]
+
+    def resumen(self):
+        """
+        Retorna {estado: trabajos} de la campaña.
+        """
+        with self._bloqueo:
+            conteos = dict(self._con.execute(
+                "SELECT estado, COUNT(*) FROM trabajos WHERE campaña = ? GROUP BY estado", (self.campaña,)).fetchall())
+        return {estado: conteos.get(estado, 0) for estado in ESTADOS_TRABAJO}
+
+    def trabajos(self):
+        """
+        Retorna un DataFrame con los trabajos de la campaña y su estado.
+        """
+        with self._bloqueo:
+            return pd.read_sql_query("SELECT * FROM trabajos WHERE campaña = ? ORDER BY rowid", self._con,
+                                     params=(self.campaña,))
+
+    def leer(self):
+        """
+        Retorna un DataFrame con las filas de resultados de todos los
+        equipos y las columnas COLUMNAS_COLA.
+        """
+        with self._bloqueo:
+            filas = self._con.execute(
+                "SELECT r.*, t.repeticion FROM resultados r JOIN trabajos t ON t.campaña = r.campaña AND t.id = r.id "
+                "WHERE r.campaña = ? ORDER BY r.fin", (self.campaña,)).fetchall()
+        return pd.DataFrame([{
+            **json.loads(f['fila']), 'Campaña': f['campaña'], 'Trabajo': f['id'], 'Repeticion': f['repeticion'],
+            'Intento': f['intento'], 'Trabajador': f['trabajador'],
+        } for f in filas])
+
+    def exportar_csv(self, ruta_csv):
+        """
+        Exporta los resultados al formato de los Results_*.csv (una fila por
+        trabajo y equipo, que cargar_resultados lee con los demás). Sin
+        resultados no se escribe el archivo.
+        """
+        df = self.leer()
+        if len(df):
+            df.to_csv(ruta_csv, index=False)
+        return df
+
+################################################################################
+# Funcion para servir la cola del coordinador a los trabajadores
+def servir_cola(cola, direccion, clave):
+    """
+    Publica `cola` (abierta por el coordinador en su disco local) en
+    `direccion` = (equipo, puerto) para los trabajadores de todos los
+    equipos. Cada conexión se atiende en un hilo; ColaCampaña serializa las
+    operaciones. El servidor corre en un hilo de fondo mientras viva el
+    proceso del coordinador.
+
+    Parámetros:
+    - cola: ColaCampaña del coordinador
+    - direccion: (equipo, puerto) donde escucha; ("", puerto) en todas las
+      interfaces, puerto 0 elige uno libre
+    - clave: bytes que deben usar los trabajadores (conectar_cola)
+
+    Retorna el servidor (`servidor.address` tiene el puerto elegido).
+    """
+    class Gestor(BaseManager):
+        pass
+
+    Gestor.register("cola", callable=lambda: cola, exposed=METODOS_COLA)
+    servidor = Gestor(address=direccion, authkey=clave).get_server()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+################################################################################
+# Funcion para conectarse a la cola del coordinador
+def conectar_cola(direccion, clave):
+    """
+    Retorna la cola que sirve el coordinador en `direccion` (servir_cola),
+    con los métodos de METODOS_COLA. Cada hilo del trabajador (ej. el de
+    Latido) abre su propia conexión.
+    """
+    class Gestor(BaseManager):
+        pass
+
+    Gestor.register("cola", exposed=METODOS_COLA)
+    gestor = Gestor(address=direccion, authkey=clave)
+    gestor.connect()
+    return gestor.cola()
+
+################################################################################
+# Clase para mantener el lease de un trabajo en curso
+class Latido(threading.Thread):
+    """
+    Hilo que renueva el lease de un trabajo cada `intervalo` s mientras se
+    ejecuta. Si la renovación falla porque otro trabajador tomó el trabajo,
+    `perdido` queda en True; los errores de acceso a la cola (ej. el
+    coordinador no responde) se reintentan en el siguiente intervalo.
+    """
+
+    def __init__(self, cola, id_trabajo, trabajador, intervalo=60):
+        super().__init__(daemon=True)
+        self.cola = cola
+        self.id_trabajo = id_trabajo
+        self.trabajador = trabajador
+        self.intervalo = intervalo
+        self.perdido = False
+        self._fin = threading.Event()
+        self.start()
+
+    def run(self):
+        while not self._fin.wait(self.intervalo):
+            try:
+                if not self.cola.latido(self.id_trabajo, self.trabajador):
+                    print(f"Lease perdido: {self.id_trabajo}")
+                    self.perdido = True
+                    return
+            except (sqlite3.Error, OSError, EOFError) as e:
+                print(f"Error en el latido de {self.id_trabajo}: {e}")
+
+    def detener(self):
+        self._fin.set()
+        self.join()
+
+################################################################################
+# Funcion para ejecutar los trabajos de la cola
+def trabajar(cola, funcion, trabajador, equipo, huella, intervalo_latido=60, espera_s=30, max_trabajos=None):
+    """
+    Toma trabajos de `cola` y ejecuta `funcion(trabajo)`, que retorna la
+    fila de resultados (diccionario), hasta que no queden trabajos que este
+    equipo pueda tomar. Mientras otros equipos tienen trabajos en curso se
+    espera `espera_s` s entre intentos, por si sus leases vencen.
+
+    Es un generador: retorna (trabajo, fila, aceptada) al terminar cada
+    trabajo; `aceptada` es False si el lease se perdió (la fila se
+    descarta) o la ejecución falló (fila None, el trabajo vuelve a la cola).
+    """
+    hechos = 0
+    while max_trabajos is None or hechos < max_trabajos:
+        trabajo = cola.arrendar(trabajador, equipo, huella)
+        if trabajo is None:
+            if not cola.pendientes(equipo, huella):
+                return
+            time.sleep(espera_s)
+            continue
+
+        latido = Latido(cola, trabajo['id'], trabajador, intervalo_latido)
+        try:
+            fila = funcion(trabajo)
+        except Exception as e:
+            latido.detener()
+            print(f"Error en el trabajo {trabajo['id']}: {e}")
+            cola.fallar(trabajo['id'], trabajador, repr(e))
+            yield trabajo, None, False
+            continue
+        latido.detener()
+
+        aceptada = cola.completar(trabajo['id'], trabajador, fila)
+        if not aceptada:
+            print(f"El trabajo {trabajo['id']} ya no es de {trabajador}: se descarta su resultado")
+        hechos += 1
+        yield trabajo, fila, aceptada
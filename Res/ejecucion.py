@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import subprocess
+import numpy as np
+
+from monitor_hwinfo import leer_ultima_frecuencia, leer_ultimos
+from muestreador import MuestreadorPsutil, COLUMNAS_MUESTREO
+from planificador import fijar_afinidad
+from progreso import terminar_arbol, formato_duracion, ESTADOS_DETENIDO
+from recursos import EsperaRecursos, COLUMNAS_RECURSOS
+from telemetria import nuevo_id, guardar_telemetria
+from trazas import registrar_span
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas de tiempo clásicas de cada etapa ("<etapa> Time", ...), seguidas de Vel_<etapa>
+COLUMNAS_TIEMPO = ['Time', 'Days', 'Hours', 'Minutes', 'Seconds', 'Total Days', 'Total Hours', 'Total Minutes']
+
+# Columnas de estadísticas del modo de repeticiones (benchmark_exe)
+COLUMNAS_BENCHMARK = [
+    'Mediana s', 'IQR s', 'Min s', 'IC95 inf s', 'IC95 sup s',
+    'Repeticiones', 'Calentamiento', 'Tiempos s', 'Atipicos',
+]
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Clase para el resultado de una ejecucion
+class ResultadoEjecucion(tuple):
+    """
+    Tupla con los 9 valores clásicos de run_exe_monitor (tiempo, días, horas,
+    minutos, segundos, días totales, horas totales, minutos totales y
+    frecuencia promedio) que además lleva en `extra` un diccionario con las
+    métricas adicionales de la ejecución.
+    """
+
+    def __new__(cls, valores, extra=None):
+        obj = super().__new__(cls, valores)
+        obj.extra = extra if extra is not None else {}
+        return obj
+
+################################################################################
+
+# Función para ejecutar un .exe y medir el tiempo
+
+def run_exe_monitor(exe_name, path_model, hwinfo_log_path, freq_col_name, muestreo=None, nucleos=None,
+                    wd_telemetria=None, progreso=None, calidad=None, entorno=None):
+    """
+    Ejecuta un ejecutable y mide el tiempo de ejecución, además del promedio de la frecuencia del procesador.
+
+    Parámetros:
+    - exe_name: nombre del ejecutable (ej. "Toparc.exe")
+    - path_model: ruta al directorio donde se encuentra el ejecutable
+    - hwinfo_log_path: ruta completa al archivo .csv generado por HWiNFO
+    - freq_col_name: nombre exacto de la columna que contiene la frecuencia en MHz
+    - muestreo: intervalo en segundos del muestreador psutil (None para no usarlo)
+    - nucleos: lista de núcleos lógicos a los que se fija el proceso (None, sin fijar)
+    - wd_telemetria: directorio donde se archivan las series de la ejecución (None, no se guardan)
+    - progreso: SeguidorProgreso que reporta el avance y detiene la ejecución si se estanca o
+      supera su tiempo límite (None, sin vigilancia)
+    - calidad: DetectorCalidad; se registran sus columnas de HWiNFO durante la ejecución y se
+      evalúa la calidad de la medición (None, sin evaluar)
+    - entorno: variables de entorno que se agregan a las del proceso actual
+      (ej. {"OMP_NUM_THREADS": "4"}; None, se heredan sin cambios)
+
+    Retorna:
+    - ResultadoEjecucion con tiempos y frecuencia promedio; en `extra`
+      queda la contabilidad de recursos (COLUMNAS_RECURSOS), si se usa el
+      muestreador su resumen (COLUMNAS_MUESTREO), si se archivan las
+      series el id de la ejecución en 'Telemetria' y, con `progreso`, las
+      columnas de COLUMNAS_PROGRESO y, con `calidad`, las de
+      COLUMNAS_CALIDAD. Si el vigilante detiene la ejecución,
+      los 9 valores son "STALLED" o "TIMEOUT"; si falla el monitoreo son
+      "NOT EXECUTABLE" y el árbol de procesos se termina
+    """
+    print("Iniciando monitoreo y ejecución del proceso...")
+    process = espera = muestreador = None
+    try:
+        freq_values = []
+        freq_t = []
+        hw_t = []
+        hw_series = {clave: [] for clave in (calidad.columnas if calidad else {})}
+
+        # Se usa cwd= en lugar de os.chdir para poder ejecutar varios procesos a la vez
+        start_ns = time.perf_counter_ns()
+        env = {**os.environ, **{k: str(v) for k, v in entorno.items()}} if entorno else None
+        process = subprocess.Popen([os.path.join(path_model, exe_name)], cwd=path_model, env=env)
+        espera = EsperaRecursos(process)
+        espera.start()
+        fijar_afinidad(process.pid, nucleos)
+        if progreso:
+            progreso.iniciar()
+
+        if muestreo:
+            muestreador = MuestreadorPsutil(process.pid, intervalo=muestreo)
+            muestreador.start()
+
+        # Se espera bloqueado en el proceso (máx. 1 s) para registrar el fin en cuanto ocurre
+        while True:
+            freq_now = leer_ultima_frecuencia(hwinfo_log_path, freq_col_name)
+            if freq_now:
+                freq_values.append(freq_now)
+                freq_t.append((time.perf_counter_ns() - start_ns) / 1e9)
+                print(f"{time.strftime('%H:%M:%S')} - Frecuencia: {freq_now:.2f} MHz")
+            if hw_series:
+                leidos = leer_ultimos(hwinfo_log_path, list(calidad.columnas.values()))
+                hw_t.append((time.perf_counter_ns() - start_ns) / 1e9)
+                for clave, col in calidad.columnas.items():
+                    hw_series[clave].append(leidos.get(col))
+            espera.actualizar()
+            if espera.esperar(timeout=1):
+                break
+            if progreso:
+                estado = progreso.actualizar()
+                reporte = progreso.reporte()
+                if reporte:
+                    print(f"{time.strftime('%H:%M:%S')} - {exe_name}: {reporte}")
+                if estado in ESTADOS_DETENIDO:
+                    print(f"{exe_name} {estado} tras {formato_duracion(progreso.transcurrido())}: se termina el árbol de procesos")
+                    terminar_arbol(process.pid)
+                    espera.esperar()
+                    break
+
+        end_ns = time.perf_counter_ns()
+        registrar_span(exe_name, start_ns, end_ns, path_model=path_model, nucleos=nucleos)  # Solo el proceso; el resto es del arnes
+
+        extra = muestreador.detener() if muestreador else {}
+        extra.update(espera.recursos())
+        if progreso:
+            progreso.leer()
+            extra.update(progreso.resumen())
+        if calidad:
+            extra.update(calidad.evaluar({'frec_hwinfo': freq_values, **hw_series},
+                                         muestreador.series() if muestreador else None, nucleos))
+
+        if wd_telemetria:
+            fuentes = {'hwinfo_frec': (freq_t, {'frec_hwinfo': freq_values})}
+            if hw_t:
+                fuentes['hwinfo'] = (hw_t, {clave: [np.nan if v is None else v for v in valores] for clave, valores in hw_series.items()})
+            if muestreador:
+                series = muestreador.series()
+                desfase = muestreador.t0 - start_ns / 1e9  # Tiempos del muestreador desde el inicio de la ejecución
+                fuentes['psutil'] = (series.pop('t') + desfase, series)
+            fuentes = {fuente: (t, series) for fuente, (t, series) in fuentes.items() if len(t)}
+            if fuentes:
+                extra['Telemetria'] = nuevo_id(exe_name)
+                guardar_telemetria(wd_telemetria, extra['Telemetria'], fuentes, {
+                    'exe': exe_name, 'path_model': path_model, 'nucleos': nucleos, 'entorno': entorno,
+                    'inicio': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - (end_ns - start_ns) / 1e9)),
+                    'duracion_s': (end_ns - start_ns) / 1e9,
+                })
+
+        exec_time = (end_ns - start_ns) / 1e9 #Calcula el tiempo total de ejecución
+        freq_promedio = (sum(freq_values) / len(freq_values))/1000 if freq_values else float('nan') #Calcula el promedio de velocidad del procesador
+        if not freq_values and extra.get('Frec media GHz') is not None:
+            freq_promedio = extra['Frec media GHz'] # Sin HWiNFO se usa la frecuencia del muestreador
+
+        if progreso and progreso.estado in ESTADOS_DETENIDO:
+            return ResultadoEjecucion([progreso.estado] * 9, extra)
+
+        days = exec_time // 86400
+        hours = (exec_time % 86400) // 3600
+        minutes = (exec_time % 3600) // 60
+        seconds = round(exec_time % 60, 1)
+        total_days = exec_time / 86400
+        total_hours = exec_time / 3600
+        total_minutes = exec_time / 60
+
+        return ResultadoEjecucion((exec_time, days, hours, minutes, seconds, total_days, total_hours, total_minutes, freq_promedio), extra)
+
+    except Exception as e:
+
+        print(f"Error al ejecutar el proceso: {e}")
+        # Retornar un conjunto de valores indicativos
+        return ResultadoEjecucion(["NOT EXECUTABLE"] * 9)
+
+    finally:
+        # Tras un error (o una interrupcion) el proceso no puede quedar vivo con sus nucleos fijados
+        if process is not None and (espera is None or espera.is_alive()):
+            print(f"Terminando {exe_name} (pid {process.pid}) tras un error del monitoreo")
+            terminar_arbol(process.pid)
+            if espera is not None:
+                espera.esperar(timeout=30)
+        if muestreador is not None:
+            muestreador.detener()
+
+################################################################################
+# Funcion para obtener las columnas de muestreo de un resultado
+def valores_muestreo(resultado):
+    """
+    Retorna la lista de valores de COLUMNAS_MUESTREO de un ResultadoEjecucion
+    (None en las columnas que no se midieron).
+    """
+    return [resultado.extra.get(col) for col in COLUMNAS_MUESTREO]
+
+################################################################################
+# Funcion para obtener las columnas de recursos de un resultado
+def valores_recursos(resultado):
+    return [resultado.extra.get(col) for col in COLUMNAS_RECURSOS]
+
+################################################################################
+# Funcion para obtener el id de la telemetria archivada de un resultado
+def valor_telemetria(resultado):
+    return resultado.extra.get('Telemetria')
+
+################################################################################
+# Funcion para calcular estadisticas robustas de tiempos repetidos
+def estadisticas_tiempos(tiempos, n_bootstrap=2000, nivel=0.95, semilla=0):
+    """
+    Calcula mediana, rango intercuartílico, mínimo, intervalo de confianza
+    bootstrap de la mediana y las repeticiones atípicas (z robusto con la
+    desviación absoluta mediana mayor a 3.5). La desviación se acota por
+    abajo al 1% de la mediana para no marcar diferencias de milisegundos.
+    """
+    t = np.asarray(tiempos, dtype=np.float64)
+    mediana = float(np.median(t))
+    q1, q3 = np.percentile(t, [25, 75])
+
+    rng = np.random.default_rng(semilla)
+    medianas = np.median(t[rng.integers(0, t.size, (n_bootstrap, t.size))], axis=1)
+    ic_inf, ic_sup = np.percentile(medianas, [50 * (1 - nivel), 50 * (1 + nivel)])
+
+    mad = max(float(np.median(np.abs(t - mediana))), 0.01 * mediana)
+    atipicos = np.flatnonzero(0.6745 * np.abs(t - mediana) / mad > 3.5) if mad > 0 else np.array([], dtype=int)
+
+    return {
+        'Mediana s': mediana, 'IQR s': float(q3 - q1), 'Min s': float(t.min()),
+        'IC95 inf s': float(ic_inf), 'IC95 sup s': float(ic_sup),
+        'Repeticiones': int(t.size),
+        'Tiempos s': " ".join(f"{x:.3f}" for x in t),
+        'Atipicos': " ".join(str(i + 1) for i in atipicos),
+    }
+
+################################################################################
+# Funcion para ejecutar un .exe varias veces y resumir los tiempos
+def benchmark_exe(exe_name, path_model, hwinfo_log_path, freq_col_name, repeticiones=1, calentamiento=0,
+                  muestreo=None, nucleos=None, wd_telemetria=None, progreso=None, calidad=None, entorno=None):
+    """
+    Ejecuta `calentamiento` corridas que se descartan y luego `repeticiones`
+    corridas medidas con run_exe_monitor (todas vigiladas con `progreso`,
+    si se indica) con las variables `entorno`. Con `calidad`, la calidad del
+    resultado es la peor de las corridas medidas.
+
+    Retorna:
+    - ResultadoEjecucion con los 9 valores de la corrida de tiempo mediano
+      (la frecuencia es el promedio de todas las corridas). En `extra` quedan
+      las estadísticas de COLUMNAS_BENCHMARK y el resumen del muestreador de
+      esa corrida
+    """
+    for k in range(calentamiento):
+        print(f"Calentamiento {k + 1} de {calentamiento}: {exe_name}")
+        res = run_exe_monitor(exe_name, path_model, hwinfo_log_path, freq_col_name, None, nucleos, progreso=progreso, entorno=entorno)
+        if res[0] in ESTADOS_DETENIDO:
+            return res
+
+    corridas = []
+    for k in range(repeticiones):
+        print(f"Repeticion {k + 1} de {repeticiones}: {exe_name}")
+        res = run_exe_monitor(exe_name, path_model, hwinfo_log_path, freq_col_name, muestreo, nucleos, wd_telemetria, progreso, calidad, entorno)
+        if res[0] == "NOT EXECUTABLE" or res[0] in ESTADOS_DETENIDO:
+            return res
+        corridas.append(res)
+
+    tiempos = [res[0] for res in corridas]
+    estadisticas = estadisticas_tiempos(tiempos)
+    estadisticas['Calentamiento'] = calentamiento
+    estadisticas['Telemetria'] = " ".join(res.extra['Telemetria'] for res in corridas if 'Telemetria' in res.extra) or None
+    calidades = [res.extra['Calidad'] for res in corridas if res.extra.get('Calidad') is not None]
+    if calidades:
+        estadisticas['Calidad'] = min(calidades)
+        estadisticas['Contaminada'] = max(res.extra.get('Contaminada') or 0 for res in corridas)
+    if estadisticas['Atipicos']:
+        print(f"Repeticiones atipicas de {exe_name}: {estadisticas['Atipicos']}")
+
+    elegida = corridas[int(np.argsort(tiempos)[(len(tiempos) - 1) // 2])]
+    frecuencias = [res[8] for res in corridas if res[8] == res[8]]
+    valores = list(elegida)
+    valores[8] = float(np.mean(frecuencias)) if frecuencias else float('nan')
+    return ResultadoEjecucion(valores, {**elegida.extra, **estadisticas})
+
+################################################################################
+# Funcion para obtener las columnas del modo de repeticiones de un resultado
+def valores_benchmark(resultado):
+    return [resultado.extra.get(col) for col in COLUMNAS_BENCHMARK]
+
+################################################################################
+# Funcion para obtener todas las columnas de una etapa
+def columnas_etapa(etapa, extras=()):
+    """
+    Retorna las columnas de resultados de una etapa (ej. "Tetis"): tiempos
+    clásicos, Vel_<etapa>, estadísticas de repeticiones, muestreo, recursos,
+    telemetría y las columnas `extras` de `extra` (ej. COLUMNAS_CACHE).
+    """
+    return [
+        *[f"{etapa} {col}" for col in COLUMNAS_TIEMPO], f"Vel_{etapa}",
+        *[f"{etapa} {col}" for col in COLUMNAS_BENCHMARK + COLUMNAS_MUESTREO + COLUMNAS_RECURSOS],
+        f"{etapa} Telemetria",
+        *[f"{etapa} {col}" for col in extras],
+    ]
+
+################################################################################
+# Funcion para obtener la fila de una etapa como diccionario
+def fila_etapa(etapa, resultado, extras=()):
+    """
+    Retorna {columna: valor} con las columnas de columnas_etapa.
+    """
+    valores = [
+        *resultado, *valores_benchmark(resultado), *valores_muestreo(resultado),
+        *valores_recursos(resultado), valor_telemetria(resultado),
+        *[resultado.extra.get(col) for col in extras],
+    ]
+    return dict(zip(columnas_etapa(etapa, extras), valores))
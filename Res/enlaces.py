@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del costo de preparar el directorio de ejecucion
+COLUMNAS_SANDBOX = ['Sandbox s', 'Sandbox enlazados', 'Sandbox copiados', 'Sandbox omitidos']
+
+# Modos de enlace en orden de preferencia: reflink (copia por referencia, se
+# separa al escribir), enlace duro, enlace simbolico y copia real
+MODOS_ENLACE = ("reflink", "hardlink", "symlink", "copia")
+
+FICLONE = 0x40049409  # ioctl de Linux para clonar un archivo (Btrfs, XFS)
+
+_hashes = {}
+_bloqueo = threading.Lock()
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para calcular el sha256 de un archivo
+def sha256_archivo(ruta, bloque=1 << 20):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+################################################################################
+# Funcion para obtener el hash de un archivo reutilizando el ya calculado
+def hash_archivo(ruta):
+    """
+    sha256 del archivo; se recalcula solo si cambió su tamaño o fecha de modificación.
+    """
+    ruta = os.path.abspath(ruta)
+    st = os.stat(ruta)
+    with _bloqueo:
+        previo = _hashes.get(ruta)
+    if previo and previo[:2] == (st.st_size, st.st_mtime_ns):
+        return previo[2]
+    sha = sha256_archivo(ruta)
+    with _bloqueo:
+        _hashes[ruta] = (st.st_size, st.st_mtime_ns, sha)
+    return sha
+
+################################################################################
+# Funcion para clonar un archivo con reflink
+def _reflink(src, dst):
+    import fcntl  # Solo existe en Linux/macOS
+    with open(src, "rb") as fs, open(dst, "wb") as fd:
+        fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+    shutil.copystat(src, dst)
+
+################################################################################
+# Funcion para enlazar un archivo con el primer modo posible
+def enlazar_archivo(src, dst, modos=MODOS_ENLACE):
+    """
+    Crea `dst` a partir de `src` probando los modos en orden y retorna el
+    modo usado. Los enlaces duros y simbólicos comparten los datos con el
+    original: solo deben usarse para archivos que la ejecución no modifica.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    for modo in modos:
+        try:
+            if modo == "reflink":
+                _reflink(src, dst)
+            elif modo == "hardlink":
+                os.link(src, dst)
+            elif modo == "symlink":
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                shutil.copy2(src, dst)
+            return modo
+        except (OSError, ImportError):
+            if os.path.lexists(dst):
+                os.remove(dst)
+    raise OSError(f"No se pudo crear {dst} desde {src}")
+
+################################################################################
+# Funcion para instalar un archivo solo si su contenido es distinto
+def instalar_archivo(src, dst, modos=MODOS_ENLACE):
+    """
+    Deja en `dst` el contenido de `src`. Si ya es el mismo archivo o tiene
+    el mismo hash no hace nada y retorna "igual"; si no, retorna el modo de
+    enlazar_archivo.
+    """
+    if os.path.isfile(dst):
+        if os.path.samefile(src, dst) or hash_archivo(src) == hash_archivo(dst):
+            return "igual"
+    return enlazar_archivo(src, dst, modos)
+
+################################################################################
+# Funcion para instalar los ejecutables de TETIS en un directorio
+def instalar_binarios(wd_bin, ejecutables, wd_destino):
+    """
+    Instala los ejecutables (ej. "Tetis.exe") de `wd_bin` en `wd_destino`,
+    omitiendo los que ya coinciden por hash. Retorna {ejecutable: modo}.
+    """
+    return {exe: instalar_archivo(os.path.join(wd_bin, exe), os.path.join(wd_destino, exe), ("reflink", "hardlink", "copia"))
+            for exe in ejecutables}
+
+################################################################################
+# Funcion para resumir los modos usados al preparar un directorio
+def resumen_sandbox(modos, segundos):
+    """
+    Retorna el diccionario de COLUMNAS_SANDBOX a partir de {archivo: modo}.
+    """
+    valores = list(modos.values())
+    return {
+        'Sandbox s': segundos,
+        'Sandbox enlazados': sum(m in ("reflink", "hardlink", "symlink") for m in valores),
+        'Sandbox copiados': valores.count("copia"),
+        'Sandbox omitidos': valores.count("igual"),
+    }
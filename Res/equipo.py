@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import re
+import csv
+import json
+import math
+import glob
+import hashlib
+import platform
+import psutil
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Etiquetas del informe de HWiNFO (español e inglés) para cada campo del perfil
+ETIQUETAS_HWINFO = {
+    'nombre': ["Nombre del computadora", "Computer Name"],
+    'procesador': ["Nombre del procesador", "Processor Name"],
+    'marca_cpu': ["Nombre de la marca de la CPU", "CPU Brand Name"],
+    'nucleos': ["Número de núcleos de procesador", "Number of Processor Cores"],
+    'procesadores_logicos': ["Número de procesadores lógicos", "Number of Logical Processors"],
+    'tipos_nucleos': ["Número de núcleos de CPU", "Number of CPU Cores"],
+    'ram': ["Tamaño de memoria total", "Total Memory Size"],
+    'frec_base': ["Original Processor Frequency [MHz]"],
+    'frec_turbo': ["CPU Turbo Max"],
+    'cache_l1': ["Caché L1 (P-cores)", "Caché L1 (E-cores)", "Caché L1", "L1 Cache (P-cores)", "L1 Cache (E-cores)", "L1 Cache"],
+    'cache_l2': ["Caché L2 (P-cores)", "Caché L2 (E-cores)", "Caché L2", "L2 Cache (P-cores)", "L2 Cache (E-cores)", "L2 Cache"],
+    'cache_l3': ["Caché L3", "L3 Cache"],
+    'sistema_operativo': ["Sistema operativo", "Operating System"],
+}
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para extraer el primer numero de un texto
+def _numero(texto):
+    if texto is None:
+        return None
+    m = re.search(r"\d+(?:[.,]\d+)?", str(texto))
+    return float(m.group().replace(",", ".")) if m else None
+
+################################################################################
+# Funcion para convertir la descripcion de una cache a KB
+def _cache_kb(texto):
+    """
+    Convierte textos como "Instruction: 8 x 32 KBytes, Data: 8 x 48 KBytes"
+    o "25 MBytes" al total en KB.
+    """
+    total = 0.0
+    for n, valor, unidad in re.findall(r"(?:(\d+)\s*x\s*)?(\d+(?:\.\d+)?)\s*([KM])Bytes", texto or ""):
+        total += int(n or 1) * float(valor) * (1024 if unidad == "M" else 1)
+    return total or None
+
+################################################################################
+# Funcion para redondear la memoria RAM a GB instalados
+def _ram_gb(bytes_total):
+    # El sistema reserva parte de la RAM: se redondea al par de GB superior
+    return float(2 * math.ceil(bytes_total / 1024 ** 3 / 2))
+
+################################################################################
+# Funcion para leer el informe de HWiNFO
+def leer_informe_hwinfo(equipo_file):
+    """
+    Lee el informe de HWiNFO (equipo.csv) en una sola pasada y retorna un
+    diccionario tipado con el perfil del equipo.
+
+    Solo se guarda la primera aparición no vacía de cada etiqueta, como hacía
+    info_pc.
+    """
+    buscadas = {etiqueta for etiquetas in ETIQUETAS_HWINFO.values() for etiqueta in etiquetas}
+    valores = {}
+    with open(equipo_file, encoding="utf-8", errors="ignore") as f:
+        for fila in csv.reader(f):
+            if len(fila) < 2 or not fila[1].strip():
+                continue
+            etiqueta = fila[0].lstrip("\ufeff").strip().rstrip(":").strip()
+            if etiqueta in buscadas and etiqueta not in valores:
+                valores[etiqueta] = fila[1].strip()
+
+    def campo(nombre):
+        for etiqueta in ETIQUETAS_HWINFO[nombre]:
+            if etiqueta in valores:
+                return valores[etiqueta]
+        return None
+
+    def cache(nombre):
+        # En CPUs híbridas se suman las cachés de P-cores y E-cores
+        etiquetas = [e for e in ETIQUETAS_HWINFO[nombre] if e in valores]
+        hibridas = [e for e in etiquetas if "cores)" in e]
+        kb = [_cache_kb(valores[e]) for e in (hibridas or etiquetas[:1])]
+        kb = [k for k in kb if k]
+        return sum(kb) if kb else None
+
+    tipos = campo('tipos_nucleos') or ""
+    nucleos_p = _numero(re.search(r"\d+\s*x\s*Performance", tipos).group()) if "Performance" in tipos else None
+    nucleos_e = _numero(re.search(r"\d+\s*x\s*Efficient", tipos).group()) if "Efficient" in tipos else None
+    ram = campo('ram')
+    ram_gb = _numero(ram)
+    if ram_gb is not None and "MB" in ram:
+        ram_gb = ram_gb / 1024
+
+    return {
+        'nombre': campo('nombre'),
+        'procesador': campo('procesador'),
+        'marca_cpu': campo('marca_cpu') or campo('procesador'),
+        'nucleos': int(_numero(campo('nucleos')) or 0) or None,
+        'procesadores_logicos': int(_numero(campo('procesadores_logicos')) or 0) or None,
+        'nucleos_p': int(nucleos_p) if nucleos_p else None,
+        'nucleos_e': int(nucleos_e) if nucleos_e else None,
+        'ram_gb': ram_gb,
+        'cache_l1_kb': cache('cache_l1'),
+        'cache_l2_kb': cache('cache_l2'),
+        'cache_l3_kb': cache('cache_l3'),
+        'frec_base_mhz': _numero(campo('frec_base')),
+        'frec_turbo_mhz': _numero(campo('frec_turbo')),
+        'sistema_operativo': campo('sistema_operativo'),
+        'fuente': "HWiNFO",
+    }
+
+################################################################################
+# Funcion para leer un archivo de texto de /sys o /proc
+def _leer(ruta):
+    try:
+        with open(ruta) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+################################################################################
+# Funcion para sumar las caches unicas de Linux por nivel
+def _caches_linux():
+    """
+    Suma el tamaño de cada caché física una sola vez (las compartidas entre
+    núcleos aparecen en varios cpuN con el mismo shared_cpu_list).
+    """
+    vistas = set()
+    total = {1: 0.0, 2: 0.0, 3: 0.0}
+    for indice in glob.glob("/sys/devices/system/cpu/cpu[0-9]*/cache/index[0-9]*"):
+        nivel = _leer(os.path.join(indice, "level"))
+        tamaño = _leer(os.path.join(indice, "size"))
+        tipo = _leer(os.path.join(indice, "type"))
+        compartida = _leer(os.path.join(indice, "shared_cpu_list"))
+        if not nivel or not tamaño or int(nivel) not in total:
+            continue
+        clave = (nivel, tipo, compartida)
+        if clave in vistas:
+            continue
+        vistas.add(clave)
+        kb = _numero(tamaño) * (1024 if tamaño.endswith("M") else 1)
+        total[int(nivel)] += kb
+    return {n: (kb or None) for n, kb in total.items()}
+
+################################################################################
+# Funcion para detectar el perfil del equipo sin HWiNFO
+def detectar_equipo():
+    """
+    Obtiene el mismo perfil que leer_informe_hwinfo usando psutil y platform
+    (y /proc, /sys en Linux), para equipos donde no existe HWiNFO.
+    """
+    marca = None
+    if platform.system() == "Linux":
+        cpuinfo = _leer("/proc/cpuinfo") or ""
+        m = re.search(r"^model name\s*:\s*(.+)$", cpuinfo, re.MULTILINE)
+        marca = m.group(1).strip() if m else None
+    marca = marca or platform.processor() or None
+
+    caches = _caches_linux() if platform.system() == "Linux" else {1: None, 2: None, 3: None}
+    base = _leer("/sys/devices/system/cpu/cpu0/cpufreq/base_frequency")
+    maxima = _leer("/sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq")
+    try:
+        frec = psutil.cpu_freq()
+    except Exception:
+        frec = None
+
+    return {
+        'nombre': platform.node(),
+        'procesador': marca,
+        'marca_cpu': marca,
+        'nucleos': psutil.cpu_count(logical=False),
+        'procesadores_logicos': psutil.cpu_count(logical=True),
+        'nucleos_p': None,
+        'nucleos_e': None,
+        'ram_gb': _ram_gb(psutil.virtual_memory().total),
+        'cache_l1_kb': caches[1],
+        'cache_l2_kb': caches[2],
+        'cache_l3_kb': caches[3],
+        'frec_base_mhz': int(base) / 1000 if base else (frec.max if frec and frec.max else None),
+        'frec_turbo_mhz': int(maxima) / 1000 if maxima else None,
+        'sistema_operativo': platform.platform(),
+        'fuente': "psutil",
+    }
+
+################################################################################
+# Funcion para obtener el perfil del equipo
+def perfil_equipo(equipo_file=None):
+    """
+    Retorna el perfil del equipo desde el informe de HWiNFO si existe, o
+    detectado con psutil/platform si no.
+    """
+    if equipo_file and os.path.isfile(equipo_file):
+        return leer_informe_hwinfo(equipo_file)
+    return detectar_equipo()
+
+################################################################################
+# Funcion para separar los procesadores logicos en P-cores y E-cores
+def nucleos_por_tipo(perfil):
+    """
+    Retorna (lista P, lista E) de procesadores lógicos en CPUs híbridas, o
+    None si el perfil no los distingue. Windows y Linux numeran primero los
+    hilos de los P-cores (dos por núcleo con Hyper-Threading) y luego los
+    E-cores.
+    """
+    p, e, logicos = perfil.get('nucleos_p'), perfil.get('nucleos_e'), perfil.get('procesadores_logicos')
+    if not p or not e or not logicos:
+        return None
+    hilos_p = logicos - e
+    if hilos_p not in (p, 2 * p):
+        return None
+    return list(range(hilos_p)), list(range(hilos_p, logicos))
+
+################################################################################
+# Funcion para normalizar el nombre del procesador
+def _normalizar_cpu(nombre):
+    nombre = (nombre or "").lower()
+    nombre = re.sub(r"\((r|tm)\)|\bcpu\b|\bprocessor\b|@.*$|\b\d+(st|nd|rd|th) gen\b", " ", nombre)
+    return " ".join(nombre.split())
+
+################################################################################
+# Funcion para calcular la huella del equipo
+def huella_equipo(perfil):
+    """
+    Calcula un hash corto del hardware (CPU, núcleos, procesadores lógicos y
+    RAM). Es el mismo para el informe de HWiNFO y la detección con psutil del
+    mismo equipo, y no depende del nombre asignado al ordenador.
+    """
+    datos = [
+        _normalizar_cpu(perfil.get('marca_cpu') or perfil.get('procesador')),
+        perfil.get('nucleos'),
+        perfil.get('procesadores_logicos'),
+        _ram_gb(perfil['ram_gb'] * 1024 ** 3) if perfil.get('ram_gb') else None,
+    ]
+    return hashlib.sha1(json.dumps(datos).encode("utf-8")).hexdigest()[:12]
+
+################################################################################
+# Funcion para guardar el perfil del equipo junto a los resultados
+def guardar_perfil(perfil, wd_out):
+    """
+    Guarda el perfil en {wd_out}Equipo_<huella>.json y retorna la huella.
+    """
+    huella = huella_equipo(perfil)
+    with open(os.path.join(wd_out, f"Equipo_{huella}.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(perfil, huella=huella), f, ensure_ascii=False, indent=1)
+    return huella
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import numbers
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from equipo import nucleos_por_tipo
+from planificador import nucleos_disponibles
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del barrido de nucleos (escalamiento fuerte) de una ejecucion
+COLUMNAS_ESCALADO = ['Ubicacion', 'Hilos', 'Hilos base', 'Speedup', 'Eficiencia %', 'Karp-Flatt']
+
+# Variables de entorno con el numero de hilos que respetan OpenMP, MKL y OpenBLAS
+VARIABLES_HILOS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para ordenar los hilos de un grupo de nucleos fisicos
+def _orden_fisico(hilos, ht):
+    """
+    Con Hyper-Threading (dos hilos consecutivos por núcleo) retorna primero
+    un hilo de cada núcleo físico y luego los hermanos, para que n núcleos
+    lógicos ocupen n núcleos físicos mientras haya.
+    """
+    return hilos[::2] + hilos[1::2] if ht else list(hilos)
+
+################################################################################
+# Funcion para obtener las ubicaciones de nucleos del barrido
+def ubicaciones_nucleos(perfil):
+    """
+    Retorna {ubicación: núcleos lógicos en orden de uso}: "Todos" (P-cores y
+    luego E-cores) y, en CPUs híbridas, "P" (solo P-cores) y "E" (solo
+    E-cores). Se omiten los núcleos en los que el proceso actual no puede
+    ejecutarse. Retorna {} si el sistema no soporta afinidad.
+    """
+    disponibles = nucleos_disponibles()
+    if disponibles is None:
+        return {}
+    logicos = perfil.get('procesadores_logicos') or len(disponibles)
+    tipos = nucleos_por_tipo(perfil)
+    if tipos:
+        p, e = tipos
+        ubicaciones = {'P': _orden_fisico(p, len(p) == 2 * perfil['nucleos_p']), 'E': list(e)}
+        ubicaciones = {'Todos': ubicaciones['P'] + ubicaciones['E'], **ubicaciones}
+    else:
+        ubicaciones = {'Todos': _orden_fisico(list(range(logicos)), logicos == 2 * (perfil.get('nucleos') or 0))}
+    return {nombre: [n for n in orden if n in disponibles] for nombre, orden in ubicaciones.items()}
+
+################################################################################
+# Funcion para crear el plan del barrido de nucleos
+def plan_barrido(conteos, ubicaciones, nombres=None):
+    """
+    Retorna la lista de (ubicación, hilos, núcleos) a ejecutar, con los
+    conteos de menor a mayor en cada ubicación (el primero es la base del
+    speedup). Los conteos mayores que los núcleos de la ubicación se omiten.
+    """
+    plan = []
+    for nombre in (nombres or ubicaciones):
+        orden = ubicaciones.get(nombre)
+        if not orden:
+            print(f"Ubicacion {nombre} no disponible en este equipo")
+            continue
+        for n in sorted(set(conteos)):
+            if n > len(orden):
+                print(f"Se omite {n} hilos en {nombre}: solo hay {len(orden)} núcleos")
+                continue
+            plan.append((nombre, n, orden[:n]))
+    return plan
+
+################################################################################
+# Funcion para fijar el numero de hilos en las variables de entorno
+def entorno_hilos(n, variables=VARIABLES_HILOS):
+    return {variable: str(n) for variable in variables}
+
+################################################################################
+# Funcion para calcular el speedup, la eficiencia y la fraccion serial
+def metricas_escalado(tiempos):
+    """
+    Calcula las métricas de escalamiento fuerte de una ubicación.
+
+    Parámetros:
+    - tiempos: {hilos: tiempo en s}; se ignoran los tiempos no numéricos
+      (ej. "NOT EXECUTABLE", "TIMEOUT")
+
+    Retorna:
+    - {hilos: {'Hilos base', 'Speedup', 'Eficiencia %', 'Karp-Flatt'}}. La
+      base es el menor número de hilos medido (n0) y p = n / n0 el aumento
+      de procesadores: Speedup = T(n0) / T(n), Eficiencia = Speedup / p y
+      la fracción serial de Karp-Flatt e = (1/Speedup - 1/p) / (1 - 1/p).
+      Con n0 = 1 son las definiciones clásicas
+    """
+    validos = {int(n): float(t) for n, t in tiempos.items() if isinstance(t, numbers.Real) and t > 0}
+    if not validos:
+        return {}
+    base = min(validos)
+    metricas = {}
+    for n, t in sorted(validos.items()):
+        p = n / base
+        speedup = validos[base] / t
+        metricas[n] = {
+            'Hilos base': base,
+            'Speedup': speedup,
+            'Eficiencia %': 100 * speedup / p,
+            'Karp-Flatt': (1 / speedup - 1 / p) / (1 - 1 / p) if p > 1 else None,
+        }
+    return metricas
+
+################################################################################
+# Funcion para graficar las curvas de escalamiento fuerte
+def graficar_escalado(datos, por=('Modelo', 'Entrada', 'Ubicacion'), ruta_png=None):
+    """
+    Grafica el speedup y la eficiencia frente a los hilos de cada grupo de
+    `datos` (filas del almacén del barrido), con el speedup ideal.
+    """
+    fig, (ax_s, ax_e) = plt.subplots(1, 2, figsize=(12, 5))
+    datos = datos.assign(**{col: pd.to_numeric(datos[col], errors="coerce") for col in ('Hilos', 'Hilos base', 'Speedup', 'Eficiencia %')})
+    datos = datos.dropna(subset=['Hilos', 'Speedup'])
+    maximo = 1.0
+    for nombre, grupo in datos.groupby(list(por)):
+        grupo = grupo.sort_values('Hilos')
+        p = grupo['Hilos'] / grupo['Hilos base']
+        etiqueta = " ".join(str(v) for v in (nombre if isinstance(nombre, tuple) else (nombre,)))
+        ax_s.plot(p, grupo['Speedup'], marker="o", label=etiqueta)
+        ax_e.plot(p, grupo['Eficiencia %'], marker="o", label=etiqueta)
+        maximo = max(maximo, float(p.max()))
+    ax_s.plot([1, maximo], [1, maximo], "k--", lw=1, label="Ideal")
+    ax_s.set_xlabel("Hilos / hilos base")
+    ax_s.set_ylabel("Speedup")
+    ax_e.axhline(100, color="k", ls="--", lw=1)
+    ax_e.set_xlabel("Hilos / hilos base")
+    ax_e.set_ylabel("Eficiencia paralela (%)")
+    for ax in (ax_s, ax_e):
+        ax.grid(True, alpha=0.3)
+    ax_s.legend(fontsize=8)
+    if ruta_png:
+        fig.savefig(ruta_png, dpi=150, bbox_inches="tight")
+    return fig
+
+################################################################################
+# Funcion para obtener las columnas de escalado de un resultado
+def valores_escalado(ubicacion, hilos, metricas):
+    """
+    Retorna la lista de valores de COLUMNAS_ESCALADO de una ejecución
+    (`metricas` es la entrada de metricas_escalado para sus hilos, o None).
+    """
+    metricas = metricas or {}
+    return [ubicacion, hilos, *[metricas.get(col) for col in COLUMNAS_ESCALADO[2:]]]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import threading
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+LINEA_RUTA = 0  # Línea 1 del FileSSP: ruta del directorio de ejecución
+LINEA_FE = 5  # Línea 6 del FileSSP: fichero de evento (Fe/<nombre>.txt)
+ARCHIVOS_FILESSP = ("FileSSP.txt", "FileSSP.tet")  # Los ejecutables leen uno u otro: se escriben los dos en cada ejecucion
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para escribir un archivo de texto de forma atomica
+def escribir_atomico(ruta, texto):
+    """
+    Escribe `texto` en un archivo temporal del mismo directorio y lo renombra
+    sobre `ruta`, de modo que nunca queda un archivo a medio escribir (ni se
+    modifica un archivo enlazado al original).
+    """
+    tmp = f"{ruta}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(texto)
+    os.replace(tmp, ruta)
+
+################################################################################
+# Clase para la plantilla FileSSP de un modelo
+class PlantillaFileSSP:
+    """
+    FileSSP.tet de un modelo leído una sola vez. Las variantes de cada
+    ejecución (ruta y fichero de evento) se generan en memoria con
+    `renderizar`, a partir de las líneas leídas; que cada ejecución reescriba
+    después el FileSSP.tet en disco no cambia las siguientes.
+
+    Parámetros:
+    - ruta: archivo FileSSP.tet del modelo
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "r") as f:
+            self.lineas = f.read().splitlines()
+        if len(self.lineas) <= LINEA_FE:
+            raise ValueError(f"FileSSP incompleto ({len(self.lineas)} líneas): {ruta}")
+
+    @property
+    def fe(self):
+        return self.lineas[LINEA_FE]
+
+    def renderizar(self, wd_run, fe=None):
+        """
+        Retorna el texto del FileSSP para ejecutar en `wd_run` (con "/" final)
+        y, si se indica, con el fichero de evento `fe` (ej. "Fe/Fe_1.txt").
+        """
+        lineas = list(self.lineas)
+        lineas[LINEA_RUTA] = wd_run
+        if fe is not None:
+            lineas[LINEA_FE] = fe
+        return "\n".join(lineas) + "\n"
+
+################################################################################
+# Funcion para escribir el FileSSP de una ejecucion
+def escribir_filessp(wd_run, texto, nombres=ARCHIVOS_FILESSP):
+    """
+    Escribe el FileSSP ya renderizado en el directorio de ejecución (una
+    escritura atómica por archivo): FileSSP.txt y FileSSP.tet, como los
+    reescribía el código original en cada ejecución.
+    """
+    for nombre in nombres:
+        escribir_atomico(os.path.join(wd_run, nombre), texto)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import re
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.warp import reproject
+from rasterio.windows import Window, from_bounds, bounds as limites_ventana, transform as transformada_ventana
+
+from enlaces import instalar_archivo
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Escalas del nombre de la carpeta y su resolucion en metros (inverso de replace_scale)
+ESCALAS = {"30m": 30, "200m": 200, "500m": 500, "1k": 1000, "2p5": 2500, "5k": 5000}
+
+# Remuestreo por variable: (patron del nombre del raster, metodo, escalar por area). Con
+# escalar por area el valor se multiplica por (resolucion base / nueva)^2 (ej. celdas
+# acumuladas). Los rasters sin regla usan la moda si son enteros y la media si no
+REGLAS_RESAMPLEO = [
+    (r"dir|fdr|flow", "mode", False),  # Direcciones de flujo (codigos)
+    (r"acu|acc|fac", "max", True),  # Celdas acumuladas: maximo del bloque, en celdas de la nueva resolucion
+    (r"uso|cob|land|soil|suelo|clase|mask|masc", "mode", False),  # Variables categoricas
+    (r"mdt|mde|dem|elev|cota|pend|slope", "average", False),  # Cotas y pendientes
+]
+
+EXTENSIONES_RASTER = (".asc", ".tif", ".tiff", ".img")
+
+# Archivos del modelo base que dependen de la resolucion y se regeneran (Toparc, Hantec, Tetis)
+EXCLUIR = ("Topolco.sds", "Hantec.sds", "Fichero_resultados.res", "FileSSP.txt")
+
+_CRS_LOCAL = CRS.from_epsg(3857)  # Para rasters sin CRS (.asc sin .prj): el mismo en origen y destino
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para obtener el nombre de la carpeta de un modelo derivado
+def carpeta_modelo(prefijo, cuenca, escala, escenario):
+    """
+    Retorna "<prefijo>_<cuenca>_<escala>_<escenario>", el nombre que
+    decodifica datos_modelo (ej. "Mod_Jucar_1k_Esc1").
+    """
+    if escala not in ESCALAS:
+        raise ValueError(f"Escala desconocida {escala}; escalas: {', '.join(ESCALAS)}")
+    return f"{prefijo}_{cuenca}_{escala}_{escenario}"
+
+################################################################################
+# Funcion para elegir el remuestreo de un raster
+def resampleo_variable(nombre, dtype, reglas=REGLAS_RESAMPLEO):
+    """
+    Retorna (Resampling, escalar por área) para el raster `nombre` según la
+    primera regla cuyo patrón aparece en el nombre (sin distinguir
+    mayúsculas).
+    """
+    base = os.path.splitext(os.path.basename(nombre))[0].lower()
+    for patron, metodo, escalar in reglas:
+        if re.search(patron, base):
+            return Resampling[metodo], escalar
+    return (Resampling.mode if np.issubdtype(np.dtype(dtype), np.integer) else Resampling.average), False
+
+################################################################################
+# Funcion para calcular la malla de destino
+def malla_destino(src, resolucion):
+    """
+    Retorna (transform, ancho, alto) de la malla de `resolucion` m con la
+    misma esquina superior izquierda que `src` y que cubre toda su extensión.
+    """
+    izq, abajo, der, arriba = src.bounds
+    ancho = max(1, math.ceil(round((der - izq) / resolucion, 6)))
+    alto = max(1, math.ceil(round((arriba - abajo) / resolucion, 6)))
+    return from_origin(izq, arriba, resolucion, resolucion), ancho, alto
+
+################################################################################
+# Funcion para obtener la ventana de origen que cubre una ventana de destino
+def _ventana_origen(src, limites, pad=1):
+    v = from_bounds(*limites, transform=src.transform)
+    col0 = max(0, math.floor(v.col_off) - pad)
+    fila0 = max(0, math.floor(v.row_off) - pad)
+    col1 = min(src.width, math.ceil(v.col_off + v.width) + pad)
+    fila1 = min(src.height, math.ceil(v.row_off + v.height) + pad)
+    if col1 <= col0 or fila1 <= fila0:
+        return None
+    return Window(col0, fila0, col1 - col0, fila1 - fila0)
+
+################################################################################
+# Funcion para remuestrear un raster por bloques en paralelo
+def remuestrear_raster(ruta_src, ruta_dst, resolucion, reglas=REGLAS_RESAMPLEO, n_hilos=None, filas_bloque=256):
+    """
+    Remuestrea `ruta_src` a `resolucion` m sin cargarlo completo en memoria.
+
+    La malla de destino se divide en bloques que cubren unas `filas_bloque`
+    filas del raster de origen (al menos una fila de destino; de 30 m a 5 km
+    una fila de destino ya son ~167 filas de origen). Cada hilo lee con su
+    propio dataset solo la ventana de origen que cubre su bloque y la remuestrea con rasterio.warp.reproject (GDAL libera el GIL);
+    el hilo principal escribe cada bloque al terminar, con a lo sumo
+    2 x `n_hilos` bloques en memoria. El resultado se escribe primero como
+    GeoTIFF por ventanas y, si el original es de otro formato (ej. .asc de
+    TETIS), se convierte al final con el mismo driver.
+
+    Retorna:
+    - diccionario con el método, tamaño de origen y destino y segundos
+    """
+    n_hilos = n_hilos or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    with rasterio.open(ruta_src) as src:
+        perfil = src.profile.copy()
+        dtype, nodata, driver = src.dtypes[0], src.nodata, src.driver
+        crs = src.crs or _CRS_LOCAL
+        metodo, escalar = resampleo_variable(ruta_src, dtype, reglas)
+        factor = (abs(src.res[0]) / resolucion) ** 2 if escalar else 1.0
+        transform, ancho, alto = malla_destino(src, resolucion)
+        tamaño_src = (src.height, src.width)
+        filas_destino = max(1, int(filas_bloque * abs(src.res[1]) / resolucion))  # Filas de destino por bloque
+
+    perfil.update(driver="GTiff", width=ancho, height=alto, transform=transform, count=1, tiled=True,
+                  blockxsize=256, blockysize=256, compress="deflate", BIGTIFF="IF_SAFER")
+    if nodata is None:
+        nodata = -9999 if np.issubdtype(np.dtype(dtype), np.signedinteger) or np.issubdtype(np.dtype(dtype), np.floating) else 0
+        perfil['nodata'] = nodata
+
+    locales = threading.local()
+    abiertos = []
+    bloqueo = threading.Lock()
+
+    def bloque(ventana):
+        if not hasattr(locales, "src"):
+            locales.src = rasterio.open(ruta_src)  # Un dataset por hilo (no son seguros entre hilos)
+            with bloqueo:
+                abiertos.append(locales.src)
+        src = locales.src
+        salida = np.full((int(ventana.height), int(ventana.width)), nodata, dtype=dtype)
+        v_src = _ventana_origen(src, limites_ventana(ventana, transform))
+        if v_src is None:
+            return ventana, salida
+        datos = src.read(1, window=v_src)
+        reproject(datos, salida, src_transform=src.window_transform(v_src), src_crs=crs, src_nodata=nodata,
+                  dst_transform=transformada_ventana(ventana, transform), dst_crs=crs, dst_nodata=nodata,
+                  resampling=metodo, num_threads=1)
+        if factor != 1.0:
+            validos = salida != nodata
+            escalado = salida[validos] * factor
+            if np.issubdtype(salida.dtype, np.integer):
+                escalado = np.rint(escalado)
+            salida[validos] = np.maximum(escalado, 1)  # Una celda válida drena al menos su propia área (cabeceras)
+        return ventana, salida
+
+    tmp = f"{ruta_dst}.{threading.get_ident()}.tif"
+    ventanas = [Window(0, fila, ancho, min(filas_destino, alto - fila)) for fila in range(0, alto, filas_destino)]
+    try:
+        with rasterio.open(tmp, "w", **perfil) as dst, ThreadPoolExecutor(max_workers=n_hilos) as ex:
+            pendientes = set()
+            for ventana in ventanas:
+                if len(pendientes) >= 2 * n_hilos:  # Bloques en memoria acotados
+                    hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        dst.write(futuro.result()[1], 1, window=futuro.result()[0])
+                pendientes.add(ex.submit(bloque, ventana))
+            for futuro in pendientes:
+                dst.write(futuro.result()[1], 1, window=futuro.result()[0])
+
+        if driver == "GTiff":
+            os.replace(tmp, ruta_dst)
+        else:
+            rasterio.shutil.copy(tmp, ruta_dst, driver=driver)  # CreateCopy lee el GeoTIFF por bloques
+            rasterio.shutil.delete(tmp)
+    finally:
+        for ds in abiertos:
+            ds.close()
+        if os.path.exists(tmp):  # Un bloque o la conversión fallaron: no se deja el GeoTIFF a medias
+            os.remove(tmp)
+    return {
+        'raster': os.path.basename(ruta_src), 'metodo': metodo.name, 'escalar': escalar,
+        'origen': tamaño_src, 'destino': (alto, ancho), 'segundos': time.perf_counter() - t0,
+    }
+
+################################################################################
+# Funcion para generar un modelo derivado a otra resolucion
+def generar_modelo(wd_base, wd_destino, resolucion, reglas=REGLAS_RESAMPLEO, n_hilos=None, excluir=EXCLUIR):
+    """
+    Crea el modelo `wd_destino` a partir del modelo base: cada raster del
+    primer nivel se remuestrea a `resolucion` m (se omite si ya existe y es
+    más reciente que el del modelo base) y el resto de archivos, incluidos
+    los Fe, se copian sin cambios (reflink si es posible, se omiten si ya
+    coinciden por hash). Los archivos de `excluir` dependen de la
+    resolución y se regeneran al ejecutar Toparc, Hantec y Tetis.
+
+    Retorna:
+    - lista de diccionarios de remuestrear_raster de los rasters generados
+    """
+    os.makedirs(wd_destino, exist_ok=True)
+    generados = []
+    for raiz, _, nombres in os.walk(wd_base):
+        relativo = os.path.relpath(raiz, wd_base)
+        for nombre in sorted(nombres):
+            if nombre in excluir or nombre.lower().endswith(".exe"):
+                continue
+            if relativo == "." and nombre.lower().endswith((".prj", ".aux.xml")):
+                continue  # GDAL los escribe junto a cada raster remuestreado
+            src = os.path.join(raiz, nombre)
+            dst = os.path.normpath(os.path.join(wd_destino, relativo, nombre))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if relativo == "." and nombre.lower().endswith(EXTENSIONES_RASTER):
+                if os.path.isfile(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+                    continue
+                generados.append(remuestrear_raster(src, dst, resolucion, reglas, n_hilos))
+            else:
+                instalar_archivo(src, dst, ("reflink", "copia"))
+    return generados
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import re
+import mmap
+import numbers
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del contenido del .res y del rendimiento normalizado de Tetis
+COLUMNAS_RES = [
+    'Res pasos', 'Res puntos', 'Res variables', 'Res series',
+    'Celdas-paso por s', 'Celdas-paso por GHz-s', 'Res bytes por s',
+]
+
+_FILA_DATOS = re.compile(rb"\n[ \t]*[0-9]")  # Inicio de una fila de datos (primer caracter numerico)
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para saber si un texto es un numero
+def _es_numero(texto):
+    try:
+        float(texto.replace(b",", b"."))
+        return True
+    except ValueError:
+        return False
+
+################################################################################
+# Funcion para analizar la cabecera del .res
+def _cabecera(mm, max_bytes=1 << 20):
+    """
+    Lee las líneas anteriores a la primera fila de datos. Retorna (puntos,
+    variables, series, inicio de la primera fila o None): los puntos son las
+    líneas de la cabecera que empiezan con un código corto de letras (ej.
+    "Q", "P") seguido de más campos, las variables los códigos distintos y
+    las series los valores numéricos de la primera fila de datos.
+    """
+    puntos, codigos, pos = 0, set(), 0
+    limite = min(len(mm), max_bytes)
+    while pos < limite:
+        fin = mm.find(b"\n", pos, limite)
+        fin = limite if fin < 0 else fin
+        campos = mm[pos:fin].split()
+        if campos and campos[0][:1].isdigit():
+            return puntos, len(codigos), sum(_es_numero(c) for c in campos), pos
+        if len(campos) > 1 and len(campos[0]) <= 2 and campos[0].isalpha():
+            puntos += 1
+            codigos.add(campos[0].upper())
+        pos = fin + 1
+    return puntos, len(codigos), 0, None
+
+################################################################################
+# Funcion para analizar un Fichero_resultados.res sin cargarlo en memoria
+def analizar_res(ruta, bloque=1 << 26):
+    """
+    Recorre el .res con mmap por bloques (`bloque` bytes a la vez) y cuenta
+    las filas de datos (pasos de tiempo); solo la cabecera se analiza línea
+    a línea.
+
+    Retorna:
+    - diccionario con 'Res pasos', 'Res puntos', 'Res variables',
+      'Res series' y 'bytes'; None si el archivo no existe
+    """
+    if not os.path.isfile(ruta):
+        return None
+    tamaño = os.path.getsize(ruta)
+    datos = {'Res pasos': 0, 'Res puntos': 0, 'Res variables': 0, 'Res series': 0, 'bytes': tamaño}
+    if tamaño == 0:
+        return datos
+
+    with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        puntos, variables, series, inicio = _cabecera(mm)
+        datos.update({'Res puntos': puntos, 'Res variables': variables, 'Res series': series})
+        if inicio is None:
+            return datos
+
+        pasos = 1  # La primera fila de datos (no va precedida de un salto de línea del bloque)
+        solape = 256  # Bytes extra para las filas que empiezan justo al final de un bloque
+        for a in range(inicio, tamaño, bloque):
+            b = min(a + bloque, tamaño)
+            parte = mm[a:b + solape]
+            pasos += len(_FILA_DATOS.findall(parte)) - len(_FILA_DATOS.findall(parte[b - a:]))
+        datos['Res pasos'] = pasos
+    return datos
+
+################################################################################
+# Funcion para calcular el rendimiento normalizado de una ejecucion de Tetis
+def rendimiento_res(ruta, celdas, tiempo_s, frec_ghz=None):
+    """
+    Retorna el diccionario de COLUMNAS_RES: contenido del .res, celdas por
+    paso de tiempo simulados por segundo (y por GHz-segundo con la
+    frecuencia media, Vel_Tetis) y bytes de salida por segundo. Las columnas
+    que no se pueden calcular quedan en None.
+    """
+    valores = dict.fromkeys(COLUMNAS_RES)
+    datos = analizar_res(ruta)
+    if datos is None:
+        return valores
+    valores.update({k: v for k, v in datos.items() if k in valores})
+    if isinstance(tiempo_s, numbers.Real) and tiempo_s > 0:
+        valores['Res bytes por s'] = datos['bytes'] / tiempo_s
+        if isinstance(celdas, numbers.Real) and celdas > 0 and datos['Res pasos']:
+            valores['Celdas-paso por s'] = celdas * datos['Res pasos'] / tiempo_s
+            if isinstance(frec_ghz, numbers.Real) and frec_ghz > 0:
+                valores['Celdas-paso por GHz-s'] = valores['Celdas-paso por s'] / frec_ghz
+    return valores
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import psutil
+import rasterio
+
+from analisis import ajustar_potencia, t_cuantil, leer_resultados
+from generador_modelos import EXTENSIONES_RASTER
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas de la memoria predicha de una ejecucion (en `extra`, por etapa)
+COLUMNAS_MEMORIA = ['RSS estimado mb', 'Error RSS %']
+
+# Ejecutables con RSS pico medido en los resultados
+ETAPAS_MEMORIA = ["Tetis", "Control", "Toparc", "Hantec"]
+
+# Nombre del raster de cotas de un modelo (para contar celdas sin Topolco)
+PATRON_DEM = r"mdt|mde|dem|elev|cota"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para cargar el RSS pico medido de los resultados
+def cargar_memoria(wd_out):
+    """
+    Lee los resultados válidos de `wd_out` (analisis.leer_resultados) y
+    retorna una fila por equipo, modelo, Fe y etapa con las columnas Etapa,
+    Celdas y RSS (mediana del RSS pico medido de sus repeticiones, MB). Las
+    ejecuciones sin tiempo numérico (detenidas o fallidas, con un RSS
+    parcial) se descartan.
+    """
+    df = leer_resultados(wd_out)
+    partes = []
+    for etapa in ETAPAS_MEMORIA:
+        if f"{etapa} RSS pico mb" not in df.columns:
+            continue
+        largo = pd.DataFrame({'Equipo': df['Equipo'], 'Modelo': df['Modelo'], 'Entrada': df.get('Entrada'), 'Etapa': etapa,
+                              'Celdas': pd.to_numeric(df['Celdas'], errors="coerce"),
+                              'RSS': pd.to_numeric(df[f"{etapa} RSS pico mb"], errors="coerce")})
+        if f"{etapa} Time" in df.columns:
+            largo = largo[pd.to_numeric(df[f"{etapa} Time"], errors="coerce") > 0]
+        if f"{etapa} Cache" in df.columns:
+            largo = largo[df[f"{etapa} Cache"] != "HIT"]  # Restauradas de la cache: el RSS es el de otra ejecucion
+        partes.append(largo)
+
+    if not partes:
+        return pd.DataFrame(columns=['Etapa', 'Celdas', 'RSS'])
+    datos = pd.concat(partes, ignore_index=True)
+    datos = datos[(datos['RSS'] > 0) & (datos['Celdas'] > 0)]
+    datos = datos.groupby(['Equipo', 'Modelo', 'Entrada', 'Etapa', 'Celdas'], dropna=False, as_index=False)['RSS'].median()
+    return datos[['Etapa', 'Celdas', 'RSS']].reset_index(drop=True)
+
+################################################################################
+# Funcion para contar las celdas validas de un raster por bloques
+@lru_cache(maxsize=None)
+def _celdas_raster(ruta, mtime_ns):
+    with rasterio.open(ruta) as src:
+        return int(sum(np.count_nonzero(src.read_masks(1, window=ventana)) for _, ventana in src.block_windows(1)))
+
+def celdas_raster(ruta):
+    """
+    Cuenta las celdas con dato (distintas de nodata) de la primera banda de
+    `ruta`, leyendo las máscaras bloque a bloque sin cargar el raster. El
+    conteo se guarda mientras el archivo no cambie.
+    """
+    return _celdas_raster(os.path.abspath(ruta), os.stat(ruta).st_mtime_ns)
+
+################################################################################
+# Funcion para obtener las celdas de un modelo
+def celdas_modelo(wd_model, celdas=None, patron=PATRON_DEM):
+    """
+    Retorna `celdas` (de la cabecera de Topolco, vía el catálogo) o, si es
+    None (modelo sin Toparc), las celdas con dato del raster de cotas del
+    modelo. Retorna None si no hay ninguno.
+    """
+    if celdas:
+        return celdas
+    for nombre in sorted(os.listdir(wd_model)):
+        base, ext = os.path.splitext(nombre.lower())
+        if ext in EXTENSIONES_RASTER and re.search(patron, base):
+            return celdas_raster(os.path.join(wd_model, nombre))
+    return None
+
+################################################################################
+# Funcion para agregar la memoria estimada a una ejecucion
+def anotar_memoria(resultado, estimado):
+    """
+    Agrega a `resultado.extra` el RSS estimado antes de ejecutar y su error
+    relativo frente al RSS pico medido (COLUMNAS_MEMORIA). Retorna el RSS
+    pico medido (None si no se midió o la salida se restauró de la caché).
+    """
+    medido = resultado.extra.get('RSS pico mb') if resultado.extra.get('Cache') != "HIT" else None
+    error = 100 * (estimado - medido) / medido if estimado is not None and medido else None
+    resultado.extra.update({'RSS estimado mb': estimado, 'Error RSS %': error})
+    return medido
+
+def valores_memoria(resultado):
+    return [resultado.extra.get(col) for col in COLUMNAS_MEMORIA]
+
+################################################################################
+# Clase para predecir el RSS pico de cada ejecutable
+class ModeloMemoria:
+    """
+    Leyes de potencia RSS pico = a * celdas^b por etapa, para reservar
+    memoria antes de lanzar una ejecución. La memoria depende del modelo y
+    no del equipo, así que se ajusta con las ejecuciones de todos los
+    equipos; con un solo tamaño de modelo medido se usa el RSS por celda.
+
+    Parámetros:
+    - datos: DataFrame de cargar_memoria
+    - nivel: nivel del intervalo de predicción (la reserva es su extremo superior)
+    - margen: factor sobre la estimación cuando no hay intervalo (menos de 3 puntos)
+    """
+
+    def __init__(self, datos, nivel=0.95, margen=1.25):
+        self.nivel = nivel
+        self.margen = margen
+        self.datos = {etapa: (list(grupo['Celdas']), list(grupo['RSS'])) for etapa, grupo in datos.groupby('Etapa')}
+        self.ajustes = {etapa: self._ajustar(*xy) for etapa, xy in self.datos.items()}
+        self._bloqueo = threading.Lock()
+
+    def _ajustar(self, celdas, rss):
+        aj = ajustar_potencia(celdas, rss, self.nivel)
+        aj['por_celda'] = float(np.median(np.asarray(rss, dtype=np.float64) / np.asarray(celdas, dtype=np.float64)))
+        return aj
+
+    def predict(self, celdas, etapa="Tetis"):
+        """
+        Predice el RSS pico (MB) de `etapa` para un modelo de `celdas`.
+
+        Retorna un diccionario con la estimación y la reserva (extremo
+        superior del intervalo de predicción o estimación x margen), o None
+        si no hay mediciones de la etapa.
+        """
+        aj = self.ajustes.get(etapa)
+        if aj is None or not celdas:
+            return None
+        x0 = np.log(float(celdas))
+        if np.isfinite(aj['exponente']):
+            log_rss = np.log(aj['a']) + aj['exponente'] * x0
+            rss = float(np.exp(log_rss))
+        else:
+            rss = aj['por_celda'] * float(celdas)
+        if np.isfinite(aj['s']):
+            margen = t_cuantil(0.5 + self.nivel / 2, aj['n'] - 2) * aj['s'] * \
+                np.sqrt(1 + 1 / aj['n'] + (x0 - aj['x_media']) ** 2 / aj['sxx'])
+            reserva = float(np.exp(log_rss + margen))
+        else:
+            reserva = rss * self.margen
+        return {'rss_mb': rss, 'reserva_mb': max(rss, reserva)}
+
+    def estimar(self, celdas, etapas):
+        """
+        Retorna ({etapa: RSS estimado}, reserva) de un trabajo que ejecuta
+        `etapas` una tras otra: la reserva es la mayor de las etapas (None
+        si ninguna tiene mediciones).
+        """
+        predicciones = {etapa: self.predict(celdas, etapa) for etapa in etapas}
+        estimados = {etapa: p['rss_mb'] if p else None for etapa, p in predicciones.items()}
+        reservas = [p['reserva_mb'] for p in predicciones.values() if p]
+        return estimados, max(reservas) if reservas else None
+
+    def registrar(self, celdas, etapa, rss_mb):
+        """
+        Agrega el RSS pico medido de una ejecución y reajusta la etapa, para
+        que los trabajos siguientes de la campaña usen la nueva medición.
+        """
+        if not celdas or not rss_mb:
+            return
+        with self._bloqueo:
+            x, y = self.datos.setdefault(etapa, ([], []))
+            x.append(float(celdas))
+            y.append(float(rss_mb))
+            self.ajustes[etapa] = self._ajustar(x, y)
+
+################################################################################
+# Clase para admitir ejecuciones segun la memoria disponible
+class ControlMemoria:
+    """
+    Control de admisión por memoria: un trabajo empieza solo si la suma de
+    las reservas (RSS pico predicho) de los trabajos en curso más la suya
+    cabe en `fraccion` de la RAM disponible al crear el control, y si su
+    reserva cabe también en `fraccion` de la RAM disponible en ese momento
+    (otros programas pueden haberla ocupado). Así dos modelos grandes no se
+    ejecutan a la vez si juntos llevarían el equipo a paginar.
+
+    Un trabajo sin reserva conocida (None) se admite sin reservar. Si no hay
+    ningún trabajo en curso se admite aunque no quepa (si no, nunca se
+    ejecutaría).
+
+    Parámetros:
+    - fraccion: fracción de la RAM disponible que pueden reservar los trabajos
+    - intervalo: s entre comprobaciones de la RAM disponible mientras se espera
+    """
+
+    def __init__(self, fraccion=0.8, intervalo=5.0):
+        self.fraccion = fraccion
+        self.intervalo = intervalo
+        self.presupuesto_mb = fraccion * psutil.virtual_memory().available / 1024 ** 2
+        self.reservado_mb = 0.0
+        self.reservado_max_mb = 0.0
+        self.en_curso = 0
+        self.espera_s = 0.0
+        self.esperas = 0
+        self._cond = threading.Condition()
+
+    def _cabe(self, mb):
+        if self.en_curso == 0 or not mb:
+            return True
+        disponible_mb = psutil.virtual_memory().available / 1024 ** 2
+        return self.reservado_mb + mb <= self.presupuesto_mb and mb <= self.fraccion * disponible_mb
+
+    def _reservar(self, mb):
+        self.reservado_mb += mb or 0.0
+        self.reservado_max_mb = max(self.reservado_max_mb, self.reservado_mb)
+        self.en_curso += 1
+
+    def intentar(self, mb):
+        """
+        Reserva `mb` si caben y retorna True; si no, retorna False sin esperar.
+        """
+        with self._cond:
+            if not self._cabe(mb):
+                return False
+            self._reservar(mb)
+            return True
+
+    def reservar(self, mb):
+        """
+        Espera hasta que `mb` quepan y los reserva.
+        """
+        t0 = time.perf_counter()
+        with self._cond:
+            if not self._cabe(mb):
+                self.esperas += 1
+                print(f"Esperando memoria: {mb:.0f} MB estimados, {self.reservado_mb:.0f} de {self.presupuesto_mb:.0f} MB reservados")
+                while not self._cabe(mb):
+                    self._cond.wait(self.intervalo)  # Se libera una reserva o se vuelve a mirar la RAM disponible
+            self._reservar(mb)
+        self.espera_s += time.perf_counter() - t0
+
+    def liberar(self, mb):
+        """
+        Libera la reserva de un trabajo terminado.
+        """
+        with self._cond:
+            self.reservado_mb = max(0.0, self.reservado_mb - (mb or 0.0))
+            self.en_curso -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserva(self, mb):
+        """
+        Reserva `mb` mientras dura el bloque with (esperando si no caben).
+        """
+        self.reservar(mb)
+        try:
+            yield
+        finally:
+            self.liberar(mb)
+
+    def resumen(self):
+        """
+        Retorna el presupuesto, la mayor reserva simultánea, los trabajos que
+        esperaron por memoria y los segundos de espera.
+        """
+        return {
+            'Presupuesto mb': self.presupuesto_mb, 'Reservado max mb': self.reservado_max_mb,
+            'Esperas': self.esperas, 'Espera s': self.espera_s,
+        }
+
+################################################################################
+# Funcion para resumir el error de prediccion del RSS
+def error_memoria(wd_out):
+    """
+    Retorna por etapa el número de ejecuciones con RSS estimado y la media y
+    el percentil 90 del error absoluto (%) de la predicción, leídos de las
+    columnas "<etapa> Error RSS %" de los resultados válidos
+    (analisis.leer_resultados).
+    """
+    filas = []
+    df = leer_resultados(wd_out)
+    for etapa in ETAPAS_MEMORIA:
+        if f"{etapa} Error RSS %" in df.columns:
+            error = pd.to_numeric(df[f"{etapa} Error RSS %"], errors="coerce")
+            if f"{etapa} Time" in df.columns:
+                error = error[pd.to_numeric(df[f"{etapa} Time"], errors="coerce") > 0]  # Sin las detenidas (RSS parcial)
+            filas.append(pd.DataFrame({'Etapa': etapa, 'Error': error}))
+    if not filas:
+        return pd.DataFrame(columns=['Etapa', 'n', 'Error medio %', 'Error abs p90 %'])
+    datos = pd.concat(filas, ignore_index=True).dropna()
+    return datos.groupby('Etapa')['Error'].agg(
+        n='size', **{'Error medio %': 'mean', 'Error abs p90 %': lambda e: e.abs().quantile(0.9)}).reset_index()
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import re
+import csv
+import mmap
+import threading
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para convertir un valor de HWiNFO (coma decimal) a float
+def valor_float(valor):
+    """
+    Convierte un valor del log de HWiNFO a float (los indicadores Sí/No, como
+    los de límite de potencia, a 1/0). Retorna None si está vacío o no es
+    numérico.
+    """
+    if valor is None:
+        return None
+    valor = valor.replace(",", ".").strip()
+    if not valor:
+        return None
+    if valor.lower() in ("yes", "sí", "si", "no"):
+        return 0.0 if valor.lower() == "no" else 1.0
+    try:
+        return float(valor)
+    except ValueError:
+        return None
+
+################################################################################
+# Funcion para obtener el inicio (s desde epoch) de una fecha, hora y minuto
+@lru_cache(maxsize=4096)
+def _inicio_minuto(fecha, hora, minuto):
+    partes = re.split(r"[./-]", fecha)
+    if len(partes[0]) == 4:  # Año primero (2026-10-18)
+        a, m, d = partes[:3]
+    else:  # Día primero (18.10.2026)
+        d, m, a = partes[:3]
+    return datetime(int(a), int(m), int(d), hora, minuto).timestamp()
+
+################################################################################
+# Funcion para convertir la fecha y hora de HWiNFO a segundos desde epoch
+def marca_tiempo(fecha, hora):
+    """
+    Convierte las columnas Date y Time de HWiNFO (ej. "18.10.2026",
+    "21:06:48.123"; hora local) a segundos desde epoch. Retorna None si no
+    se pueden interpretar.
+    """
+    try:
+        partes = hora.strip().replace(",", ".").split(":")
+        segundos = float(partes[2]) if len(partes) > 2 else 0.0
+        return _inicio_minuto(fecha.strip(), int(partes[0]), int(partes[1])) + segundos
+    except (ValueError, IndexError):
+        return None
+
+################################################################################
+# Funcion para leer la marca de tiempo de una linea del log
+def _tiempo_linea(linea):
+    campos = next(csv.reader([linea.decode("utf-8", errors="ignore").lstrip("\ufeff")]), [])
+    return marca_tiempo(campos[0], campos[1]) if len(campos) > 2 else None
+
+################################################################################
+# Clase para seguir el archivo de monitoreo de HWiNFO
+class SeguidorHWiNFO:
+    """
+    Lector incremental (tipo "tail -f") del archivo CSV de HWiNFO.
+
+    La cabecera se lee una sola vez y se guarda la posición en bytes del
+    archivo, de forma que cada consulta solo lee las líneas añadidas desde la
+    anterior. La primera lectura (y cualquier relectura tras una rotación o
+    truncado del archivo) empieza desde el final, retrocediendo en bloques
+    hasta encontrar una fila completa, por lo que el costo de cada consulta
+    no depende del tamaño total del log.
+
+    Parámetros:
+    - ruta: ruta completa al archivo .csv generado por HWiNFO
+    - columnas: nombre de columna o lista de nombres a seguir
+    - bloque: tamaño en bytes de los bloques leídos desde el final
+    """
+
+    def __init__(self, ruta, columnas, bloque=65536):
+        self.ruta = ruta
+        self.columnas = [columnas] if isinstance(columnas, str) else list(columnas)
+        self.bloque = bloque
+        self.cabecera = None
+        self.indices = {}
+        self.ultimos = {col: None for col in self.columnas}
+        self._f = None
+        self._id = None
+        self._offset = 0
+        self._resto = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def cerrar(self):
+        if self._f is not None:
+            self._f.close()
+        self._f = None
+        self._id = None
+
+    def _abrir(self):
+        """
+        Abre el archivo, lee la cabecera y se posiciona al final para leer
+        solo la última fila completa.
+        """
+        self.cerrar()
+        self._f = open(self.ruta, "rb")
+        st = os.fstat(self._f.fileno())
+        self._id = (st.st_dev, st.st_ino)
+
+        linea_cab = self._f.readline()
+        fin_cabecera = self._f.tell()
+        texto = linea_cab.decode("utf-8", errors="ignore").lstrip("\ufeff").strip()
+        self.cabecera = next(csv.reader([texto]))
+        self.indices = {col: self.cabecera.index(col)
+                        for col in self.columnas if col in self.cabecera}
+
+        # Retroceder desde el final hasta tener al menos una línea completa
+        tamaño = st.st_size
+        inicio = max(fin_cabecera, tamaño - self.bloque)
+        while True:
+            self._f.seek(inicio)
+            datos = self._f.read(tamaño - inicio)
+            if inicio == fin_cabecera or datos.count(b"\n") >= 2:
+                break
+            inicio = max(fin_cabecera, inicio - self.bloque)
+
+        if inicio > fin_cabecera:
+            # Descartar la primera línea (probablemente incompleta)
+            datos = datos[datos.find(b"\n") + 1:]
+        self._offset = tamaño
+        self._resto = b""
+        return datos
+
+    def _cambio_archivo(self):
+        """
+        Detecta rotación (nuevo inodo) o truncado (tamaño menor al offset).
+        """
+        try:
+            st = os.stat(self.ruta)
+        except OSError:
+            return True
+        return (st.st_dev, st.st_ino) != self._id or st.st_size < self._offset
+
+    def _leer_nuevo(self):
+        """
+        Retorna los bytes añadidos desde la última consulta.
+        """
+        if self._f is None or self._cambio_archivo():
+            return self._abrir()
+        self._f.seek(self._offset)
+        datos = self._f.read()
+        self._offset += len(datos)
+        return datos
+
+    def _procesar(self, datos):
+        """
+        Actualiza los últimos valores con las líneas completas recibidas.
+        Solo se parsean las líneas necesarias, recorriendo desde el final.
+        """
+        datos = self._resto + datos
+        corte = datos.rfind(b"\n")
+        if corte < 0:
+            self._resto = datos
+            return
+        self._resto = datos[corte + 1:]
+        lineas = datos[:corte].split(b"\n")
+
+        pendientes = set(self.indices)
+        for linea in reversed(lineas):
+            if not pendientes:
+                break
+            texto = linea.decode("utf-8", errors="ignore").lstrip("\ufeff").strip()
+            # HWiNFO repite la cabecera al cerrar el log
+            if not texto or texto.startswith("Date,"):
+                continue
+            fila = next(csv.reader([texto]))
+            for col in list(pendientes):
+                idx = self.indices[col]
+                if idx < len(fila) and fila[idx].strip():
+                    self.ultimos[col] = fila[idx]
+                    pendientes.discard(col)
+
+    def leer(self):
+        """
+        Lee las filas nuevas y retorna un diccionario {columna: valor float}
+        con el último valor no vacío de cada columna (None si no hay datos).
+        """
+        try:
+            self._procesar(self._leer_nuevo())
+        except Exception:
+            self.cerrar()
+        return {col: valor_float(v) for col, v in self.ultimos.items()}
+
+################################################################################
+# Funcion para leer la ultima fila del archivo de monitoreo
+_seguidores = {}
+_bloqueo = threading.Lock()
+
+def leer_ultima_frecuencia(hwinfo_log_path, freq_col_name):
+    """
+    Lee la última frecuencia disponible desde el archivo CSV de HWiNFO.
+
+    Mantiene un SeguidorHWiNFO por archivo y columna, de modo que las
+    llamadas sucesivas solo leen las líneas nuevas del log. Es segura para
+    llamarse desde varios hilos (ejecuciones concurrentes).
+    """
+    clave = (hwinfo_log_path, freq_col_name)
+    with _bloqueo:
+        seguidor = _seguidores.get(clave)
+        if seguidor is None:
+            seguidor = _seguidores[clave] = SeguidorHWiNFO(hwinfo_log_path, freq_col_name)
+        return seguidor.leer()[freq_col_name]
+
+################################################################################
+# Funcion para leer varias columnas de la ultima fila del archivo de monitoreo
+def leer_ultimos(hwinfo_log_path, columnas):
+    """
+    Como leer_ultima_frecuencia, para varias columnas a la vez. Retorna
+    {columna: valor float o None}.
+    """
+    clave = (hwinfo_log_path, tuple(columnas))
+    with _bloqueo:
+        seguidor = _seguidores.get(clave)
+        if seguidor is None:
+            seguidor = _seguidores[clave] = SeguidorHWiNFO(hwinfo_log_path, list(columnas))
+        return seguidor.leer()
+
+################################################################################
+# Clase para el indice por tiempo del archivo de monitoreo
+class IndiceHWiNFO:
+    """
+    Índice disperso (offset en bytes, marca de tiempo) del CSV de HWiNFO para
+    extraer la ventana de una ejecución pasada de un log de varios GB.
+
+    Se guarda una entrada cada `paso_bytes` bytes, leyendo solo la línea de
+    cada punto del índice a través de un mmap, de modo que construirlo no
+    requiere recorrer todo el archivo. El índice se guarda junto al log
+    ({ruta}.idx.npz) y en cada consulta solo se extiende con lo añadido; se
+    reconstruye si cambia la cabecera o el archivo se trunca (es más corto que
+    lo ya leído o su última entrada ya no está en el mismo byte).
+
+    Parámetros:
+    - ruta: ruta completa al archivo .csv generado por HWiNFO
+    - paso_bytes: distancia aproximada entre entradas del índice
+    """
+
+    def __init__(self, ruta, paso_bytes=1 << 20, ruta_indice=None):
+        self.ruta = ruta
+        self.paso_bytes = paso_bytes
+        self.ruta_indice = ruta_indice or f"{ruta}.idx.npz"
+        self.cabecera = None
+        self.fin_cabecera = 0
+        self._reiniciar()
+        self._cargar()
+
+    def _reiniciar(self):
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.tiempos = np.zeros(0, dtype=np.float64)
+        self.siguiente = 0  # Byte desde el que se busca la próxima entrada (puede quedar pasado el final del log)
+        self.leido = 0  # Fin de la última línea completa leída (para detectar que el log se truncó)
+
+    def _cargar(self):
+        try:
+            with np.load(self.ruta_indice, allow_pickle=False) as datos:
+                self.offsets = datos['offsets']
+                self.tiempos = datos['tiempos']
+                self.siguiente = int(datos['siguiente'])
+                self.leido = int(datos['leido'])
+                self.cabecera = [str(c) for c in datos['cabecera']]
+                self.fin_cabecera = int(datos['fin_cabecera'])
+        except (OSError, KeyError, ValueError):
+            self._reiniciar()
+
+    def _guardar(self):
+        tmp = f"{self.ruta_indice}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, offsets=self.offsets, tiempos=self.tiempos, siguiente=self.siguiente, leido=self.leido,
+                     cabecera=np.array(self.cabecera), fin_cabecera=self.fin_cabecera)
+        os.replace(tmp, self.ruta_indice)
+
+    def actualizar(self):
+        """
+        Extiende el índice con las líneas completas añadidas al log.
+        """
+        tamaño = os.path.getsize(self.ruta)
+        if tamaño == 0:
+            return
+        with open(self.ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            fin_cabecera = mm.find(b"\n") + 1
+            if fin_cabecera == 0:
+                return
+            texto = mm[:fin_cabecera].decode("utf-8", errors="ignore").lstrip("\ufeff").strip()
+            cabecera = next(csv.reader([texto]))
+            if cabecera != self.cabecera or tamaño < self.leido or not self._ultima_entrada_vigente(mm, tamaño):
+                self._reiniciar()
+                self.cabecera, self.fin_cabecera = cabecera, fin_cabecera
+                self.siguiente = self.leido = fin_cabecera
+
+            nuevos_o, nuevos_t = [], []
+            objetivo = self.siguiente
+            while objetivo < tamaño:
+                inicio = objetivo if objetivo == fin_cabecera else mm.find(b"\n", objetivo - 1, tamaño) + 1
+                fin = mm.find(b"\n", inicio, tamaño) if inicio > 0 else -1
+                if fin < 0:
+                    break  # Línea incompleta: se indexa en la próxima consulta
+                t = _tiempo_linea(mm[inicio:fin])
+                if t is None:  # Cabecera repetida o línea dañada: se prueba la siguiente
+                    objetivo = fin + 1
+                    continue
+                nuevos_o.append(inicio)
+                nuevos_t.append(t)
+                objetivo = inicio + self.paso_bytes
+            leido = max(self.leido, mm.rfind(b"\n", 0, tamaño) + 1)
+
+        if nuevos_o or objetivo != self.siguiente:
+            self.offsets = np.concatenate([self.offsets, np.asarray(nuevos_o, dtype=np.int64)])
+            self.tiempos = np.concatenate([self.tiempos, np.asarray(nuevos_t, dtype=np.float64)])
+            self.siguiente = objetivo
+            self.leido = leido
+            self._guardar()
+        else:
+            self.leido = leido  # Se guarda con la próxima entrada
+
+    def _ultima_entrada_vigente(self, mm, tamaño):
+        # La última entrada del índice sigue en su byte con la misma marca de tiempo
+        if not self.offsets.size:
+            return True
+        inicio = int(self.offsets[-1])
+        fin = mm.find(b"\n", inicio, tamaño) if inicio < tamaño else -1
+        return fin >= 0 and _tiempo_linea(mm[inicio:fin]) == self.tiempos[-1]
+
+    def ventana(self, inicio, fin, columnas):
+        """
+        Extrae las filas con marca de tiempo entre `inicio` y `fin` (datetime
+        o segundos desde epoch). Se busca en el índice el rango de bytes de la
+        ventana y solo ese rango se lee del mmap y se interpreta.
+
+        Retorna:
+        - (t, series): t en segundos desde epoch (float64) y {columna: float32}
+          solo para las `columnas` pedidas (NaN en los valores vacíos)
+        """
+        inicio = inicio.timestamp() if isinstance(inicio, datetime) else float(inicio)
+        fin = fin.timestamp() if isinstance(fin, datetime) else float(fin)
+        columnas = [columnas] if isinstance(columnas, str) else list(columnas)
+        self.actualizar()
+        t, valores = [], {col: [] for col in columnas}
+        if self.cabecera is None:
+            return np.zeros(0), {col: np.zeros(0, dtype=np.float32) for col in columnas}
+        indices = {col: self.cabecera.index(col) for col in columnas if col in self.cabecera}
+
+        i = np.searchsorted(self.tiempos, inicio, side="right") - 1
+        j = np.searchsorted(self.tiempos, fin, side="right")
+        a = int(self.offsets[i]) if i >= 0 else self.fin_cabecera
+        with open(self.ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            b = int(self.offsets[j]) if j < self.offsets.size else mm.rfind(b"\n") + 1
+            datos = mm[a:b] if b > a else b""
+
+        for fila in csv.reader(datos.decode("utf-8", errors="ignore").splitlines()):
+            if len(fila) < 2:
+                continue
+            tf = marca_tiempo(fila[0], fila[1])
+            if tf is None or tf < inicio:
+                continue
+            if tf > fin:
+                break
+            t.append(tf)
+            for col in columnas:
+                idx = indices.get(col)
+                v = valor_float(fila[idx]) if idx is not None and idx < len(fila) else None
+                valores[col].append(np.nan if v is None else v)
+        return np.asarray(t, dtype=np.float64), {col: np.asarray(v, dtype=np.float32) for col, v in valores.items()}
+
+################################################################################
+# Funcion para extraer la ventana de una ejecucion del archivo de monitoreo
+_indices = {}
+
+def ventana_hwinfo(hwinfo_log_path, inicio, fin, columnas):
+    """
+    Retorna (t, series) de IndiceHWiNFO.ventana, reutilizando el índice del
+    archivo entre llamadas.
+    """
+    with _bloqueo:
+        indice = _indices.get(hwinfo_log_path)
+        if indice is None:
+            indice = _indices[hwinfo_log_path] = IndiceHWiNFO(hwinfo_log_path)
+        return indice.ventana(inicio, fin, columnas)
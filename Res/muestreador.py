@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import time
+import threading
+import numpy as np
+import psutil
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del resumen que se agregan a los resultados
+COLUMNAS_MUESTREO = [
+    'Frec media GHz', 'Frec min GHz', 'Frec max GHz', 'Uso nucleos medio %',
+    'CPU proceso medio %', 'CPU proceso max %', 'RSS max mb', 'Hilos max',
+    'IO leido mb', 'IO escrito mb', 'Muestras', 'Sobrecosto muestreo %',
+]
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Clase para muestrear el arbol de procesos y los nucleos con psutil
+class MuestreadorPsutil(threading.Thread):
+    """
+    Hilo en segundo plano que registra, a intervalos fijos, la telemetría del
+    proceso hijo (y de todos sus descendientes) y de cada núcleo lógico.
+
+    Las muestras se guardan en buffers de NumPy reservados de antemano; si se
+    llenan, se duplica su tamaño. En 'cpu_arnes' se registra el CPU de los
+    demás procesos hijos del arnés (otras ejecuciones concurrentes), que no
+    son carga de fondo ajena a la campaña.
+
+    Parámetros:
+    - pid: identificador del proceso a seguir
+    - intervalo: tiempo entre muestras en segundos
+    - capacidad: número de muestras reservadas inicialmente
+    """
+
+    def __init__(self, pid, intervalo=1.0, capacidad=3600):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.n_cpu = psutil.cpu_count(logical=True) or 1
+        self.n = 0
+        self.t = np.zeros(capacidad, dtype=np.float64)
+        self.cpu_proc = np.zeros(capacidad, dtype=np.float32)
+        self.cpu_arnes = np.zeros(capacidad, dtype=np.float32)
+        self.rss = np.zeros(capacidad, dtype=np.float64)
+        self.hilos = np.zeros(capacidad, dtype=np.int32)
+        self.io_leido = np.zeros(capacidad, dtype=np.float64)
+        self.io_escrito = np.zeros(capacidad, dtype=np.float64)
+        self.frec = np.full((capacidad, self.n_cpu), np.nan, dtype=np.float32)
+        self.uso = np.zeros((capacidad, self.n_cpu), dtype=np.float32)
+        self.tiempo_cpu = 0.0  # Tiempo de CPU consumido por el propio muestreador
+        self._parar = threading.Event()
+        self._procesos = {}
+        self._arnes = {}
+        self._io_base = {}
+        self.t0 = None
+
+    def _crecer(self):
+        for nombre in ['t', 'cpu_proc', 'cpu_arnes', 'rss', 'hilos', 'io_leido', 'io_escrito', 'frec', 'uso']:
+            buf = getattr(self, nombre)
+            relleno = np.nan if nombre == 'frec' else 0  # Sin cpu_freq la frecuencia queda NaN (no 0 GHz)
+            nuevo = np.full((2 * buf.shape[0],) + buf.shape[1:], relleno, dtype=buf.dtype)
+            nuevo[:buf.shape[0]] = buf
+            setattr(self, nombre, nuevo)
+
+    def _arbol(self):
+        """
+        Actualiza el diccionario de procesos seguidos (padre e hijos).
+        Se reutilizan los objetos Process para que cpu_percent sea incremental.
+        """
+        try:
+            raiz = self._procesos.get(self.pid) or psutil.Process(self.pid)
+            actuales = [raiz] + raiz.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return list(self._procesos.values())
+        for p in actuales:
+            if p.pid not in self._procesos:
+                self._procesos[p.pid] = p
+                try:
+                    p.cpu_percent(None)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        return [self._procesos[p.pid] for p in actuales]
+
+    def _otros_hijos(self):
+        """
+        Retorna los descendientes del arnés (proceso actual) que no son del
+        árbol seguido, reutilizando sus objetos Process.
+        """
+        try:
+            actuales = psutil.Process().children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return []
+        otros = []
+        for p in actuales:
+            if p.pid in self._procesos:
+                continue
+            if p.pid not in self._arnes:
+                self._arnes[p.pid] = p
+                try:
+                    p.cpu_percent(None)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            otros.append(self._arnes[p.pid])
+        return otros
+
+    def muestrear(self):
+        """
+        Toma una muestra y la guarda en los buffers.
+        """
+        if self.n == self.t.shape[0]:
+            self._crecer()
+        i = self.n
+
+        cpu = rss = leido = escrito = 0.0
+        hilos = 0
+        for p in self._arbol():
+            try:
+                with p.oneshot():
+                    cpu += p.cpu_percent(None)
+                    rss += p.memory_info().rss
+                    hilos += p.num_threads()
+                    if hasattr(p, "io_counters"):
+                        io = p.io_counters()
+                        # Se guarda el último valor por proceso (los que terminan conservan su aporte)
+                        self._io_base[p.pid] = (io.read_bytes, io.write_bytes)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        arnes = 0.0
+        for p in self._otros_hijos():
+            try:
+                arnes += p.cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        for r, w in self._io_base.values():
+            leido += r
+            escrito += w
+
+        uso = psutil.cpu_percent(percpu=True)
+        frec = psutil.cpu_freq(percpu=True) or []
+        if len(frec) == self.n_cpu:
+            self.frec[i] = [f.current for f in frec]
+        elif frec:
+            # Windows solo reporta una frecuencia global
+            self.frec[i] = frec[0].current
+
+        self.t[i] = time.perf_counter() - self.t0
+        self.cpu_proc[i] = cpu
+        self.cpu_arnes[i] = arnes
+        self.rss[i] = rss
+        self.hilos[i] = hilos
+        self.io_leido[i] = leido
+        self.io_escrito[i] = escrito
+        self.uso[i, :len(uso)] = uso[:self.n_cpu]
+        self.n += 1
+
+    def run(self):
+        self.t0 = time.perf_counter()
+        psutil.cpu_percent(percpu=True)
+        self._arbol()
+        self._otros_hijos()
+        while not self._parar.wait(self.intervalo):
+            c0 = time.thread_time()
+            self.muestrear()
+            self.tiempo_cpu += time.thread_time() - c0
+
+    def detener(self):
+        """
+        Detiene el hilo y retorna el resumen de la telemetría.
+        """
+        self._parar.set()
+        if self.is_alive():
+            self.join()
+        return self.resumen()
+
+    def series(self):
+        """
+        Retorna un diccionario con las series registradas (vistas de los buffers).
+        """
+        n = self.n
+        return {
+            't': self.t[:n], 'cpu_proc': self.cpu_proc[:n], 'cpu_arnes': self.cpu_arnes[:n], 'rss': self.rss[:n],
+            'hilos': self.hilos[:n], 'io_leido': self.io_leido[:n],
+            'io_escrito': self.io_escrito[:n], 'frec': self.frec[:n], 'uso': self.uso[:n],
+        }
+
+    def resumen(self):
+        """
+        Calcula las estadísticas resumen con los nombres de COLUMNAS_MUESTREO.
+        """
+        n = self.n
+        if n == 0:
+            return {col: float('nan') for col in COLUMNAS_MUESTREO} | {'Muestras': 0}
+
+        frec_media = np.nanmean(self.frec[:n], axis=1) if np.isfinite(self.frec[:n]).any() else np.full(n, np.nan)
+        duracion = self.t[n - 1] if self.t[n - 1] > 0 else float('nan')
+        return {
+            'Frec media GHz': float(np.nanmean(frec_media)) / 1000,
+            'Frec min GHz': float(np.nanmin(frec_media)) / 1000,
+            'Frec max GHz': float(np.nanmax(frec_media)) / 1000,
+            'Uso nucleos medio %': float(self.uso[:n].mean()),
+            'CPU proceso medio %': float(self.cpu_proc[:n].mean()),
+            'CPU proceso max %': float(self.cpu_proc[:n].max()),
+            'RSS max mb': float(self.rss[:n].max()) / 1024 / 1024,
+            'Hilos max': int(self.hilos[:n].max()),
+            'IO leido mb': float(self.io_leido[n - 1]) / 1024 / 1024,
+            'IO escrito mb': float(self.io_escrito[n - 1]) / 1024 / 1024,
+            'Muestras': n,
+            'Sobrecosto muestreo %': float(100 * self.tiempo_cpu / duracion),
+        }
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import psutil
+
+from enlaces import enlazar_archivo, MODOS_ENLACE
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Entradas del modelo que ninguna etapa modifica (rasters, calibracion y ficheros de evento): son las unicas que se
+# enlazan en el directorio de ejecucion. Extensiones (".asc"), nombres ("Calib.txt") o carpetas ("Fe/"); el resto
+# de archivos se copia o se clona, asi una escritura no prevista nunca llega al modelo ni a los demas directorios
+ARCHIVOS_SOLO_LECTURA = (".asc", ".tif", ".tiff", ".img", ".prj", "Calib.txt", "FactorETmes.txt", "Fe/")
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para obtener los nucleos logicos disponibles
+def nucleos_disponibles():
+    """
+    Retorna la lista de núcleos lógicos en los que puede ejecutarse el proceso
+    actual (None si el sistema no soporta afinidad, ej. macOS).
+    """
+    try:
+        return sorted(psutil.Process().cpu_affinity())
+    except (AttributeError, psutil.Error):
+        return None
+
+################################################################################
+# Funcion para repartir los nucleos entre trabajos concurrentes
+def repartir_nucleos(n_grupos, nucleos_por_grupo=None, nucleos=None):
+    """
+    Divide los núcleos lógicos en grupos disjuntos, uno por trabajo concurrente.
+
+    Parámetros:
+    - n_grupos: número de trabajos simultáneos
+    - nucleos_por_grupo: núcleos de cada grupo (por defecto, reparto equitativo)
+    - nucleos: lista de núcleos a repartir (por defecto, los disponibles)
+
+    Retorna:
+    - Lista de listas de núcleos (o lista de None si no hay soporte de afinidad)
+    """
+    if nucleos is None:
+        nucleos = nucleos_disponibles()
+    if nucleos is None:
+        return [None] * n_grupos
+    if nucleos_por_grupo is None:
+        nucleos_por_grupo = max(1, len(nucleos) // n_grupos)
+    if n_grupos * nucleos_por_grupo > len(nucleos):
+        raise ValueError(f"No hay {n_grupos} x {nucleos_por_grupo} núcleos disponibles ({len(nucleos)})")
+    return [nucleos[k * nucleos_por_grupo:(k + 1) * nucleos_por_grupo] for k in range(n_grupos)]
+
+################################################################################
+# Funcion para escribir la lista de nucleos en una celda del CSV
+def formato_nucleos(nucleos):
+    return "" if nucleos is None else " ".join(str(n) for n in nucleos)
+
+################################################################################
+# Funcion para fijar la afinidad de un proceso
+def fijar_afinidad(pid, nucleos):
+    """
+    Fija la afinidad del proceso a la lista de núcleos. Los procesos hijos
+    que lance después la heredan.
+    """
+    if nucleos is None:
+        return
+    try:
+        psutil.Process(pid).cpu_affinity(list(nucleos))
+    except (AttributeError, psutil.Error) as e:
+        print(f"No se pudo fijar la afinidad de {pid}: {e}")
+
+################################################################################
+# Funcion para saber si un archivo del modelo es una entrada de solo lectura
+def es_solo_lectura(relativo, enlazables=ARCHIVOS_SOLO_LECTURA):
+    """
+    Retorna True si la ruta `relativo` (al modelo) corresponde a alguno de
+    los `enlazables`: una extensión (".asc"), un nombre ("Calib.txt") o una
+    carpeta ("Fe/").
+    """
+    relativo = relativo.replace("\\", "/")
+    nombre = os.path.basename(relativo)
+    for patron in enlazables:
+        if patron.endswith("/"):
+            if relativo.startswith(patron):
+                return True
+        elif patron.startswith("."):
+            if nombre.lower().endswith(patron.lower()):
+                return True
+        elif nombre == patron or relativo == patron:
+            return True
+    return False
+
+################################################################################
+# Funcion para crear un directorio de ejecucion aislado
+def preparar_directorio_ejecucion(wd_model, wd_run, archivos_extra=(),
+                                  excluir=("Fichero_resultados.res",),
+                                  enlazables=ARCHIVOS_SOLO_LECTURA, mutables=(), modos=MODOS_ENLACE):
+    """
+    Crea un directorio de ejecución limpio con los archivos del modelo (solo
+    el primer nivel, sin subcarpetas) para que varios escenarios del mismo
+    modelo puedan ejecutarse a la vez.
+
+    Solo las entradas de solo lectura (`enlazables`) se enlazan sin copiar
+    sus datos (reflink, enlace duro o simbólico, según `modos`); el resto
+    (FileSSP, Topolco.sds, Hantec.sds y cualquier archivo desconocido) se
+    copia o se clona con reflink, que se separa al escribir. Así un archivo
+    que la ejecución reescribe nunca modifica el modelo ni los demás
+    directorios.
+
+    Parámetros:
+    - wd_model: directorio del modelo
+    - wd_run: directorio de ejecución a crear (se borra si existe)
+    - archivos_extra: rutas relativas al modelo a incluir también (ej. "Fe/Fe_0_0_1.txt")
+    - excluir: nombres de archivos del modelo que no se incluyen (salidas previas)
+    - enlazables: extensiones, nombres o carpetas de las entradas que se
+      pueden enlazar (ARCHIVOS_SOLO_LECTURA)
+    - mutables: nombres (o rutas relativas) que se copian aunque estén en
+      `enlazables` (ej. las salidas de CacheEtapas.salidas_conocidas())
+    - modos: modos de enlace permitidos para las entradas, en orden de preferencia
+
+    Retorna:
+    - {ruta relativa: modo usado}
+    """
+    if os.path.exists(wd_run):
+        shutil.rmtree(wd_run)
+    os.makedirs(wd_run)
+
+    relativos = [nombre for nombre in os.listdir(wd_model)
+                 if os.path.isfile(os.path.join(wd_model, nombre))
+                 and nombre not in excluir and not nombre.lower().endswith(".exe")]
+    modos_usados = {}
+    for relativo in relativos + list(archivos_extra):
+        dst = os.path.join(wd_run, relativo)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        mutable = relativo in mutables or os.path.basename(relativo) in mutables
+        permitidos = modos if es_solo_lectura(relativo, enlazables) and not mutable else ("reflink", "copia")
+        modos_usados[relativo] = enlazar_archivo(os.path.join(wd_model, relativo), dst, permitidos)
+    return modos_usados
+
+################################################################################
+# Funcion para ejecutar trabajos de forma concurrente
+def ejecutar_trabajos(trabajos, funcion, n_paralelo=1, nucleos_por_trabajo=None, fijar_nucleos=True, memoria=None):
+    """
+    Ejecuta `funcion(trabajo, nucleos)` para cada trabajo, con hasta
+    `n_paralelo` trabajos a la vez. Cada trabajo en curso recibe un grupo de
+    núcleos disjunto de los demás (None si fijar_nucleos es False). Con
+    `memoria` (memoria.ControlMemoria) cada trabajo espera además a que quepa
+    su reserva trabajo['memoria_mb'] (RSS pico predicho).
+
+    Es un generador: retorna (trabajo, resultado) a medida que terminan, para
+    que el código que lo llama pueda guardar cada resultado en cuanto existe.
+    Un trabajo que lanza una excepción se informa y no se retorna (como las
+    tareas ERROR de ejecutar_dag), sin detener los demás; si el código que
+    lo llama se interrumpe, los trabajos que no han empezado se cancelan.
+    """
+    if fijar_nucleos:
+        grupos = repartir_nucleos(n_paralelo, nucleos_por_trabajo)
+    else:
+        grupos = [None] * n_paralelo
+
+    libres = queue.Queue()
+    for grupo in grupos:
+        libres.put(grupo)
+
+    def envoltura(trabajo):
+        nucleos = libres.get()
+        try:
+            if memoria is None:
+                return funcion(trabajo, nucleos)
+            with memoria.reserva(trabajo.get('memoria_mb')):
+                return funcion(trabajo, nucleos)
+        finally:
+            libres.put(nucleos)
+
+    ex = ThreadPoolExecutor(max_workers=n_paralelo)
+    try:
+        futuros = {ex.submit(envoltura, trabajo): trabajo for trabajo in trabajos}
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                trabajo = futuros[futuro]
+                nombre = f"{trabajo.get('modelo')} {trabajo.get('file')}" if isinstance(trabajo, dict) else trabajo
+                print(f"Error en el trabajo {nombre}: {e!r}")
+                continue
+            yield futuros[futuro], resultado
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+
+################################################################################
+# Funcion para calcular la prioridad de ruta critica de las tareas de un DAG
+def prioridades_dag(tareas, duracion=None):
+    """
+    Retorna {id: prioridad}, donde la prioridad de una tarea es la duración
+    de la ruta más larga desde su inicio hasta el final del DAG (ella más
+    sus sucesoras). `duracion` es {id: segundos}; por defecto se usa el
+    campo 'estimado' de cada tarea (1 si no existe).
+
+    Lanza ValueError si hay dependencias desconocidas o ciclos.
+    """
+    por_id = {t['id']: t for t in tareas}
+    duracion = duracion or {t['id']: t.get('estimado', 1.0) for t in tareas}
+    hijos = {i: [] for i in por_id}
+    pendientes = {i: 0 for i in por_id}
+    for t in tareas:
+        for d in t.get('depende', ()):
+            if d not in por_id:
+                raise ValueError(f"La tarea {t['id']} depende de {d}, que no existe")
+            hijos[d].append(t['id'])
+            pendientes[t['id']] += 1
+
+    # Orden topologico (Kahn) y prioridades en orden inverso
+    orden = [i for i, n in pendientes.items() if n == 0]
+    for i in orden:
+        for h in hijos[i]:
+            pendientes[h] -= 1
+            if pendientes[h] == 0:
+                orden.append(h)
+    if len(orden) != len(por_id):
+        raise ValueError("Las dependencias de las tareas forman un ciclo")
+    prioridad = {}
+    for i in reversed(orden):
+        prioridad[i] = duracion[i] + max((prioridad[h] for h in hijos[i]), default=0.0)
+    return prioridad
+
+################################################################################
+# Funcion para ejecutar un DAG de tareas con un presupuesto de nucleos
+def ejecutar_dag(tareas, presupuesto=None, fijar_nucleos=True, memoria=None):
+    """
+    Ejecuta un DAG de tareas: en cuanto las dependencias de una tarea
+    terminan y hay núcleos libres suficientes, se lanza, priorizando las de
+    mayor ruta crítica restante. Así las tareas de distintos modelos se
+    solapan (ej. Tetis de un modelo mientras Toparc corre en otro).
+
+    Parámetros:
+    - tareas: lista de diccionarios con
+        'id': identificador único
+        'funcion': funcion(nucleos) que ejecuta la tarea y retorna su resultado
+        'depende': ids de las tareas que deben terminar antes
+        'nucleos': núcleos que reserva mientras corre (0 para tareas livianas)
+        'estimado': duración estimada (solo para priorizar)
+        'memoria_mb': RSS pico predicho que reserva mientras corre (opcional)
+    - presupuesto: núcleos lógicos a usar (None: todos los disponibles)
+    - fijar_nucleos: entregar a cada tarea una lista de núcleos disjunta
+      (None si es False o no hay soporte de afinidad)
+    - memoria: memoria.ControlMemoria; una tarea lista se lanza solo si
+      además cabe su 'memoria_mb' (si no, pueden adelantarse otras menores)
+
+    Es un generador: retorna (tarea, resultado, registro) a medida que
+    terminan. El registro tiene 'inicio' y 'fin' (s desde el inicio del
+    DAG), 'nucleos' y 'estado' ("OK", "ERROR" u "OMITIDA" si falló una
+    dependencia) y 'error'.
+    """
+    por_id = {t['id']: t for t in tareas}
+    prioridad = prioridades_dag(tareas)
+    hijos = {i: [] for i in por_id}
+    faltan = {i: len(t.get('depende', ())) for i, t in por_id.items()}
+    for t in tareas:
+        for d in t.get('depende', ()):
+            hijos[d].append(t['id'])
+
+    nucleos = nucleos_disponibles() if fijar_nucleos else None
+    if nucleos is not None:
+        libres = nucleos[:presupuesto] if presupuesto else list(nucleos)
+        capacidad = len(libres)
+    else:
+        capacidad = presupuesto or psutil.cpu_count(logical=True) or 1
+        libres = None
+    disponibles = capacidad
+
+    listas = [i for i, n in faltan.items() if n == 0]
+    registros = {}
+    t0 = time.perf_counter()
+
+    def envoltura(i, asignados):
+        registros[i]['inicio'] = time.perf_counter() - t0
+        try:
+            return por_id[i]['funcion'](asignados)
+        finally:
+            registros[i]['fin'] = time.perf_counter() - t0
+
+    def omitir(i, causa):
+        # Marca como omitidas todas las sucesoras de una tarea fallida
+        omitidas = []
+        pila = list(hijos[i])
+        while pila:
+            h = pila.pop()
+            if h in registros:
+                continue
+            registros[h] = {'inicio': None, 'fin': None, 'nucleos': None, 'estado': "OMITIDA", 'error': causa}
+            omitidas.append(h)
+            pila.extend(hijos[h])
+        return omitidas
+
+    with ThreadPoolExecutor(max_workers=capacidad + 4) as ex:
+        en_curso = {}
+        while listas or en_curso:
+            listas.sort(key=lambda i: -prioridad[i])
+            for i in list(listas):
+                n = min(por_id[i].get('nucleos', 1), capacidad)
+                if n > disponibles:
+                    continue
+                if memoria is not None and not memoria.intentar(por_id[i].get('memoria_mb')):
+                    continue
+                listas.remove(i)
+                disponibles -= n
+                asignados = None
+                if libres is not None and n > 0:
+                    asignados, libres = libres[:n], libres[n:]
+                registros[i] = {'inicio': None, 'fin': None, 'nucleos': asignados, 'estado': None, 'error': None}
+                en_curso[ex.submit(envoltura, i, asignados)] = (i, n)
+
+            if not en_curso:
+                break
+            # Con tareas en espera de memoria se vuelve a mirar la RAM disponible cada cierto tiempo
+            espera = memoria.intervalo if memoria is not None and listas else None
+            terminados, _ = wait(en_curso, timeout=espera, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                i, n = en_curso.pop(futuro)
+                disponibles += n
+                if memoria is not None:
+                    memoria.liberar(por_id[i].get('memoria_mb'))
+                if registros[i]['nucleos'] is not None:
+                    libres = sorted(libres + registros[i]['nucleos'])
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    registros[i].update(estado="ERROR", error=repr(e))
+                    print(f"Error en la tarea {i}: {e}")
+                    yield por_id[i], None, registros[i]
+                    for h in omitir(i, f"Falló {i}"):
+                        yield por_id[h], None, registros[h]
+                    continue
+                registros[i]['estado'] = "OK"
+                yield por_id[i], resultado, registros[i]
+                for h in hijos[i]:
+                    faltan[h] -= 1
+                    if faltan[h] == 0 and h not in registros:
+                        listas.append(h)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+import psutil
+
+from analisis import leer_resultados, cargar_resultados
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del seguimiento de progreso de una ejecucion
+COLUMNAS_PROGRESO = ['Estado', 'Progreso %', 'Pasos res', 'Tiempo estimado s', 'Tiempo limite s']
+
+# Estados con los que el vigilante detiene una ejecucion
+ESTADOS_DETENIDO = ("STALLED", "TIMEOUT")
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para leer el numero de intervalos de un fichero de evento
+def pasos_fe(ruta_fe):
+    """
+    Retorna el número de intervalos de tiempo del fichero de evento (registro
+    "G" del Fe: número de intervalos y su duración) o None si no se encuentra.
+    """
+    try:
+        with open(ruta_fe, "r", errors="ignore") as f:
+            for linea in f:
+                partes = linea.split()
+                if partes and partes[0].upper() == "G" and len(partes) > 1:
+                    return int(float(partes[1]))
+    except (OSError, ValueError):
+        pass
+    return None
+
+################################################################################
+# Funcion para obtener el tamaño de .res de ejecuciones anteriores
+def tamaños_res(wd_out):
+    """
+    Retorna {(modelo, entrada): bytes} con la mediana del 'Tamaño Res mb' de
+    los resultados válidos de Tetis de todos los equipos
+    (analisis.leer_resultados), sin las ejecuciones detenidas o fallidas
+    (su .res está incompleto).
+    """
+    df = leer_resultados(wd_out, ("tetis",))
+    if not {'Modelo', 'Entrada', 'Tamaño Res mb', 'Tetis Time'} <= set(df.columns):
+        return {}
+    df = df[pd.to_numeric(df['Tetis Time'], errors="coerce") > 0].copy()
+    df['Tamaño Res mb'] = pd.to_numeric(df['Tamaño Res mb'], errors="coerce")
+    df = df[df['Tamaño Res mb'] > 0]
+    medianas = df.groupby(['Modelo', 'Entrada'])['Tamaño Res mb'].median()
+    return {(str(m), str(e)): mb * 1024 ** 2 for (m, e), mb in medianas.items()}
+
+################################################################################
+# Funcion para obtener el tiempo de Tetis de ejecuciones anteriores de cada Fe
+def tiempos_fe(wd_out):
+    """
+    Retorna {(huella, modelo, entrada): s} con la mediana del tiempo de Tetis
+    de las ejecuciones válidas de cada Fe en cada equipo (cargar_resultados).
+    A diferencia de la ley de escalamiento (solo celdas), incluye la
+    duración del Fe.
+    """
+    datos = cargar_resultados(wd_out)
+    datos = datos[datos['Etapa'] == "Tetis"]
+    medianas = datos.groupby(['Huella', 'Modelo', 'Entrada'])['Tiempo'].median()
+    return {(str(h), str(m), str(e)): float(t) for (h, m, e), t in medianas.items()}
+
+################################################################################
+# Funcion para terminar un proceso y todos sus hijos
+def terminar_arbol(pid, espera=10):
+    """
+    Envía terminate al proceso y a sus descendientes y, a los que sigan vivos
+    tras `espera` s, kill. Retorna el número de procesos terminados.
+    """
+    try:
+        padre = psutil.Process(pid)
+        procesos = padre.children(recursive=True) + [padre]
+    except psutil.NoSuchProcess:
+        return 0
+    for p in procesos:
+        try:
+            p.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, vivos = psutil.wait_procs(procesos, timeout=espera)
+    for p in vivos:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+    return len(procesos)
+
+################################################################################
+# Funcion para escribir una duracion en texto
+def formato_duracion(segundos):
+    if segundos is None or not np.isfinite(segundos):
+        return "?"
+    segundos = int(segundos)
+    if segundos >= 86400:
+        return f"{segundos // 86400} d {segundos % 86400 // 3600} h"
+    if segundos >= 3600:
+        return f"{segundos // 3600} h {segundos % 3600 // 60} min"
+    return f"{segundos // 60} min {segundos % 60} s"
+
+################################################################################
+# Clase para seguir el progreso de una ejecucion de Tetis
+class SeguidorProgreso:
+    """
+    Sigue el crecimiento del archivo de resultados (.res) de una ejecución
+    para estimar el porcentaje completado y el tiempo restante (ETA), y
+    decide cuándo detenerla.
+
+    El archivo se lee de forma incremental (solo los bytes nuevos de cada
+    lectura) contando las filas de datos, es decir las líneas que empiezan
+    con un número. El progreso se estima, en este orden de preferencia, con
+    el tamaño del .res de una ejecución anterior igual, con las filas frente
+    a los intervalos del Fe o con el tiempo transcurrido frente al predicho.
+    Con la predicción disponible, el ETA mezcla la velocidad observada y la
+    predicha, dando más peso a la observada a medida que avanza la ejecución.
+
+    Estados: "RUNNING"; "STALLED" si el .res no crece durante
+    `ventana_estancado` s; "TIMEOUT" si el tiempo supera `tiempo_limite`.
+
+    Parámetros:
+    - ruta_res: archivo de resultados (ej. "{wd_run}Fichero_resultados.res")
+    - pasos_total: intervalos de la simulación (pasos_fe), o None
+    - tamaño_esperado: bytes finales del .res en una ejecución anterior, o None
+    - tiempo_estimado: tiempo predicho en s (ModeloEscalamiento), o None
+    - ventana_estancado: s sin crecer el .res para marcar STALLED (None: sin límite)
+    - tiempo_limite: s de ejecución para marcar TIMEOUT (None: sin límite)
+    - intervalo_reporte: s entre reportes de progreso en consola
+    """
+
+    def __init__(self, ruta_res, pasos_total=None, tamaño_esperado=None, tiempo_estimado=None,
+                 ventana_estancado=None, tiempo_limite=None, intervalo_reporte=60, bloque=1 << 20):
+        self.ruta_res = ruta_res
+        self.pasos_total = pasos_total
+        self.tamaño_esperado = tamaño_esperado
+        self.tiempo_estimado = tiempo_estimado
+        self.ventana_estancado = ventana_estancado
+        self.tiempo_limite = tiempo_limite
+        self.intervalo_reporte = intervalo_reporte
+        self.bloque = bloque
+        self.iniciar()
+
+    def iniciar(self):
+        """
+        Reinicia el seguimiento al lanzar el proceso. Un .res que ya existía
+        (de una ejecución anterior) se ignora hasta que el proceso lo reescribe.
+        """
+        self.t0 = time.monotonic()
+        self.t_crecimiento = self.t0
+        self.t_reporte = self.t0
+        self.estado = "RUNNING"
+        self.tamaño = 0
+        self.pasos = 0
+        self._resto = b""
+        try:
+            st = os.stat(self.ruta_res)
+            self._anterior = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            self._anterior = None
+
+    def _leer_nuevo(self, tamaño):
+        with open(self.ruta_res, "rb") as f:
+            f.seek(self.tamaño)
+            while self.tamaño < tamaño:
+                datos = f.read(min(self.bloque, tamaño - self.tamaño))
+                if not datos:
+                    break
+                self.tamaño += len(datos)
+                lineas = (self._resto + datos).split(b"\n")
+                self._resto = lineas.pop()
+                self.pasos += sum(1 for linea in lineas if linea.lstrip()[:1].isdigit())
+
+    def leer(self):
+        """
+        Lee los bytes nuevos del .res (si el proceso ya lo escribió).
+        """
+        try:
+            st = os.stat(self.ruta_res)
+        except OSError:
+            st = None
+        if st is not None and self._anterior is not None and (st.st_size, st.st_mtime_ns) == self._anterior:
+            st = None  # Sigue el .res de la ejecución anterior
+        if st is not None:
+            self._anterior = None
+            if st.st_size < self.tamaño:  # El proceso volvió a crear el archivo
+                self.tamaño, self.pasos, self._resto = 0, 0, b""
+            if st.st_size > self.tamaño:
+                self._leer_nuevo(st.st_size)
+                self.t_crecimiento = time.monotonic()
+
+    def actualizar(self):
+        """
+        Lee el crecimiento del .res y retorna el estado de la ejecución.
+        """
+        self.leer()
+        ahora = time.monotonic()
+        if self.tiempo_limite and ahora - self.t0 > self.tiempo_limite:
+            self.estado = "TIMEOUT"
+        elif self.ventana_estancado and ahora - self.t_crecimiento > self.ventana_estancado:
+            self.estado = "STALLED"
+        return self.estado
+
+    def transcurrido(self):
+        return time.monotonic() - self.t0
+
+    def fraccion(self):
+        """
+        Retorna la fracción completada estimada (0 a 1) o None.
+        """
+        if self.tamaño_esperado:
+            f = self.tamaño / self.tamaño_esperado
+        elif self.pasos_total:
+            f = self.pasos / self.pasos_total
+        elif self.tiempo_estimado:
+            f = self.transcurrido() / self.tiempo_estimado
+        else:
+            return None
+        return min(max(f, 0.0), 0.999)
+
+    def eta(self):
+        """
+        Retorna los segundos restantes estimados o None.
+        """
+        e = self.transcurrido()
+        predicha = max(self.tiempo_estimado - e, 0.0) if self.tiempo_estimado else None
+        f = self.fraccion() if (self.tamaño_esperado or self.pasos_total) else None
+        if not f:
+            return predicha
+        observada = e * (1 - f) / f
+        return observada if predicha is None else f * observada + (1 - f) * predicha
+
+    def reporte(self):
+        """
+        Retorna el texto de progreso cada `intervalo_reporte` s (None entre reportes).
+        """
+        ahora = time.monotonic()
+        if ahora - self.t_reporte < self.intervalo_reporte:
+            return None
+        self.t_reporte = ahora
+        f = self.fraccion()
+        avance = f"{100 * f:.1f}%" if f is not None else f"{self.pasos} filas"
+        return f"Progreso {avance} - {self.tamaño / 1024 ** 2:.1f} MB - ETA {formato_duracion(self.eta())}"
+
+    def resumen(self):
+        """
+        Retorna el diccionario de COLUMNAS_PROGRESO.
+        """
+        if self.estado == "RUNNING":
+            progreso = 100.0
+        else:
+            f = self.fraccion()
+            progreso = 100 * f if f is not None else None
+        return {
+            'Estado': "OK" if self.estado == "RUNNING" else self.estado,
+            'Progreso %': progreso,
+            'Pasos res': self.pasos,
+            'Tiempo estimado s': self.tiempo_estimado,
+            'Tiempo limite s': self.tiempo_limite,
+        }
+
+################################################################################
+# Funcion para crear el seguidor de progreso de una ejecucion de Tetis
+def seguidor_tetis(wd_run, fe, celdas, equipo, modelo_tiempos=None, tamaño_esperado=None,
+                   ventana_estancado=None, factor_timeout=None, tiempo_fe=None):
+    """
+    Crea el SeguidorProgreso de Tetis para el Fe `fe` en `wd_run`. El tiempo
+    estimado es `tiempo_fe` (ejecuciones anteriores del mismo Fe en el
+    equipo, tiempos_fe) o, si no hay, la predicción de `modelo_tiempos`
+    (ModeloEscalamiento) para las celdas del modelo en el equipo.
+
+    El límite (TIMEOUT) es `factor_timeout` veces `tiempo_fe`. La ley de
+    escalamiento no tiene en cuenta la duración del Fe (un Fe más largo que
+    los ajustados tarda más con las mismas celdas), así que sin `tiempo_fe`
+    solo se usa para el ETA y no hay límite.
+    """
+    tiempo_estimado = tiempo_limite = None
+    if tiempo_fe:
+        tiempo_estimado = float(tiempo_fe)
+        if factor_timeout:
+            tiempo_limite = factor_timeout * tiempo_estimado
+    elif modelo_tiempos is not None:
+        try:
+            tiempo_estimado = float(modelo_tiempos.predict(celdas, equipo, "Tetis")['tiempo_s'])
+        except (KeyError, ValueError, TypeError):
+            pass
+    return SeguidorProgreso(os.path.join(wd_run, "Fichero_resultados.res"),
+                            pasos_total=pasos_fe(os.path.join(wd_run, "Fe", f"{fe}.txt")),
+                            tamaño_esperado=tamaño_esperado, tiempo_estimado=tiempo_estimado,
+                            ventana_estancado=ventana_estancado, tiempo_limite=tiempo_limite)
+
+################################################################################
+# Funcion para obtener las columnas de progreso de un resultado
+def valores_progreso(resultado):
+    return [resultado.extra.get(col) for col in COLUMNAS_PROGRESO]
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import sys
+import threading
+import psutil
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas de la contabilidad de recursos de cada ejecutable
+COLUMNAS_RECURSOS = [
+    'CPU usuario s', 'CPU sistema s', 'RSS pico mb',
+    'Fallos pagina mayores', 'Fallos pagina menores',
+    'Cambios contexto voluntarios', 'Cambios contexto involuntarios',
+    'Leido bytes', 'Escrito bytes', 'Codigo salida',
+]
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para leer el pico de RSS de un proceso en Linux (VmHWM)
+def _rss_pico_linux(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+################################################################################
+# Funcion para tomar la contabilidad de un proceso y sus hijos con psutil
+def contabilidad_psutil(pid):
+    """
+    Suma tiempos de CPU, fallos de página, cambios de contexto y bytes de E/S
+    del proceso y sus hijos vivos; el RSS pico es el mayor de ellos. Retorna
+    None si el proceso ya terminó.
+    """
+    try:
+        padre = psutil.Process(pid)
+        procesos = [padre] + padre.children(recursive=True)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+    datos = dict.fromkeys(COLUMNAS_RECURSOS[:-1])
+    for p in procesos:
+        try:
+            with p.oneshot():
+                cpu = p.cpu_times()
+                mem = p.memory_info()
+                ctx = p.num_ctx_switches()
+                io = p.io_counters() if hasattr(p, "io_counters") else None
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+
+        # Windows: peak_wset y num_page_faults (no separa mayores y menores, el total va en menores)
+        pico = getattr(mem, "peak_wset", None)
+        pico = pico / 1024 ** 2 if pico is not None else (_rss_pico_linux(p.pid) or mem.rss / 1024 ** 2)
+        sumas = {
+            'CPU usuario s': cpu.user,
+            'CPU sistema s': cpu.system,
+            'Fallos pagina menores': getattr(mem, "num_page_faults", None),
+            'Cambios contexto voluntarios': ctx.voluntary,
+            'Cambios contexto involuntarios': ctx.involuntary,
+            'Leido bytes': io.read_bytes if io else None,
+            'Escrito bytes': io.write_bytes if io else None,
+        }
+        for col, valor in sumas.items():
+            if valor is not None:
+                datos[col] = (datos[col] or 0) + valor
+        datos['RSS pico mb'] = max(datos['RSS pico mb'] or 0.0, pico)
+    return datos
+
+################################################################################
+# Funcion para convertir un rusage de os.wait4 a las columnas de recursos
+def contabilidad_rusage(ru):
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    pico = ru.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+    return {
+        'CPU usuario s': ru.ru_utime,
+        'CPU sistema s': ru.ru_stime,
+        'RSS pico mb': pico,
+        'Fallos pagina mayores': ru.ru_majflt,
+        'Fallos pagina menores': ru.ru_minflt,
+        'Cambios contexto voluntarios': ru.ru_nvcsw,
+        'Cambios contexto involuntarios': ru.ru_nivcsw,
+        'Leido bytes': ru.ru_inblock * 512,
+        'Escrito bytes': ru.ru_oublock * 512,
+    }
+
+################################################################################
+# Clase para esperar un proceso y obtener su contabilidad de recursos
+class EsperaRecursos(threading.Thread):
+    """
+    Hilo que espera el fin de un subprocess.Popen y obtiene su contabilidad
+    de recursos.
+
+    En Linux/macOS espera con os.wait4, que entrega el rusage final exacto
+    del proceso (incluidos los hijos que él esperó). En Windows no existe
+    wait4: se usa la última lectura de psutil tomada con `actualizar`
+    mientras el proceso vivía (a lo sumo con el retraso del intervalo de
+    lectura). Los bytes de E/S de psutil (/proc/<pid>/io) se prefieren a los
+    bloques del rusage cuando están disponibles, y también el pico de RSS
+    (VmHWM): ru_maxrss puede incluir la memoria del proceso Python anterior
+    al exec.
+
+    Parámetros:
+    - proceso: subprocess.Popen recién lanzado
+    """
+
+    def __init__(self, proceso):
+        super().__init__(daemon=True)
+        self.proceso = proceso
+        self.codigo = None
+        self.rusage = None
+        self.ultima = None
+
+    def run(self):
+        if hasattr(os, "wait4"):
+            _, estado, self.rusage = os.wait4(self.proceso.pid, 0)
+            self.codigo = os.waitstatus_to_exitcode(estado)
+            self.proceso.returncode = self.codigo  # El proceso ya fue recogido, Popen no debe esperarlo
+        else:
+            self.codigo = self.proceso.wait()
+
+    def actualizar(self):
+        """
+        Toma una lectura de psutil del proceso vivo (se llama periódicamente).
+        """
+        if self.is_alive():
+            datos = contabilidad_psutil(self.proceso.pid)
+            if datos is not None:
+                self.ultima = datos
+
+    def esperar(self, timeout=None):
+        """
+        Espera el fin del proceso (máx. `timeout` s); retorna True si terminó.
+        """
+        self.join(timeout)
+        return not self.is_alive()
+
+    def recursos(self):
+        """
+        Retorna el diccionario de COLUMNAS_RECURSOS.
+        """
+        datos = dict.fromkeys(COLUMNAS_RECURSOS)
+        if self.ultima:
+            datos.update(self.ultima)
+        if self.rusage is not None:
+            rusage = contabilidad_rusage(self.rusage)
+            for col in ('Leido bytes', 'Escrito bytes'):
+                if datos[col] is not None:
+                    rusage[col] = max(datos[col], rusage[col])
+            if datos['RSS pico mb'] is not None:
+                rusage['RSS pico mb'] = datos['RSS pico mb']
+            datos.update(rusage)
+        datos['Codigo salida'] = self.codigo
+        return datos
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import time
+import sqlite3
+import threading
+import pandas as pd
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para citar nombres de columnas en SQL
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+################################################################################
+# Funcion para convertir valores a tipos que acepta SQLite
+def _valor_sql(valor):
+    if valor is None or isinstance(valor, (str, int, float, bytes)):
+        return valor
+    if hasattr(valor, "item"):  # Escalares de NumPy
+        return valor.item()
+    return str(valor)
+
+################################################################################
+# Clase para guardar los resultados en SQLite
+class AlmacenResultados:
+    """
+    Almacén de resultados de solo escritura al final (append-only) en SQLite.
+
+    Cada ejecución terminada se inserta como una fila en su propia
+    transacción, de modo que un fallo del equipo a mitad de campaña no pierde
+    los resultados anteriores. Al reiniciar, `completados` indica qué
+    combinaciones ya se ejecutaron para poder saltarlas.
+
+    Parámetros:
+    - ruta_db: archivo .sqlite (se crea si no existe)
+    - tabla: nombre de la tabla (ej. "tetis", "toparc_hantec")
+    - columnas: lista de columnas en el orden del CSV de resultados
+    - clave: columnas que identifican una ejecución
+    """
+
+    def __init__(self, ruta_db, tabla, columnas, clave=('Equipo', 'Modelo', 'Entrada')):
+        self.ruta_db = ruta_db
+        self.tabla = tabla
+        self.columnas = list(columnas)
+        self.clave = list(clave)
+        self._bloqueo = threading.Lock()
+        self._con = sqlite3.connect(ruta_db, check_same_thread=False, timeout=60)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._crear_tabla()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def cerrar(self):
+        self._con.close()
+
+    def _crear_tabla(self):
+        """
+        Crea la tabla o agrega las columnas nuevas si el esquema creció.
+        """
+        with self._con:
+            self._con.execute(
+                f"CREATE TABLE IF NOT EXISTS {_q(self.tabla)} "
+                f"(_id INTEGER PRIMARY KEY AUTOINCREMENT, _registro TEXT)")
+            existentes = {fila[1] for fila in self._con.execute(f"PRAGMA table_info({_q(self.tabla)})")}
+            for col in self.columnas:
+                if col not in existentes:
+                    self._con.execute(f"ALTER TABLE {_q(self.tabla)} ADD COLUMN {_q(col)}")
+
+    def agregar(self, fila):
+        """
+        Inserta una fila (lista en el orden de `columnas` o diccionario).
+        """
+        if isinstance(fila, dict):
+            valores = [fila.get(col) for col in self.columnas]
+        else:
+            valores = list(fila)
+            if len(valores) != len(self.columnas):
+                raise ValueError(f"La fila tiene {len(valores)} valores y se esperaban {len(self.columnas)}")
+        cols = ", ".join(_q(c) for c in ["_registro"] + self.columnas)
+        marcas = ", ".join("?" * (len(self.columnas) + 1))
+        registro = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        with self._bloqueo, self._con:
+            self._con.execute(f"INSERT INTO {_q(self.tabla)} ({cols}) VALUES ({marcas})",
+                              [registro] + [_valor_sql(v) for v in valores])
+
+    def completados(self, columna_tiempo=None, columna_invalida=None, nulos=None):
+        """
+        Retorna el conjunto de claves ya ejecutadas (valores como texto). Si
+        se indica `columna_tiempo`, solo cuentan las filas cuyo tiempo es
+        numérico (las marcadas como "NOT EXECUTABLE" se vuelven a ejecutar).
+        Si se indica `columna_invalida`, no cuentan las filas con un valor
+        distinto de 0 en ella (ej. 'Tetis Contaminada').
+
+        `nulos` ({columna: valor}) da el valor de las columnas de la clave que
+        están vacías (NULL), ej. en filas anteriores a la columna; las demás
+        vacías quedan como None.
+        """
+        nulos = nulos or {}
+        cols = ", ".join(f"COALESCE({_q(c)}, ?)" if c in nulos else _q(c) for c in self.clave)
+        sql = f"SELECT DISTINCT {cols} FROM {_q(self.tabla)} WHERE 1"
+        if columna_tiempo:
+            sql += f" AND typeof({_q(columna_tiempo)}) IN ('real', 'integer')"
+        if columna_invalida:
+            sql += f" AND COALESCE({_q(columna_invalida)}, 0) = 0"
+        parametros = [nulos[c] for c in self.clave if c in nulos]
+        with self._bloqueo:
+            return {tuple(None if v is None else str(v) for v in fila) for fila in self._con.execute(sql, parametros)}
+
+    def leer(self, ultimo_por_clave=True):
+        """
+        Retorna un DataFrame con las columnas del CSV de resultados. Con
+        `ultimo_por_clave` solo queda la fila más reciente de cada clave.
+        """
+        with self._bloqueo:
+            df = pd.read_sql_query(f"SELECT * FROM {_q(self.tabla)} ORDER BY _id", self._con)
+        if ultimo_por_clave and len(df):
+            df = df.drop_duplicates(subset=self.clave, keep="last")
+        columnas = [c for c in self.columnas if c in df.columns]
+        return df[columnas].reset_index(drop=True)
+
+    def exportar_csv(self, ruta_csv, ultimo_por_clave=True):
+        """
+        Exporta los resultados al formato CSV de siempre (Results_*.csv).
+        """
+        df = self.leer(ultimo_por_clave)
+        df.to_csv(ruta_csv, index=False)
+        return df
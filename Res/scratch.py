@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import time
+import queue
+import shutil
+import threading
+
+from planificador import preparar_directorio_ejecucion
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Columnas del almacenamiento donde se ejecuto cada escenario
+COLUMNAS_ALMACENAMIENTO = ['Almacenamiento', 'Staging mb']
+
+# En el scratch las entradas se copian (o se clonan en el mismo volumen): un
+# enlace a D:/ seguiria leyendo del disco lento
+MODOS_SCRATCH = ("reflink", "copia")
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para obtener el estado de los archivos de un directorio
+def estado_directorio(wd):
+    """
+    Retorna {nombre: (bytes, mtime_ns)} de los archivos del primer nivel.
+    """
+    estado = {}
+    with os.scandir(wd) as it:
+        for e in it:
+            if e.is_file():
+                st = e.stat()
+                estado[e.name] = (st.st_size, st.st_mtime_ns)
+    return estado
+
+################################################################################
+# Funcion para obtener los archivos que escribio una ejecucion
+def archivos_salida(wd, antes):
+    """
+    Retorna los nombres de los archivos del primer nivel de `wd` que son
+    nuevos o cambiaron respecto de `antes` (estado_directorio).
+    """
+    return sorted(nombre for nombre, estado in estado_directorio(wd).items() if antes.get(nombre) != estado)
+
+################################################################################
+# Funcion para copiar las entradas de una ejecucion al scratch
+def preparar_scratch(wd_model, wd_scratch_run, archivos_extra=(), mutables=()):
+    """
+    Crea el directorio de ejecución en el scratch (RAM disk o NVMe local)
+    con una copia de las entradas del modelo.
+
+    Retorna:
+    - ({ruta relativa: modo usado}, MB copiados)
+    """
+    modos = preparar_directorio_ejecucion(wd_model, wd_scratch_run, archivos_extra, mutables=mutables, modos=MODOS_SCRATCH)
+    mb = sum(os.path.getsize(os.path.join(wd_scratch_run, relativo)) for relativo in modos) / 1024 ** 2
+    return modos, mb
+
+################################################################################
+# Funcion para mover un archivo de forma atomica a otro volumen
+def mover_archivo(src, dst):
+    """
+    Copia `src` a un temporal junto a `dst`, lo renombra sobre `dst` y borra
+    `src`; nunca queda un `dst` a medio copiar. Retorna los bytes movidos.
+    """
+    tmp = f"{dst}.{threading.get_ident()}.tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    bytes_ = os.path.getsize(dst)
+    os.remove(src)
+    return bytes_
+
+################################################################################
+# Clase para devolver los resultados del scratch en segundo plano
+class EscrituraDiferida(threading.Thread):
+    """
+    Hilo en segundo plano que mueve los resultados de cada ejecución desde el
+    scratch a su directorio definitivo mientras la siguiente ya se ejecuta, y
+    luego borra el directorio del scratch.
+
+    La cola tiene `max_pendientes` lugares: si el disco de destino no alcanza
+    a los resultados, `encolar` bloquea el trabajo siguiente en lugar de
+    llenar el scratch. Si un movimiento falla, el directorio del scratch se
+    conserva y el error queda en `errores`.
+
+    Parámetros:
+    - max_pendientes: ejecuciones que pueden esperar su escritura
+    """
+
+    def __init__(self, max_pendientes=2):
+        super().__init__(daemon=True)
+        self.cola = queue.Queue(maxsize=max(1, max_pendientes))
+        self.escrituras = []
+        self.errores = []
+        self.espera_s = 0.0
+        self.start()
+
+    def encolar(self, wd_origen, wd_destino, nombres):
+        """
+        Encola el movimiento de `nombres` de `wd_origen` a `wd_destino`.
+        Bloquea mientras la cola esté llena.
+        """
+        t0 = time.perf_counter()
+        self.cola.put((wd_origen, wd_destino, list(nombres)))
+        self.espera_s += time.perf_counter() - t0
+
+    def run(self):
+        while True:
+            tarea = self.cola.get()
+            try:
+                if tarea is None:
+                    return
+                wd_origen, wd_destino, nombres = tarea
+                t0 = time.perf_counter()
+                try:
+                    os.makedirs(wd_destino, exist_ok=True)
+                    bytes_ = sum(mover_archivo(os.path.join(wd_origen, n), os.path.join(wd_destino, n)) for n in nombres)
+                    shutil.rmtree(wd_origen, ignore_errors=True)
+                    self.escrituras.append((wd_destino, bytes_, time.perf_counter() - t0))
+                except OSError as e:
+                    print(f"Error al devolver los resultados de {wd_origen} a {wd_destino}: {e}")
+                    self.errores.append((wd_origen, str(e)))
+            finally:
+                self.cola.task_done()
+
+    def esperar(self):
+        """
+        Espera a que terminen las escrituras encoladas (ej. antes de volver
+        a ejecutar un escenario en el mismo directorio del scratch).
+        """
+        self.cola.join()
+
+    def cerrar(self):
+        """
+        Espera a que terminen las escrituras pendientes, detiene el hilo y
+        retorna su resumen.
+        """
+        self.cola.put(None)
+        self.join()
+        return self.resumen()
+
+    def resumen(self):
+        """
+        Retorna el número de escrituras, MB y segundos de escritura, MB/s,
+        segundos que los trabajos esperaron por la cola llena y errores.
+        """
+        mb = sum(e[1] for e in self.escrituras) / 1024 ** 2
+        s = sum(e[2] for e in self.escrituras)
+        return {
+            'Escrituras': len(self.escrituras), 'Escritura mb': mb, 'Escritura s': s,
+            'Escritura mb por s': mb / s if s > 0 else None,
+            'Espera cola s': self.espera_s, 'Errores': len(self.errores),
+        }
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import warnings
+import numpy as np
+import matplotlib.pyplot as plt
+
+from monitor_hwinfo import ventana_hwinfo
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Funcion para crear el identificador de una ejecucion
+def nuevo_id(exe_name):
+    """
+    Retorna un identificador único y ordenable por fecha, ej. "20261018_164812_Tetis_3fa2c1".
+    """
+    nombre = os.path.splitext(os.path.basename(exe_name))[0]
+    return f"{time.strftime('%Y%m%d_%H%M%S')}_{nombre}_{uuid.uuid4().hex[:6]}"
+
+################################################################################
+# Funcion para guardar la telemetria de una ejecucion
+def guardar_telemetria(wd_telemetria, id_ejecucion, fuentes, meta=None):
+    """
+    Guarda las series de una ejecución en {wd_telemetria}{id_ejecucion}/:
+    por cada fuente, t_<fuente>.npy (float64, segundos desde el inicio) y un
+    .npy float32 por serie alineado con esos tiempos (2D en las series por
+    núcleo), y meta.json con la fuente de cada serie. Cada fuente conserva
+    sus propios tiempos, sin filas de NaN en los instantes de las demás. Se
+    escribe en un directorio temporal que luego se renombra, para no dejar
+    ejecuciones a medias.
+
+    Parámetros:
+    - fuentes: {fuente: (t, {nombre: valores})}, ej. {"psutil": (t, {"rss": ...})}
+    """
+    destino = os.path.join(wd_telemetria, id_ejecucion)
+    tmp = destino + ".tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    muestras, info = {}, {}
+    for fuente, (t, series) in fuentes.items():
+        np.save(os.path.join(tmp, f"t_{fuente}.npy"), np.asarray(t, dtype=np.float64))
+        muestras[fuente] = int(len(t))
+        for nombre, valores in series.items():
+            valores = np.asarray(valores, dtype=np.float32)
+            np.save(os.path.join(tmp, f"{nombre}.npy"), valores)
+            info[nombre] = {'fuente': fuente, 'forma': list(valores.shape[1:])}
+
+    meta = dict(meta or {}, id=id_ejecucion, muestras=muestras, series=info)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, destino)
+    return destino
+
+################################################################################
+# Funcion para obtener el archivo de tiempos de una serie archivada
+def tiempos_serie(carpeta, serie):
+    """
+    Retorna la ruta del .npy de tiempos de `serie` en la carpeta de una
+    ejecución (t_<fuente>.npy; t.npy en las ejecuciones archivadas con un
+    único índice de tiempo).
+    """
+    with open(os.path.join(carpeta, "meta.json"), encoding="utf-8") as f:
+        info = json.load(f)['series'].get(serie)
+    return os.path.join(carpeta, f"t_{info['fuente']}.npy" if isinstance(info, dict) else "t.npy")
+
+################################################################################
+# Funcion para listar las ejecuciones archivadas
+def indice_telemetria(wd_telemetria):
+    """
+    Retorna la lista de meta.json de las ejecuciones archivadas, ordenada por id.
+    """
+    metas = []
+    if not os.path.isdir(wd_telemetria):
+        return metas
+    for nombre in sorted(os.listdir(wd_telemetria)):
+        ruta = os.path.join(wd_telemetria, nombre, "meta.json")
+        if os.path.isfile(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                metas.append(json.load(f))
+    return metas
+
+################################################################################
+# Funcion para extraer del log de HWiNFO la ventana de una ejecucion archivada
+def hwinfo_ejecucion(wd_telemetria, id_ejecucion, hwinfo_log_path, columnas, margen_s=0.0):
+    """
+    Lee del log de HWiNFO (con IndiceHWiNFO, sin cargar el log completo) las
+    `columnas` durante la ejecución archivada, con `margen_s` segundos antes
+    y después. Retorna (t, series) con t en segundos desde el inicio de la
+    ejecución, igual que las series archivadas.
+    """
+    with open(os.path.join(wd_telemetria, id_ejecucion, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    inicio = time.mktime(time.strptime(meta['inicio'], "%Y-%m-%d %H:%M:%S"))
+    t, series = ventana_hwinfo(hwinfo_log_path, inicio - margen_s, inicio + meta['duracion_s'] + margen_s, columnas)
+    return t - inicio, series
+
+################################################################################
+# Funcion para leer una vista reducida de una serie
+def vista_serie(wd_telemetria, id_ejecucion, serie, max_puntos=2000, nucleo=None, bloque=1 << 16):
+    """
+    Lee una serie reducida a como máximo `max_puntos` intervalos (media,
+    mínimo y máximo de cada intervalo). Los archivos se abren con mmap y se
+    recorren por bloques, de modo que una ejecución de varios días no se
+    carga completa en memoria.
+
+    Parámetros:
+    - serie: nombre de la serie (ej. "frec_hwinfo", "rss", "frec")
+    - nucleo: en las series por núcleo, índice del núcleo (None: promedio)
+
+    Retorna:
+    - diccionario con 't', 'media', 'min' y 'max'
+    """
+    carpeta = os.path.join(wd_telemetria, id_ejecucion)
+    t = np.load(tiempos_serie(carpeta, serie), mmap_mode="r")
+    v = np.load(os.path.join(carpeta, f"{serie}.npy"), mmap_mode="r")
+    n = t.shape[0]
+    paso = max(1, -(-n // max_puntos))
+    filas = max(paso, bloque - bloque % paso)  # Bloques múltiplos del paso
+
+    partes = {'t': [], 'media': [], 'min': [], 'max': []}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # Intervalos sin muestras de la serie
+        for a in range(0, n, filas):
+            tb = np.asarray(t[a:a + filas], dtype=np.float64)
+            vb = np.asarray(v[a:a + filas], dtype=np.float32)
+            if vb.ndim == 2:
+                vb = np.nanmean(vb, axis=1) if nucleo is None else vb[:, nucleo]
+            m = -(-tb.size // paso)
+            relleno = m * paso - tb.size
+            tb = np.concatenate([tb, np.full(relleno, np.nan)]).reshape(m, paso)
+            vb = np.concatenate([vb, np.full(relleno, np.nan, dtype=np.float32)]).reshape(m, paso)
+            partes['t'].append(np.nanmean(tb, axis=1))
+            partes['media'].append(np.nanmean(vb, axis=1))
+            partes['min'].append(np.nanmin(vb, axis=1))
+            partes['max'].append(np.nanmax(vb, axis=1))
+    return {k: np.concatenate(p) if p else np.zeros(0) for k, p in partes.items()}
+
+################################################################################
+# Funcion para superponer una serie de varias ejecuciones
+def superponer_series(wd_telemetria, ids, serie, max_puntos=2000, nucleo=None):
+    """
+    Genera (id, vista) para cada ejecución de `ids` que tenga la serie; cada
+    vista se lee reducida, así que se pueden superponer muchas ejecuciones
+    sin cargarlas completas.
+    """
+    for id_ejecucion in ids:
+        if os.path.isfile(os.path.join(wd_telemetria, id_ejecucion, f"{serie}.npy")):
+            yield id_ejecucion, vista_serie(wd_telemetria, id_ejecucion, serie, max_puntos, nucleo)
+
+################################################################################
+# Funcion para graficar la superposicion de una serie
+def graficar_superposicion(wd_telemetria, ids, serie, max_puntos=2000, ruta_png=None, horas=True):
+    """
+    Grafica la media de `serie` de cada ejecución (y la banda mín-máx) frente
+    al tiempo desde el inicio.
+    """
+    fig, ax = plt.subplots(figsize=(10, 5))
+    escala = 3600 if horas else 1
+    for id_ejecucion, v in superponer_series(wd_telemetria, ids, serie, max_puntos):
+        linea, = ax.plot(v['t'] / escala, v['media'], lw=1, label=id_ejecucion)
+        ax.fill_between(v['t'] / escala, v['min'], v['max'], color=linea.get_color(), alpha=0.15, lw=0)
+    ax.set_xlabel("Tiempo desde el inicio (h)" if horas else "Tiempo desde el inicio (s)")
+    ax.set_ylabel(serie)
+    ax.legend(fontsize=7)
+    fig.tight_layout()
+    if ruta_png:
+        fig.savefig(ruta_png, dpi=150)
+    return fig
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+@author: ncortor
+"""
+
+import os
+import glob
+import json
+import time
+import itertools
+import threading
+from contextlib import contextmanager, nullcontext
+import pandas as pd
+
+__author__ = 'Ing. MSc.  PhD(c) Nicolás Cortés-Torres'
+__copyright__ = "Copyright 2024, DDL"
+__credits__ = ["Nicolás Cortés-Torres"]
+__license__ = "GIMHA"
+__version__ = "0.1"
+__maintainer__ = "Nicolás Cortés-Torres"
+__email__ = 'ncortor@doctor.upv.es, ingcortest@gmail.com'
+__status__ = "developing"
+
+# Categoria de los spans de los ejecutables (el resto es tiempo del arnes)
+CATEGORIA_EXE = "exe"
+
+_activo = None  # Trazador de la campaña en curso (run_exe_monitor registra en el los ejecutables)
+
+
+#%% DEFINICION DE FUNCIONES
+
+################################################################################
+# Clase para trazar las fases de una campaña
+class Trazador:
+    """
+    Traza de spans de una campaña: cada fase (instalar binarios, FileSSP,
+    Control, Tetis, guardar la fila, gc...) es un span con inicio y fin en
+    ns de time.perf_counter_ns (reloj monótono, el mismo de run_exe_monitor)
+    desde el inicio de la traza, su span padre y atributos (modelo, Fe,
+    etapa). Cada span se escribe al terminar, una línea por span, así la
+    traza sirve aunque la campaña se interrumpa.
+
+    Dentro de un hilo los spans se anidan solos; un span abierto en otro
+    hilo (ej. un trabajo de ejecutar_trabajos) es de primer nivel, salvo
+    que se indique su `padre`.
+
+    Parámetros:
+    - ruta: archivo de la traza (None: solo en memoria, en `spans`)
+    - formato: "jsonl" (un span por línea) o "chrome" (arreglo de eventos
+      para chrome://tracing o Perfetto); None: "chrome" si ruta termina en .json
+    - atributos: datos de la campaña (equipo, huella...) en la cabecera
+    """
+
+    def __init__(self, ruta=None, formato=None, **atributos):
+        self.ruta = ruta
+        self.formato = formato or ("chrome" if ruta and ruta.endswith(".json") else "jsonl")
+        self.atributos = atributos
+        self.spans = []
+        self.costo_ns = 0  # Tiempo de la propia traza (crear y escribir spans)
+        self._t0 = time.perf_counter_ns()
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._bloqueo = threading.Lock()
+        self._f = None
+        if ruta:
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+            self._f = open(ruta, "w", encoding="utf-8")
+            cabecera = {'traza': atributos, 'inicio': time.strftime("%Y-%m-%d %H:%M:%S"), 'pid': os.getpid()}
+            if self.formato == "chrome":
+                self._f.write("[\n" + json.dumps({'name': "process_name", 'ph': "M", 'pid': os.getpid(),
+                                                  'args': {'name': " ".join(map(str, atributos.values())) or "Tetis"}}))
+            else:
+                self._f.write(json.dumps(cabecera, default=str, ensure_ascii=False) + "\n")
+            self._f.flush()
+
+    def _pila(self):
+        if not hasattr(self._local, "pila"):
+            self._local.pila = []
+        return self._local.pila
+
+    @contextmanager
+    def span(self, nombre, categoria="arnes", padre=None, **atributos):
+        """
+        Span de `nombre` mientras dura el bloque with. Retorna el span (un
+        diccionario) para agregarle atributos dentro del bloque; si el
+        bloque lanza una excepción queda en 'error'.
+        """
+        t = time.perf_counter_ns()
+        pila = self._pila()
+        s = {'id': next(self._ids), 'padre': padre if padre is not None else (pila[-1]['id'] if pila else None),
+             'nombre': nombre, 'categoria': categoria, 'hilo': threading.get_ident(), 'inicio_ns': t - self._t0,
+             'atributos': atributos}
+        pila.append(s)
+        self.costo_ns += time.perf_counter_ns() - t
+        try:
+            yield s
+        except BaseException as e:
+            s['error'] = repr(e)
+            raise
+        finally:
+            s['fin_ns'] = time.perf_counter_ns() - self._t0
+            pila.pop()
+            self._escribir(s)
+
+    def registrar(self, nombre, inicio_ns, fin_ns, categoria=CATEGORIA_EXE, **atributos):
+        """
+        Registra un span ya medido con time.perf_counter_ns (ej. el proceso
+        de run_exe_monitor, entre su arranque y su fin) como hijo del span
+        abierto en el hilo actual.
+        """
+        pila = self._pila()
+        self._escribir({'id': next(self._ids), 'padre': pila[-1]['id'] if pila else None, 'nombre': nombre,
+                        'categoria': categoria, 'hilo': threading.get_ident(), 'inicio_ns': inicio_ns - self._t0,
+                        'atributos': atributos, 'fin_ns': fin_ns - self._t0})
+
+    def _escribir(self, s):
+        t = time.perf_counter_ns()
+        s['dur_ns'] = s['fin_ns'] - s['inicio_ns']
+        if self._f:
+            if self.formato == "chrome":
+                linea = ",\n" + json.dumps({
+                    'name': s['nombre'], 'cat': s['categoria'], 'ph': "X", 'pid': os.getpid(), 'tid': s['hilo'],
+                    'ts': s['inicio_ns'] / 1e3, 'dur': s['dur_ns'] / 1e3,
+                    'args': {**s['atributos'], 'id': s['id'], 'padre': s['padre'], **({'error': s['error']} if 'error' in s else {})},
+                }, default=str, ensure_ascii=False)
+            else:
+                linea = json.dumps(s, default=str, ensure_ascii=False) + "\n"
+        with self._bloqueo:
+            self.spans.append(s)
+            if self._f:
+                self._f.write(linea)
+                self._f.flush()
+            self.costo_ns += time.perf_counter_ns() - t
+
+    def cerrar(self):
+        """
+        Cierra el archivo de la traza (en Chrome cierra el arreglo).
+        """
+        with self._bloqueo:
+            if self._f:
+                if self.formato == "chrome":
+                    self._f.write("\n]\n")
+                self._f.close()
+                self._f = None
+
+################################################################################
+# Funciones para usar el trazador activo desde cualquier modulo
+def activar(trazador):
+    """
+    Define el trazador de la campaña en curso (None para desactivarlo); los
+    spans de `span` y `registrar_span` van a él.
+    """
+    global _activo
+    _activo = trazador
+    return trazador
+
+def span(nombre, categoria="arnes", padre=None, **atributos):
+    """
+    Span en el trazador activo; sin trazador no hace nada (nullcontext).
+    """
+    return _activo.span(nombre, categoria, padre, **atributos) if _activo else nullcontext()
+
+def registrar_span(nombre, inicio_ns, fin_ns, categoria=CATEGORIA_EXE, **atributos):
+    if _activo:
+        _activo.registrar(nombre, inicio_ns, fin_ns, categoria, **atributos)
+
+################################################################################
+# Funcion para leer una traza
+def leer_traza(ruta):
+    """
+    Lee una traza JSONL o Chrome y retorna la lista de spans (diccionarios
+    con id, padre, nombre, categoria, hilo, inicio_ns, fin_ns, dur_ns y
+    atributos). Tolera trazas de campañas interrumpidas.
+    """
+    with open(ruta, encoding="utf-8") as f:
+        texto = f.read()
+    if texto.lstrip().startswith("["):
+        texto = texto.strip().rstrip(",")
+        eventos = json.loads(texto if texto.endswith("]") else texto + "]")
+        spans = []
+        for e in eventos:
+            if e.get('ph') != "X":
+                continue
+            args = dict(e.get('args', {}))
+            inicio = round(e['ts'] * 1e3)
+            spans.append({'id': args.pop('id', None), 'padre': args.pop('padre', None), 'nombre': e['name'],
+                          'categoria': e.get('cat'), 'hilo': e.get('tid'), 'inicio_ns': inicio,
+                          'fin_ns': inicio + round(e['dur'] * 1e3), 'dur_ns': round(e['dur'] * 1e3), 'atributos': args})
+        return spans
+    spans = []
+    for linea in texto.splitlines():
+        try:
+            s = json.loads(linea)
+        except ValueError:
+            continue  # Ultima linea a medio escribir
+        if 'id' in s:
+            spans.append(s)
+    return spans
+
+################################################################################
+# Funcion para calcular la longitud de la union de intervalos
+def _union_ns(intervalos):
+    total, fin = 0, None
+    for a, b in sorted(intervalos):
+        if fin is None or a > fin:
+            total += b - a
+            fin = b
+        elif b > fin:
+            total += b - fin
+            fin = b
+    return total
+
+################################################################################
+# Funcion para resumir el costo del arnes en una traza
+def resumir_traza(traza):
+    """
+    Reparte el tiempo de pared de una campaña entre los ejecutables y el
+    arnes. `traza` es un Trazador, una ruta o una lista de spans.
+
+    El tiempo de los ejecutables es la unión de los spans CATEGORIA_EXE (con
+    ejecuciones concurrentes no se cuenta dos veces); el resto del tiempo de
+    pared es del arnes.
+
+    Retorna:
+    - diccionario con Pared s, Ejecutables s, Arnes s, Arnes %, Spans y Traza s
+    - DataFrame por fase (nombre y categoría): n, total, tiempo propio (sin
+      sus hijos; 0 si espera a hijos concurrentes), medio y máximo en s, y
+      % del tiempo de pared (con ejecuciones concurrentes puede pasar de 100)
+    """
+    costo_ns = traza.costo_ns if isinstance(traza, Trazador) else None
+    spans = traza.spans if isinstance(traza, Trazador) else (leer_traza(traza) if isinstance(traza, str) else traza)
+    columnas = ['Fase', 'Categoria', 'n', 'Total s', 'Propio s', 'Media s', 'Max s', 'Pared %']
+    if not spans:
+        return {'Pared s': 0.0, 'Ejecutables s': 0.0, 'Arnes s': 0.0, 'Arnes %': None, 'Spans': 0, 'Traza s': None}, \
+            pd.DataFrame(columns=columnas)
+
+    pared = max(s['fin_ns'] for s in spans) - min(s['inicio_ns'] for s in spans)
+    exe = _union_ns([(s['inicio_ns'], s['fin_ns']) for s in spans if s['categoria'] == CATEGORIA_EXE])
+    hijos = {}
+    for s in spans:
+        if s['padre'] is not None:
+            hijos[s['padre']] = hijos.get(s['padre'], 0) + s['dur_ns']
+
+    df = pd.DataFrame({
+        'Fase': [s['nombre'] for s in spans], 'Categoria': [s['categoria'] for s in spans],
+        'Duracion': [s['dur_ns'] / 1e9 for s in spans],
+        'Propio': [max(0, s['dur_ns'] - hijos.get(s['id'], 0)) / 1e9 for s in spans],
+    })
+    tabla = df.groupby(['Fase', 'Categoria']).agg(
+        n=('Duracion', 'size'), **{'Total s': ('Duracion', 'sum'), 'Propio s': ('Propio', 'sum'),
+                                   'Media s': ('Duracion', 'mean'), 'Max s': ('Duracion', 'max')}).reset_index()
+    tabla['Pared %'] = 100 * tabla['Propio s'] / (pared / 1e9) if pared > 0 else None
+    resumen = {
+        'Pared s': pared / 1e9, 'Ejecutables s': exe / 1e9, 'Arnes s': (pared - exe) / 1e9,
+        'Arnes %': 100 * (pared - exe) / pared if pared > 0 else None, 'Spans': len(spans),
+        'Traza s': costo_ns / 1e9 if costo_ns is not None else None,
+    }
+    return resumen, tabla.sort_values('Propio s', ascending=False)[columnas].reset_index(drop=True)
+
+
+#%%###############################################################################################################
+##### Codigo para resumir el costo del arnes de cada campaña #######
+################################################################################################################
+if __name__ == "__main__":
+
+    wd_trazas = "D:/Mod_rendimientos/Res/Trazas/" #Ubicación de las trazas de las campañas
+
+    filas = []
+    for ruta in sorted(glob.glob(os.path.join(wd_trazas, "Traza_*.json*"))):
+        resumen, tabla = resumir_traza(ruta)
+        filas.append({'Traza': os.path.basename(ruta), **resumen})
+        print(f"{os.path.basename(ruta)}: arnes {resumen['Arnes s']:.1f} de {resumen['Pared s']:.1f} s ({resumen['Arnes %'] or 0:.2f} %)")
+        print(tabla.head(10).to_string(index=False))
+    if filas:
+        pd.DataFrame(filas).to_csv(os.path.join(wd_trazas, "Resumen_trazas.csv"), index=False)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+Los modulos de Res se importan por nombre, como en los scripts.
+"""
+
+import os
+import sys
+import stat
+
+RES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Res")
+if RES not in sys.path:
+    sys.path.insert(0, RES)
+
+
+def crear_exe_simulado(ruta, segundos=1.0, salida=None, lineas=1000):
+    """
+    Escribe en `ruta` (ej. ".../bin/Tetis.exe") un script sh ejecutable que
+    espera `segundos` y, si se indica `salida` (ej.
+    "Fichero_resultados.res"), escribe ese archivo con `lineas` lineas en
+    su directorio de trabajo. Simula Control/Tetis sin TETIS.
+    """
+    texto = "#!/bin/sh\n"
+    if salida:
+        texto += f"seq 1 {int(lineas)} | sed 's/$/ 1.0/' > '{salida}'\n"
+    texto += f"sleep {segundos}\n"
+    with open(ruta, "w", newline="\n") as f:
+        f.write(texto)
+    os.chmod(ruta, os.stat(ruta).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return ruta
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura de los resultados de todos los equipos para los ajustes.
+"""
+
+import pandas as pd
+import pytest
+
+from analisis import leer_resultados, cargar_resultados
+
+BASE = {'Equipo': "A", 'Huella equipo': "h", 'Cuenca': "C", 'Escala': "100m", 'Escenario': "Esc1",
+        'Modelo': "M", 'Celdas': 1000, 'Tetis Contaminada': 0}
+
+
+def fila(entrada, tiempo, **otros):
+    return {**BASE, 'Entrada': entrada, 'Tetis Time': tiempo, **otros}
+
+
+@pytest.fixture
+def wd_out(tmp_path):
+    # Resultados del equipo y exportacion de la cola con una fila repetida y otra repeticion del Fe_1
+    pd.DataFrame([fila("Fe_1", 10), fila("Fe_2", "TIMEOUT"), fila("Fe_3", 99, **{'Tetis Contaminada': 1})]) \
+        .to_csv(tmp_path / "Results_tetis_A.csv", index=False)
+    pd.DataFrame([fila("Fe_1", 10), fila("Fe_1", 12)]).to_csv(tmp_path / "Results_tetis_cola_c.csv", index=False)
+    (tmp_path / "Results_tetis_vacio.csv").write_text("")
+    return str(tmp_path)
+
+
+def test_leer_resultados_sin_contaminadas_ni_repetidas(wd_out):
+    df = leer_resultados(wd_out)
+    assert sorted(df['Entrada']) == ["Fe_1", "Fe_1", "Fe_2"]
+    assert sorted(pd.to_numeric(df['Tetis Time'], errors="coerce").dropna()) == [10, 12]
+
+
+def test_cargar_resultados_mediana_de_repeticiones(wd_out):
+    datos = cargar_resultados(wd_out)
+    assert len(datos) == 1
+    assert datos.iloc[0]['Entrada'] == "Fe_1" and datos.iloc[0]['Tiempo'] == pytest.approx(11)
+
+
+def test_sin_resultados(tmp_path):
+    assert leer_resultados(str(tmp_path)).empty
+    assert cargar_resultados(str(tmp_path)).empty
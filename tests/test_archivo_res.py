@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Compresion de los .res con sha256 y archivador en segundo plano.
+"""
+
+import gzip
+import hashlib
+import os
+
+import pytest
+
+import archivo_res
+from archivo_res import comprimir_archivo, ArchivadorRes, verificar_archivo
+
+RES = b"".join(f"{i} {i * 0.5:.3f} 1.0\n".encode() for i in range(50000))
+
+
+@pytest.fixture
+def ruta_res(tmp_path):
+    ruta = tmp_path / "Fichero_resultados.res"
+    ruta.write_bytes(RES)
+    return str(ruta)
+
+
+def test_comprimir_archivo_gzip(ruta_res, tmp_path):
+    dst = str(tmp_path / "id1.res.gz")
+    fila = comprimir_archivo(ruta_res, dst, "gzip", bloque=4096)
+    with gzip.open(dst, "rb") as f:
+        assert f.read() == RES
+    assert fila['Sha256 res'] == hashlib.sha256(RES).hexdigest()
+    assert fila['Razon compresion'] > 1 and verificar_archivo(dst)
+    assert sorted(os.listdir(tmp_path)) == ["Fichero_resultados.res", "id1.res.gz", "id1.res.gz.sha256"]
+
+
+def test_comprimir_archivo_con_error_no_deja_temporales(ruta_res, tmp_path, monkeypatch):
+    def falla(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(archivo_res.gzip, "GzipFile", falla)
+    with pytest.raises(OSError):
+        comprimir_archivo(ruta_res, str(tmp_path / "id1.res.gz"), "gzip")
+    assert os.listdir(tmp_path) == ["Fichero_resultados.res"]
+
+
+def test_archivador_aparta_comprime_y_registra(ruta_res, tmp_path):
+    filas = []
+    archivador = ArchivadorRes(str(tmp_path / "archivo"), "gzip", n_hilos=2, max_pendientes=1, min_libre_gb=0,
+                               al_terminar=filas.append)
+    destinos = []
+    for i in range(3):
+        with open(ruta_res, "wb") as f:
+            f.write(RES)
+        destinos.append(archivador.archivar(ruta_res, str(tmp_path / "pendientes"), archivador.ruta_archivo("Mod", f"id{i}"),
+                                            {'Id': f"id{i}"}))
+        assert not os.path.exists(ruta_res)  # Apartado de inmediato para la siguiente ejecucion
+    resumen = archivador.cerrar()
+
+    assert resumen['Archivados'] == 3 and resumen['Errores'] == 0
+    assert sorted(f['Id'] for f in filas) == ["id0", "id1", "id2"]
+    assert all(verificar_archivo(d) for d in destinos)
+    assert os.listdir(tmp_path / "pendientes") == []
+    assert archivador.archivar(ruta_res, str(tmp_path / "pendientes"), destinos[0]) is None
+
+
+def test_archivador_con_error_deja_el_res_apartado(ruta_res, tmp_path, monkeypatch):
+    def falla(*args, **kwargs):
+        raise RuntimeError("zstandard")
+
+    monkeypatch.setattr(archivo_res, "comprimir_archivo", falla)
+    archivador = ArchivadorRes(str(tmp_path / "archivo"), "gzip", max_pendientes=1, min_libre_gb=0)
+    for _ in range(2):  # El cupo se libera aunque la compresion falle
+        with open(ruta_res, "wb") as f:
+            f.write(RES)
+        archivador.archivar(ruta_res, str(tmp_path / "pendientes"), archivador.ruta_archivo("Mod", "id"))
+    resumen = archivador.cerrar()
+    assert resumen['Archivados'] == 0 and resumen['Errores'] == 2
+    assert os.listdir(tmp_path / "pendientes") == ["id.res.gz.pendiente"]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Cola de campañas: leases, latidos y varios trabajadores locales con un
+Tetis simulado.
+"""
+
+import os
+import sys
+import time
+import subprocess
+import textwrap
+
+import pytest
+
+from conftest import RES, crear_exe_simulado
+from coordinador import ColaCampaña, expandir_campaña, servir_cola
+
+MODELOS = [{'carpeta': f"Mod_C_{i}00m_Esc1", 'modelo': f"C_{i}00m_Esc1", 'fe': ["Fe_1", "Fe_2"]} for i in range(1, 6)]
+
+# Trabajador local: se conecta a la cola servida, ejecuta el Tetis simulado y retorna una fila minima
+TRABAJADOR = textwrap.dedent("""
+    import os, subprocess, sys
+    from coordinador import conectar_cola, trabajar
+    puerto, exe, nombre = sys.argv[1:4]
+    cola = conectar_cola(("127.0.0.1", int(puerto)), b"prueba")
+    def correr(trabajo):
+        subprocess.run([exe], check=True, cwd=os.path.dirname(exe))
+        return {'Equipo': "local", 'Modelo': trabajo['modelo'], 'Entrada': trabajo['entrada'], 'Tetis Time': 0.5}
+    for _ in trabajar(cola, correr, nombre, "local", "huella", intervalo_latido=0.5, espera_s=0.2):
+        pass
+""")
+
+
+def test_expandir_campaña():
+    trabajos = expandir_campaña(MODELOS, repeticiones=2, equipos=("A", "B"))
+    assert len(trabajos) == 5 * 2 * 2 * 2
+    assert len({t['id'] for t in trabajos}) == len(trabajos)
+    assert {t['destino'] for t in trabajos} == {"A", "B"}
+
+
+def test_agregar_no_duplica(tmp_path):
+    with ColaCampaña(str(tmp_path / "cola.sqlite"), "prueba") as cola:
+        assert cola.agregar(expandir_campaña(MODELOS)) == 10
+        assert cola.agregar(expandir_campaña(MODELOS)) == 0
+        assert cola.resumen()['PENDIENTE'] == 10
+
+
+def test_lease_vencido_se_recupera_y_descarta_al_anterior(tmp_path):
+    with ColaCampaña(str(tmp_path / "cola.sqlite"), "prueba", duracion_lease=0.2, max_intentos=3) as cola:
+        cola.agregar(expandir_campaña(MODELOS[:1], equipos=(None,))[:1])
+        primero = cola.arrendar("w1", "local", "huella")
+        time.sleep(0.3)
+        segundo = cola.arrendar("w2", "local", "huella")
+        assert segundo['id'] == primero['id'] and segundo['intentos'] == 2
+        assert not cola.latido(primero['id'], "w1")
+        assert not cola.completar(primero['id'], "w1", {'Equipo': "w1"})
+        assert cola.completar(segundo['id'], "w2", {'Equipo': "w2"})
+        df = cola.leer()
+        assert list(df['Equipo']) == ["w2"] and list(df['Intento']) == [2]
+
+
+def test_max_intentos_pasa_a_error(tmp_path):
+    with ColaCampaña(str(tmp_path / "cola.sqlite"), "prueba", duracion_lease=60, max_intentos=2) as cola:
+        cola.agregar(expandir_campaña(MODELOS[:1])[:1])
+        for _ in range(2):
+            trabajo = cola.arrendar("w1", "local", "huella")
+            cola.fallar(trabajo['id'], "w1", "fallo")
+        assert cola.resumen()['ERROR'] == 1
+        assert cola.arrendar("w1", "local", "huella") is None
+
+
+def test_destino_por_equipo(tmp_path):
+    with ColaCampaña(str(tmp_path / "cola.sqlite"), "prueba") as cola:
+        cola.agregar(expandir_campaña(MODELOS[:1], equipos=("A",)))
+        assert cola.arrendar("w1", "B", "hb") is None and cola.pendientes("B", "hb") == 0
+        assert cola.arrendar("w1", "A", "ha")['destino'] == "A"
+
+
+def test_rechaza_carpetas_de_red():
+    for ruta in ("//Servidor/Res/cola.sqlite", "\\\\Servidor\\Res\\cola.sqlite"):
+        with pytest.raises(ValueError, match="carpeta de red"):
+            ColaCampaña(ruta, "prueba")
+
+
+def test_exportar_sin_resultados_no_escribe(tmp_path):
+    with ColaCampaña(str(tmp_path / "cola.sqlite"), "prueba") as cola:
+        assert len(cola.exportar_csv(str(tmp_path / "res.csv"))) == 0
+    assert not (tmp_path / "res.csv").exists()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="El Tetis simulado es un script sh")
+def test_varios_trabajadores_con_uno_muerto(tmp_path):
+    exe = crear_exe_simulado(str(tmp_path / "Tetis.exe"), 0.5, "Fichero_resultados.res", 10)
+    entorno = {**os.environ, 'PYTHONPATH': os.pathsep.join([RES, os.environ.get('PYTHONPATH', '')])}
+    with ColaCampaña(str(tmp_path / "cola.sqlite"), "prueba", duracion_lease=2, max_intentos=3) as cola:
+        cola.agregar(expandir_campaña(MODELOS, repeticiones=2))
+        servidor = servir_cola(cola, ("127.0.0.1", 0), b"prueba")
+
+        procesos = [subprocess.Popen([sys.executable, "-c", TRABAJADOR, str(servidor.address[1]), exe, f"w{i}"],
+                                     env=entorno, stdout=subprocess.DEVNULL) for i in range(3)]
+        limite = time.time() + 60
+        while time.time() < limite:
+            estado = cola.trabajos()
+            if ((estado['trabajador'] == "w0") & (estado['estado'] == "EN_CURSO")).any():
+                break
+            time.sleep(0.05)
+        procesos[0].kill()  # Muere con un trabajo arrendado: el lease vence y otro lo retoma
+        for p in procesos[1:]:
+            assert p.wait(timeout=120) == 0
+
+        resumen, trabajos, df = cola.resumen(), cola.trabajos(), cola.leer()
+    assert resumen == {'PENDIENTE': 0, 'EN_CURSO': 0, 'HECHO': 20, 'ERROR': 0}
+    assert len(df) == 20 and df['Trabajo'].is_unique
+    assert set(df['Trabajador']) <= {"w0", "w1", "w2"}
+    assert (trabajos['intentos'] > 1).any()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Metricas de escalamiento fuerte del barrido de nucleos.
+"""
+
+import numpy as np
+import pytest
+
+from escalado import metricas_escalado
+
+
+def test_base_un_hilo():
+    m = metricas_escalado({1: 100.0, 2: 55.0, 4: 40.0})
+    assert m[1] == {'Hilos base': 1, 'Speedup': 1.0, 'Eficiencia %': 100.0, 'Karp-Flatt': None}
+    assert m[2]['Speedup'] == pytest.approx(100 / 55)
+    assert m[4]['Eficiencia %'] == pytest.approx(100 * 2.5 / 4)
+    assert m[4]['Karp-Flatt'] == pytest.approx((1 / 2.5 - 1 / 4) / (1 - 1 / 4))
+
+
+def test_base_menor_conteo_medido():
+    m = metricas_escalado({2: 50.0, 8: 20.0})
+    assert m[8]['Hilos base'] == 2
+    assert m[8]['Speedup'] == pytest.approx(2.5)
+    assert m[8]['Eficiencia %'] == pytest.approx(100 * 2.5 / 4)
+
+
+def test_escalado_lineal_sin_fraccion_serial():
+    m = metricas_escalado({1: 80.0, 2: 40.0, 4: 20.0})
+    assert all(m[n]['Eficiencia %'] == pytest.approx(100) for n in m)
+    assert m[4]['Karp-Flatt'] == pytest.approx(0)
+
+
+def test_ignora_tiempos_no_numericos():
+    m = metricas_escalado({1: "TIMEOUT", 2: np.float64(30.0), 4: 15, 8: 0.0, 16: "NOT EXECUTABLE"})
+    assert sorted(m) == [2, 4]
+    assert m[4]['Speedup'] == pytest.approx(2)
+    assert metricas_escalado({1: "NOT EXECUTABLE"}) == {}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Plantilla FileSSP leida una vez por modelo y escritura atomica por ejecucion.
+"""
+
+import os
+
+import pytest
+
+from filessp import PlantillaFileSSP, escribir_filessp, LINEA_RUTA, LINEA_FE
+
+
+@pytest.fixture
+def ruta_tet(tmp_path):
+    lineas = [f"linea {i}" for i in range(max(LINEA_RUTA, LINEA_FE) + 5)]
+    lineas[LINEA_RUTA], lineas[LINEA_FE] = "C:/Modelos/Mod_C_100m/", "Fe/Fe_1.txt"
+    ruta = tmp_path / "FileSSP.tet"
+    ruta.write_text("\n".join(lineas) + "\n")
+    return str(ruta)
+
+
+def test_renderizar_no_depende_del_archivo_en_disco(ruta_tet, tmp_path):
+    plantilla = PlantillaFileSSP(ruta_tet)
+    assert plantilla.fe == "Fe/Fe_1.txt"
+    wd_run = f"{tmp_path}/"
+    escribir_filessp(wd_run, plantilla.renderizar(wd_run, "Fe/Fe_2.txt"))  # Sobrescribe el FileSSP.tet leido
+
+    texto = plantilla.renderizar("D:/run/", "Fe/Fe_3.txt")
+    lineas = texto.splitlines()
+    assert lineas[LINEA_RUTA] == "D:/run/" and lineas[LINEA_FE] == "Fe/Fe_3.txt"
+    assert plantilla.renderizar("D:/run/").splitlines()[LINEA_FE] == "Fe/Fe_1.txt"
+    assert texto.endswith("\n") and len(lineas) == len(plantilla.lineas)
+
+
+def test_escribir_filessp_escribe_ambos_archivos(ruta_tet, tmp_path):
+    wd_run = tmp_path / "run"
+    wd_run.mkdir()
+    texto = PlantillaFileSSP(ruta_tet).renderizar(f"{wd_run}/", "Fe/Fe_2.txt")
+    escribir_filessp(str(wd_run), texto)
+    assert sorted(os.listdir(wd_run)) == ["FileSSP.tet", "FileSSP.txt"]  # Sin temporales
+    assert (wd_run / "FileSSP.txt").read_text() == (wd_run / "FileSSP.tet").read_text() == texto
+
+
+def test_escribir_no_modifica_el_original_enlazado(ruta_tet, tmp_path):
+    wd_run = tmp_path / "run"
+    wd_run.mkdir()
+    os.link(ruta_tet, wd_run / "FileSSP.tet")
+    original = open(ruta_tet).read()
+    escribir_filessp(str(wd_run), "nuevo\n")
+    assert open(ruta_tet).read() == original and (wd_run / "FileSSP.tet").read_text() == "nuevo\n"
+
+
+def test_filessp_incompleto(tmp_path):
+    (tmp_path / "FileSSP.tet").write_text("una linea\n")
+    with pytest.raises(ValueError, match="incompleto"):
+        PlantillaFileSSP(str(tmp_path / "FileSSP.tet"))
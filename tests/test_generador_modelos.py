@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Remuestreo por bloques: celdas acumuladas escaladas por area y limpieza del
+GeoTIFF temporal.
+"""
+
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+import generador_modelos
+from generador_modelos import remuestrear_raster
+
+
+def escribir_acumulado(ruta, n=60, res=30):
+    datos = np.ones((n, n), dtype=np.int32)  # Cabeceras: cada celda drena solo su area
+    datos[:, n // 2] = np.arange(1, n + 1) * 100  # Un cauce
+    perfil = dict(driver="GTiff", width=n, height=n, count=1, dtype="int32", nodata=-9999,
+                  transform=from_origin(0, n * res, res, res))
+    with rasterio.open(ruta, "w", **perfil) as dst:
+        dst.write(datos, 1)
+
+
+def test_acumulado_escalado_no_deja_cabeceras_en_cero(tmp_path):
+    src, dst = str(tmp_path / "acum.tif"), str(tmp_path / "acum_300.tif")
+    escribir_acumulado(src)
+    info = remuestrear_raster(src, dst, 300, n_hilos=2, filas_bloque=20)
+    assert info['escalar'] and info['destino'] == (6, 6)
+    with rasterio.open(dst) as r:
+        datos = r.read(1)
+    assert datos.min() == 1  # 1 celda x (30/300)^2 se redondea a 0 sin el minimo
+    assert datos.max() == 60  # 6000 celdas de 30 m son 60 de 300 m
+    assert sorted(os.listdir(tmp_path)) == ["acum.tif", "acum_300.tif"]
+
+
+def test_bloque_con_error_no_deja_el_temporal(tmp_path, monkeypatch):
+    src, dst = str(tmp_path / "acum.tif"), str(tmp_path / "acum_300.tif")
+    escribir_acumulado(src)
+
+    def falla(*args, **kwargs):
+        raise RuntimeError("bloque")
+
+    monkeypatch.setattr(generador_modelos, "reproject", falla)
+    with pytest.raises(RuntimeError, match="bloque"):
+        remuestrear_raster(src, dst, 300, n_hilos=2, filas_bloque=20)
+    assert sorted(os.listdir(tmp_path)) == ["acum.tif"]
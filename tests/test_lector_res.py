@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Conteo de pasos del .res por bloques con mmap y rendimiento normalizado.
+"""
+
+import pytest
+
+from lector_res import analizar_res, rendimiento_res
+
+CABECERA = "* Fichero de resultados\n* Puntos de control\nQ  Aforo1  100  200\nQ  Aforo2  300  400\nP  Pluvio1  500  600\n"
+
+
+def escribir_res(ruta, pasos, salto="\n", final=True):
+    filas = [f"{' ' * (i % 4)}{i} {i * 0.5:.2f} 0,30 1.20" for i in range(1, pasos + 1)]
+    texto = CABECERA.replace("\n", salto) + salto.join(filas) + (salto if final else "")
+    ruta.write_bytes(texto.encode())
+    return str(ruta)
+
+
+@pytest.mark.parametrize("bloque", [1, 2, 3, 7, 16, 17, 64, 1000, 1 << 26])
+@pytest.mark.parametrize("salto", ["\n", "\r\n"])
+def test_pasos_en_los_limites_de_bloque(tmp_path, bloque, salto):
+    ruta = escribir_res(tmp_path / "Fichero_resultados.res", 300, salto)
+    datos = analizar_res(ruta, bloque=bloque)
+    assert datos['Res pasos'] == 300
+    assert (datos['Res puntos'], datos['Res variables'], datos['Res series']) == (3, 2, 4)
+
+
+@pytest.mark.parametrize("bloque", [5, 29, 1 << 26])
+def test_ultima_fila_sin_salto_y_sin_datos(tmp_path, bloque):
+    assert analizar_res(escribir_res(tmp_path / "a.res", 50, final=False), bloque=bloque)['Res pasos'] == 50
+    assert analizar_res(escribir_res(tmp_path / "b.res", 0), bloque=bloque)['Res pasos'] == 0
+    (tmp_path / "c.res").write_bytes(b"")
+    assert analizar_res(str(tmp_path / "c.res"))['Res pasos'] == 0
+    assert analizar_res(str(tmp_path / "no_existe.res")) is None
+
+
+def test_rendimiento_res(tmp_path):
+    ruta = escribir_res(tmp_path / "Fichero_resultados.res", 100)
+    valores = rendimiento_res(ruta, 1000, 10.0, 2.5)
+    assert valores['Celdas-paso por s'] == 1000 * 100 / 10.0
+    assert valores['Celdas-paso por GHz-s'] == 1000 * 100 / 10.0 / 2.5
+    assert rendimiento_res(ruta, 1000, "TIMEOUT")['Celdas-paso por s'] is None
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Lector incremental e indice por tiempo del log de HWiNFO.
+"""
+
+import numpy as np
+import pytest
+
+from monitor_hwinfo import SeguidorHWiNFO, IndiceHWiNFO, marca_tiempo
+
+CABECERA = 'Date,Time,"Relojes núcleo (avg) [MHz]","Paquete de CPU [°C]",\n'
+
+
+def linea(n):
+    return f'18.10.2026,{n // 3600:02d}:{(n // 60) % 60:02d}:{n % 60:02d}.000,"{3000 + n % 500},0","{50 + n % 20},5",\n'
+
+
+def escribir(ruta, lineas, modo="a"):
+    with open(ruta, modo, encoding="utf-8") as f:
+        f.writelines(lineas)
+
+
+@pytest.fixture
+def log(tmp_path):
+    ruta = str(tmp_path / "monitoreo.csv")
+    escribir(ruta, [CABECERA, *(linea(n) for n in range(200))], "w")
+    return ruta
+
+
+def test_seguidor_lee_solo_lo_nuevo(log):
+    with SeguidorHWiNFO(log, ["Relojes núcleo (avg) [MHz]", "No existe"]) as seguidor:
+        assert seguidor.leer() == {"Relojes núcleo (avg) [MHz]": 3199.0, "No existe": None}
+        escribir(log, [linea(200), '18.10.2026,00:03:21.000,"3'])  # La ultima linea esta incompleta
+        assert seguidor.leer()["Relojes núcleo (avg) [MHz]"] == 3200.0
+        escribir(log, ['333,0","60,0",\n'])
+        assert seguidor.leer()["Relojes núcleo (avg) [MHz]"] == 3333.0
+        escribir(log, [CABECERA, linea(20)], "w")  # Log truncado: se vuelve a leer desde el final
+        assert seguidor.leer()["Relojes núcleo (avg) [MHz]"] == 3020.0
+
+
+def test_indice_crece_sin_reconstruirse(log):
+    indice = IndiceHWiNFO(log, paso_bytes=500)
+    indice.actualizar()
+    assert indice.offsets.size > 5
+    reconstrucciones = []
+    reiniciar = indice._reiniciar
+    indice._reiniciar = lambda: (reconstrucciones.append(1), reiniciar())
+    for n in range(200, 400):  # Una linea por consulta, como HWiNFO cada segundo
+        anteriores = indice.offsets.copy()
+        escribir(log, [linea(n)])
+        indice.actualizar()
+        assert np.array_equal(indice.offsets[:anteriores.size], anteriores)
+    assert not reconstrucciones
+    assert np.all(np.diff(indice.offsets) > 0) and np.all(np.diff(indice.tiempos) > 0)
+
+    # Otro proceso retoma el indice guardado sin reconstruirlo
+    otro = IndiceHWiNFO(log, paso_bytes=500)
+    assert np.array_equal(otro.offsets, indice.offsets)
+    otro.actualizar()
+    assert np.array_equal(otro.offsets, indice.offsets)
+
+
+def test_indice_se_reconstruye_si_el_log_se_trunca(log):
+    indice = IndiceHWiNFO(log, paso_bytes=500)
+    indice.actualizar()
+    escribir(log, [CABECERA, *(linea(n) for n in range(1000, 1300))], "w")  # Mas largo que el anterior
+    indice.actualizar()
+    assert indice.tiempos[0] == marca_tiempo("18.10.2026", "00:16:40.000")
+
+
+def test_ventana(log):
+    indice = IndiceHWiNFO(log, paso_bytes=500)
+    t0 = marca_tiempo("18.10.2026", "00:00:00.000")
+    t, series = indice.ventana(t0 + 50, t0 + 59, ["Relojes núcleo (avg) [MHz]", "No existe"])
+    assert list(t - t0) == list(range(50, 60))
+    assert list(series["Relojes núcleo (avg) [MHz]"]) == list(range(3050, 3060))
+    assert np.isnan(series["No existe"]).all()
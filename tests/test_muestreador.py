@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Buffers del muestreador psutil al crecer.
+"""
+
+import os
+import time
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import psutil
+
+from muestreador import MuestreadorPsutil
+
+Frecuencia = namedtuple("Frecuencia", "current min max")
+
+
+def muestrear(monkeypatch, frecuencias, n=5):
+    monkeypatch.setattr(psutil, "cpu_freq", lambda percpu=False: frecuencias)
+    m = MuestreadorPsutil(os.getpid(), capacidad=2)
+    m.t0 = time.perf_counter()
+    for _ in range(n):
+        m.muestrear()
+    return m
+
+
+def test_sin_frecuencia_no_es_cero_al_crecer(monkeypatch):
+    m = muestrear(monkeypatch, None)
+    assert m.frec.shape[0] >= 5 and np.isnan(m.frec).all()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        resumen = m.resumen()
+    assert np.isnan(resumen['Frec media GHz']) and np.isnan(resumen['Frec min GHz'])
+    assert resumen['Muestras'] == 5
+
+
+def test_frecuencia_global_tras_crecer(monkeypatch):
+    m = muestrear(monkeypatch, [Frecuencia(3000.0, 800.0, 4000.0)])
+    resumen = m.resumen()
+    assert resumen['Frec media GHz'] == resumen['Frec min GHz'] == 3.0
+    assert m.series()['rss'].shape == (5,) and (m.series()['rss'] > 0).all()
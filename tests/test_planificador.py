@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Prioridades de ruta critica del DAG, trabajos que fallan sin detener la
+campaña y directorios de ejecucion aislados.
+"""
+
+import pytest
+
+from planificador import prioridades_dag, ejecutar_trabajos, preparar_directorio_ejecucion, es_solo_lectura
+
+
+def test_prioridades_ruta_critica():
+    # Dos modelos: Toparc -> Hantec -> Tetis de cada Fe; el modelo largo va primero
+    tareas = [
+        {'id': "T1", 'estimado': 10}, {'id': "H1", 'estimado': 5, 'depende': ["T1"]},
+        {'id': "F1a", 'estimado': 100, 'depende': ["H1"]}, {'id': "F1b", 'estimado': 20, 'depende': ["H1"]},
+        {'id': "T2", 'estimado': 50}, {'id': "H2", 'estimado': 5, 'depende': ["T2"]},
+        {'id': "F2", 'estimado': 10, 'depende': ["H2"]},
+    ]
+    p = prioridades_dag(tareas)
+    assert p["F1a"] == 100 and p["H1"] == 105 and p["T1"] == 115
+    assert p["T2"] == 65
+    assert max(p, key=p.get) == "T1"
+
+
+def test_prioridades_duracion_explicita_y_por_defecto():
+    tareas = [{'id': 1}, {'id': 2, 'depende': [1]}]
+    assert prioridades_dag(tareas) == {1: 2.0, 2: 1.0}
+    assert prioridades_dag(tareas, {1: 3.0, 2: 4.0}) == {1: 7.0, 2: 4.0}
+
+
+def test_prioridades_rechaza_ciclos_y_dependencias_desconocidas():
+    with pytest.raises(ValueError, match="ciclo"):
+        prioridades_dag([{'id': 1, 'depende': [2]}, {'id': 2, 'depende': [1]}])
+    with pytest.raises(ValueError, match="no existe"):
+        prioridades_dag([{'id': 1, 'depende': [9]}])
+
+
+def test_un_trabajo_con_error_no_detiene_los_demas(capsys):
+    def funcion(trabajo, nucleos):
+        if trabajo['file'] == "Fe_2":
+            raise RuntimeError("Tetis fallo")
+        return trabajo['file']
+
+    trabajos = [{'modelo': "M", 'file': f"Fe_{i}"} for i in range(1, 5)]
+    hechos = list(ejecutar_trabajos(trabajos, funcion, n_paralelo=2, fijar_nucleos=False))
+    assert sorted(r for _, r in hechos) == ["Fe_1", "Fe_3", "Fe_4"]
+    assert "Error en el trabajo M Fe_2" in capsys.readouterr().out
+
+
+def test_solo_se_enlazan_las_entradas_de_solo_lectura(tmp_path):
+    modelo, run = tmp_path / "Mod_C_100m_Esc1", tmp_path / "run"
+    (modelo / "Fe").mkdir(parents=True)
+    for nombre in ("cota.ASC", "Calib.txt", "Topolco.sds", "FileSSP.tet", "Salida_nueva.dat", "Fichero_resultados.res", "Fe/Fe_1.txt"):
+        (modelo / nombre).write_text(nombre)
+    modos = preparar_directorio_ejecucion(str(modelo), str(run), ["Fe/Fe_1.txt"], mutables=["Calib.txt"], modos=("hardlink", "copia"))
+
+    assert modos["cota.ASC"] == "hardlink" and modos["Fe/Fe_1.txt"] == "hardlink"
+    assert modos["Calib.txt"] == "copia"  # En mutables aunque sea de solo lectura
+    assert {modos[n] for n in ("Topolco.sds", "FileSSP.tet", "Salida_nueva.dat")} <= {"reflink", "copia"}
+    assert "Fichero_resultados.res" not in modos
+    (run / "Salida_nueva.dat").write_text("reescrito por la ejecucion")
+    assert (modelo / "Salida_nueva.dat").read_text() == "Salida_nueva.dat"
+
+
+def test_es_solo_lectura():
+    assert es_solo_lectura("Fe\\Fe_1.txt") and es_solo_lectura("dem.tif") and es_solo_lectura("FactorETmes.txt")
+    assert not es_solo_lectura("Hantec.sds") and not es_solo_lectura("FileSSP.txt") and not es_solo_lectura("Fe_1.txt")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Seguimiento del progreso de Tetis por el crecimiento del .res: lectura
+incremental, ETA y estados STALLED y TIMEOUT.
+"""
+
+import pytest
+
+import progreso
+from progreso import SeguidorProgreso, seguidor_tetis, pasos_fe
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(progreso.time, "monotonic", lambda: ahora[0])
+    return ahora
+
+
+def agregar(ruta, texto):
+    with open(ruta, "ab") as f:
+        f.write(texto.encode())
+
+
+def test_lectura_incremental_con_filas_incompletas(tmp_path, reloj):
+    ruta = tmp_path / "Fichero_resultados.res"
+    seguidor = SeguidorProgreso(str(ruta), pasos_total=10, bloque=7)
+    seguidor.leer()  # Aun no existe
+    agregar(ruta, "* Cabecera\nQ  Aforo1  1  2\n  1 0.5\n  2 0")
+    seguidor.leer()
+    assert seguidor.pasos == 1  # La fila 2 esta incompleta
+    agregar(ruta, ".7\n  3 0.9\n")
+    seguidor.leer()
+    assert seguidor.pasos == 3 and seguidor.tamaño == ruta.stat().st_size
+    assert seguidor.fraccion() == pytest.approx(0.3)
+
+    ruta.write_text("  1 0.1\n")  # El proceso volvio a crear el archivo
+    seguidor.leer()
+    assert seguidor.pasos == 1
+
+
+def test_ignora_el_res_de_la_ejecucion_anterior(tmp_path, reloj):
+    ruta = tmp_path / "Fichero_resultados.res"
+    ruta.write_text("".join(f"{i} 0.5\n" for i in range(1, 51)))
+    seguidor = SeguidorProgreso(str(ruta), pasos_total=100)
+    seguidor.leer()
+    assert seguidor.pasos == 0
+    ruta.write_text("1 0.5\n2 0.5\n")
+    seguidor.leer()
+    assert seguidor.pasos == 2
+
+
+def test_estancado_y_limite(tmp_path, reloj):
+    ruta = tmp_path / "Fichero_resultados.res"
+    seguidor = SeguidorProgreso(str(ruta), ventana_estancado=60, tiempo_limite=500)
+    agregar(ruta, "1 0.5\n")
+    reloj[0] += 50
+    assert seguidor.actualizar() == "RUNNING"
+    reloj[0] += 50
+    agregar(ruta, "2 0.5\n")
+    assert seguidor.actualizar() == "RUNNING"  # Crecio: se reinicia la ventana
+    reloj[0] += 61
+    assert seguidor.actualizar() == "STALLED"
+
+    seguidor = SeguidorProgreso(str(ruta), tiempo_limite=500)
+    reloj[0] += 501
+    assert seguidor.actualizar() == "TIMEOUT"
+    assert seguidor.resumen()['Estado'] == "TIMEOUT"
+
+
+def test_eta_y_resumen(tmp_path, reloj):
+    ruta = tmp_path / "Fichero_resultados.res"
+    seguidor = SeguidorProgreso(str(ruta), tamaño_esperado=1000, tiempo_estimado=200)
+    assert seguidor.eta() == 200  # Sin crecimiento solo la prediccion
+    agregar(ruta, "x" * 250)
+    reloj[0] += 100
+    seguidor.actualizar()
+    # 25 % en 100 s: 300 s observados y 100 s predichos, con peso 0.25 para la observada
+    assert seguidor.eta() == pytest.approx(0.25 * 300 + 0.75 * 100)
+    assert seguidor.resumen() == {'Estado': "OK", 'Progreso %': 100.0, 'Pasos res': 0,
+                                  'Tiempo estimado s': 200, 'Tiempo limite s': None}
+    assert SeguidorProgreso(str(ruta)).fraccion() is None
+
+
+class Modelo:
+
+    def predict(self, celdas, equipo, etapa):
+        return {'tiempo_s': celdas / 10}
+
+
+def test_seguidor_tetis_limite_solo_con_el_tiempo_del_fe(tmp_path):
+    (tmp_path / "Fe").mkdir()
+    (tmp_path / "Fe" / "Fe_1.txt").write_text("* Evento\nG  288  5\n")
+    assert pasos_fe(str(tmp_path / "Fe" / "Fe_1.txt")) == 288 and pasos_fe(str(tmp_path / "no.txt")) is None
+
+    seguidor = seguidor_tetis(str(tmp_path), "Fe_1", 1000, "A", Modelo(), factor_timeout=3, tiempo_fe=50)
+    assert (seguidor.pasos_total, seguidor.tiempo_estimado, seguidor.tiempo_limite) == (288, 50.0, 150.0)
+    seguidor = seguidor_tetis(str(tmp_path), "Fe_1", 1000, "A", Modelo(), factor_timeout=3)
+    assert (seguidor.tiempo_estimado, seguidor.tiempo_limite) == (100.0, None)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Almacen de resultados: ejecuciones completadas al reanudar una campaña.
+"""
+
+import numpy as np
+import pytest
+
+from resultados import AlmacenResultados
+
+COLUMNAS = ['Equipo', 'Modelo', 'Entrada', 'Tetis Time', 'Tetis Contaminada']
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    with AlmacenResultados(str(tmp_path / "res.sqlite"), "tetis", COLUMNAS) as almacen:
+        yield almacen
+
+
+def test_completados_solo_con_tiempo_numerico(almacen):
+    almacen.agregar(["A", "M", "Fe_1", 10.5, 0])
+    almacen.agregar(["A", "M", "Fe_2", "NOT EXECUTABLE", 0])
+    almacen.agregar({'Equipo': "A", 'Modelo': "M", 'Entrada': "Fe_3", 'Tetis Time': np.float64(3)})
+    almacen.agregar(["A", "M", "Fe_4", np.int64(7), 0])
+    assert almacen.completados() == {("A", "M", f"Fe_{i}") for i in range(1, 5)}
+    assert almacen.completados('Tetis Time') == {("A", "M", "Fe_1"), ("A", "M", "Fe_3"), ("A", "M", "Fe_4")}
+
+
+def test_completados_sin_contaminadas(almacen):
+    almacen.agregar(["A", "M", "Fe_1", 10, 1])
+    almacen.agregar(["A", "M", "Fe_2", 10, None])  # Filas sin la columna de calidad cuentan como validas
+    assert almacen.completados('Tetis Time', 'Tetis Contaminada') == {("A", "M", "Fe_2")}
+    almacen.agregar(["A", "M", "Fe_1", 11, 0])  # Reencolada y repetida sin contaminar
+    assert almacen.completados('Tetis Time', 'Tetis Contaminada') == {("A", "M", "Fe_1"), ("A", "M", "Fe_2")}
+
+
+def test_completados_con_columnas_nuevas_en_la_clave(tmp_path):
+    ruta = str(tmp_path / "res.sqlite")
+    with AlmacenResultados(ruta, "tetis", COLUMNAS) as almacen:
+        almacen.agregar(["A", "M", "Fe_1", 10, 0])  # Fila anterior a la columna Almacenamiento
+    with AlmacenResultados(ruta, "tetis", COLUMNAS + ['Almacenamiento'],
+                           clave=('Equipo', 'Modelo', 'Entrada', 'Almacenamiento')) as almacen:
+        almacen.agregar(["A", "M", "Fe_2", 10, 0, "scratch"])
+        assert almacen.completados('Tetis Time') == {("A", "M", "Fe_1", None), ("A", "M", "Fe_2", "scratch")}
+        assert almacen.completados('Tetis Time', nulos={'Almacenamiento': "modelo"}) == {
+            ("A", "M", "Fe_1", "modelo"), ("A", "M", "Fe_2", "scratch")}
+
+
+def test_leer_ultimo_por_clave(almacen):
+    almacen.agregar(["A", "M", "Fe_1", "TIMEOUT", 0])
+    almacen.agregar(["A", "M", "Fe_1", 12, 0])
+    assert list(almacen.leer()['Tetis Time']) == [12]
+    assert len(almacen.leer(ultimo_por_clave=False)) == 2
+    with pytest.raises(ValueError):
+        almacen.agregar(["A", "M"])
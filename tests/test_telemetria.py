@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Archivo de telemetria: cada fuente con sus propios tiempos y vistas reducidas.
+"""
+
+import json
+
+import numpy as np
+
+from telemetria import guardar_telemetria, vista_serie
+
+
+def test_cada_fuente_conserva_sus_tiempos(tmp_path):
+    t_hw, t_ps = np.arange(10.0), np.arange(0.5, 10.0, 0.25)
+    frec = np.tile(np.arange(t_ps.size, dtype=np.float32)[:, None], (1, 4))
+    guardar_telemetria(str(tmp_path), "id1", {
+        'hwinfo_frec': (t_hw, {'frec_hwinfo': 3000 + t_hw}),
+        'psutil': (t_ps, {'frec': frec, 'rss': np.ones(t_ps.size)}),
+    })
+    carpeta = tmp_path / "id1"
+    assert np.load(carpeta / "frec_hwinfo.npy").shape == (10,)
+    assert np.load(carpeta / "frec.npy").shape == (t_ps.size, 4)  # Sin filas de NaN de la otra fuente
+    meta = json.loads((carpeta / "meta.json").read_text(encoding="utf-8"))
+    assert meta['muestras'] == {'hwinfo_frec': 10, 'psutil': t_ps.size}
+    assert meta['series']['frec'] == {'fuente': "psutil", 'forma': [4]}
+
+    v = vista_serie(str(tmp_path), "id1", "frec_hwinfo", max_puntos=5)
+    assert list(v['t']) == [0.5, 2.5, 4.5, 6.5, 8.5] and list(v['max']) == [3001, 3003, 3005, 3007, 3009]
+    v = vista_serie(str(tmp_path), "id1", "frec", max_puntos=t_ps.size, nucleo=2)
+    assert np.array_equal(v['t'], t_ps) and not np.isnan(v['media']).any()
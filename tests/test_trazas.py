@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Union de intervalos y resumen del costo del arnes de una traza.
+"""
+
+import pytest
+
+from trazas import _union_ns, resumir_traza, CATEGORIA_EXE
+
+
+def span(id_, nombre, inicio, fin, categoria="fase", padre=None):
+    return {'id': id_, 'nombre': nombre, 'categoria': categoria, 'padre': padre,
+            'inicio_ns': inicio, 'fin_ns': fin, 'dur_ns': fin - inicio}
+
+
+@pytest.mark.parametrize("intervalos, total", [
+    ([], 0),
+    ([(0, 10)], 10),
+    ([(0, 10), (20, 25)], 15),
+    ([(0, 10), (5, 15)], 15),
+    ([(0, 30), (5, 10), (12, 20)], 30),
+    ([(20, 25), (0, 10), (10, 20)], 25),
+])
+def test_union_ns(intervalos, total):
+    assert _union_ns(intervalos) == total
+
+
+def test_resumir_traza_no_cuenta_dos_veces_los_ejecutables_concurrentes():
+    s = 10 ** 9
+    spans = [
+        span(1, "Campaña", 0, 10 * s),
+        span(2, "Tetis.exe", 1 * s, 5 * s, CATEGORIA_EXE, padre=1),
+        span(3, "Tetis.exe", 3 * s, 7 * s, CATEGORIA_EXE, padre=1),
+    ]
+    resumen, tabla = resumir_traza(spans)
+    assert resumen['Pared s'] == pytest.approx(10)
+    assert resumen['Ejecutables s'] == pytest.approx(6)
+    assert resumen['Arnes s'] == pytest.approx(4)
+    assert resumen['Arnes %'] == pytest.approx(40)
+    assert resumen['Spans'] == 3 and resumen['Traza s'] is None
+    campaña = tabla[tabla['Fase'] == "Campaña"].iloc[0]
+    assert campaña['Propio s'] == pytest.approx(2)
+    assert int(tabla[tabla['Fase'] == "Tetis.exe"]['n'].iloc[0]) == 2
+
+
+def test_resumir_traza_vacia():
+    resumen, tabla = resumir_traza([])
+    assert resumen['Pared s'] == 0.0 and resumen['Arnes %'] is None
+    assert len(tabla) == 0